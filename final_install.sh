@@ -34,6 +34,7 @@ python3 scripts/imacdisplay_http.py --ip "$ESP32_ADDRESS"
 # Install system script
 echo "📦 Installing system script..."
 sudo cp scripts/imacdisplay_http.py /usr/local/bin/imacdisplay.py
+sudo cp scripts/brightness_history.py scripts/brightness_bus.py /usr/local/bin/
 sudo chmod +x /usr/local/bin/imacdisplay.py
 
 # Test system installation
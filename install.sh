@@ -20,9 +20,20 @@ echo "📁 Project directory: $PROJECT_DIR"
 # Install Python script
 echo "📦 Installing Python control script..."
 sudo cp "$PROJECT_DIR/scripts/imacdisplay.py" /usr/local/bin/
+sudo cp "$PROJECT_DIR/scripts/serial_hotplug.py" "$PROJECT_DIR/scripts/serial_identity.py" "$PROJECT_DIR/scripts/serial_io.py" "$PROJECT_DIR/scripts/batch_script.py" "$PROJECT_DIR/scripts/serial_frames.py" "$PROJECT_DIR/scripts/brightness_bus.py" "$PROJECT_DIR/scripts/serial_capture.py" "$PROJECT_DIR/scripts/serial_log_analyzer.py" "$PROJECT_DIR/scripts/stress_test.py" "$PROJECT_DIR/scripts/device_emulator.py" /usr/local/bin/
 sudo chmod +x /usr/local/bin/imacdisplay.py
 echo "✅ Python script installed to /usr/local/bin/imacdisplay.py"
 
+# Install brightness control service (socket-activated user unit). It needs the
+# HTTP module under its own name: imacdisplay.py above is the serial one.
+echo "📦 Installing brightness control service..."
+sudo cp "$PROJECT_DIR/scripts/brightness_service.py" "$PROJECT_DIR/scripts/imacdisplay_http.py" "$PROJECT_DIR/scripts/brightness_history.py" /usr/local/bin/
+sudo chmod +x /usr/local/bin/brightness_service.py
+mkdir -p ~/.config/systemd/user
+cp "$PROJECT_DIR/systemd/brightness-control.socket" "$PROJECT_DIR/systemd/brightness-control.service" ~/.config/systemd/user/
+systemctl --user daemon-reload
+echo "✅ Brightness control service installed to /usr/local/bin/brightness_service.py"
+
 # Install systemd service
 echo "🔧 Installing systemd service..."
 sudo cp "$PROJECT_DIR/systemd/brightness.service" /etc/systemd/system/
@@ -59,6 +70,7 @@ echo "Next steps:"
 echo "1. Flash ESP32 firmware: pio run --target upload"
 echo "2. Configure keyboard shortcuts to use: imacdisplay.py -i 10 / imacdisplay.py -d 10"
 echo "3. Access web interface at ESP32's IP address"
+echo "4. Optional: keep the ESP32 connection warm: systemctl --user enable --now brightness-control.socket"
 echo ""
 echo "Commands:"
 echo "  Get brightness: imacdisplay.py -g"
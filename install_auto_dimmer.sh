@@ -11,11 +11,12 @@ sudo apt install -y xprintidle
 # Copy auto-dimmer script
 echo "📝 Installing auto-dimmer script..."
 sudo cp scripts/auto_dimmer.py /usr/local/bin/
+sudo cp scripts/brightness_schedule.py scripts/idle_trace.py scripts/brightness_history.py scripts/seats.py scripts/inhibitors.py scripts/daemon_log.py scripts/brightness_bus.py /usr/local/bin/
 sudo chmod +x /usr/local/bin/auto_dimmer.py
 
 # Install systemd service
 echo "🔧 Installing systemd service..."
-sudo cp systemd/auto-dimmer.service /etc/systemd/system/
+sudo cp systemd/auto-dimmer.service systemd/auto-dimmer-multiseat.service /etc/systemd/system/
 sudo systemctl daemon-reload
 
 # Test the auto-dimmer
@@ -41,7 +42,10 @@ echo ""
 echo "2. Run auto-dimmer manually:"
 echo "   auto_dimmer.py --minutes 10 --level 0"
 echo ""
-echo "3. Test auto-dimmer (safe mode):"
+echo "3. Shared workstation: one daemon for all seats and sessions (instead of 1):"
+echo "   sudo systemctl enable --now auto-dimmer-multiseat.service"
+echo ""
+echo "4. Test auto-dimmer (safe mode):"
 echo "   auto_dimmer.py --test"
 echo ""
 echo "Configuration options:"
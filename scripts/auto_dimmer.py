@@ -8,8 +8,11 @@ import time
 import subprocess
 import json
 import argparse
+import asyncio
+import re
 import sys
 import signal
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -17,31 +20,111 @@ from datetime import datetime, timedelta
 # Try multiple import methods to handle different installation scenarios
 try:
     # First try direct import (when both scripts are in same directory)
-    from imacdisplay_http import http_request, save_config, load_config
+    from imacdisplay_http import HttpTransport, save_config, load_config, get_discovery_worker
 except ImportError:
     try:
         # Try importing from system location
         sys.path.insert(0, '/usr/local/bin')
-        from imacdisplay import http_request, save_config, load_config
+        from imacdisplay import HttpTransport, save_config, load_config, get_discovery_worker
     except ImportError:
         # Try importing from parent directory (development mode)
         sys.path.append(str(Path(__file__).parent))
         try:
-            from imacdisplay_http import http_request, save_config, load_config
+            from imacdisplay_http import HttpTransport, save_config, load_config, get_discovery_worker
         except ImportError:
             print("Error: Could not import brightness control module")
             print("Make sure imacdisplay.py is installed in /usr/local/bin/")
             sys.exit(1)
 
+from brightness_schedule import BrightnessSchedule, seconds_since_midnight
+from idle_trace import TraceWriter
+from brightness_history import BrightnessHistory
+from seats import SeatMonitor, POLICIES
+from inhibitors import InhibitorEngine
+from daemon_log import DaemonLog, LEVELS, LEVEL_NAMES
+from brightness_bus import publish_brightness, listen
+
+ACTIVE_IDLE_SECONDS = 60  # Idle time below this counts as user activity
+# asyncio's clock stops during suspend, so long schedule sleeps are cut into
+# pieces and the wall clock re-read; a change point passed while suspended
+# then applies at most this long after resume
+SCHEDULE_RECHECK_SECONDS = 60
+
+def parse_brightness_response(response):
+    """Extract the percentage from a 'Current brightness: N%' reply"""
+    if response and "Current brightness:" in response:
+        match = re.search(r'(\d+)%', response)
+        if match:
+            return int(match.group(1))
+    return None
+
+def parse_who_idle(output):
+    """Idle seconds from `who -u` output, or None if no line reports it"""
+    for line in output.strip().split('\n'):
+        if 'old' in line:
+            # Extract time info and calculate idle time
+            parts = line.split()
+            if len(parts) >= 5:
+                idle_indicator = parts[4]
+                if ':' in idle_indicator:
+                    # Format like "01:23" means 1 hour 23 minutes idle
+                    hours, minutes = map(int, idle_indicator.split(':'))
+                    return (hours * 3600) + (minutes * 60)
+                elif idle_indicator.isdigit():
+                    # Number of minutes
+                    return int(idle_indicator) * 60
+    return None
+
+class SystemClock:
+    """Real time for the daemon; tests inject a virtual clock with the same methods"""
+
+    def now(self):
+        return datetime.now()
+
+    async def sleep(self, delay):
+        await asyncio.sleep(delay)
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.to_thread(func, *args)
+
 class AutoDimmer:
-    def __init__(self, idle_minutes=10, dim_level=0, check_interval=30):
+    def __init__(self, idle_minutes=10, dim_level=0, check_interval=30, transport=None, clock=None):
         self.idle_minutes = idle_minutes
         self.dim_level = dim_level  # Brightness level when dimmed (can be 0 for complete black)
         self.check_interval = check_interval  # How often to check idle time (seconds)
+        self.transport = transport or HttpTransport()
+        self.clock = clock or SystemClock()
+        self.log = DaemonLog()  # Per-tick detail goes to the debug ring; output is transitions only
+        
+        # Timeouts so one slow probe or device call can't stall the other tasks
+        self.idle_timeout = 10
+        self.device_timeout = 15
         
         self.original_brightness = None
         self.is_dimmed = False
         self.running = True
+        self.dim_task = None
+        self.stop_event = None
+        self.trace_file = None  # Where the daemon records an idle trace, if anywhere
+        self.trace = None  # Idle trace recorder (TraceWriter), open while the daemon runs
+        self.history = None  # Brightness/idle time-series log (BrightnessHistory)
+        self.history_enabled = True
+        self.seats = None  # SeatMonitor in multi-seat mode
+        self.inhibitors = None  # InhibitorEngine when dim inhibitors are configured
+        self.inhibitor_config = None
+        self.inhibited_by = None
+        self.bus_enabled = False  # Share and follow brightness changes on the local bus (daemon only)
+        self.bus = None
+        self.known_brightness = None  # Last level we set or saw on the bus; None = ask the device
+        self.hedged = None  # Serial port ('' = auto-detect) when brightness is hedged over HTTP and serial
+        
+        # Device commands from concurrent tasks reach the transport one at a time
+        self.device_lock = threading.Lock()
+        
+        # Time-of-day schedule (optional, from config)
+        self.schedule = None
+        self.schedule_config = {}
+        self.scheduled_level = None
         
         # Load configuration
         self.config_file = Path.home() / '.config' / 'auto_dimmer.json'
@@ -56,9 +139,25 @@ class AutoDimmer:
                 self.idle_minutes = config.get('idle_minutes', self.idle_minutes)
                 self.dim_level = config.get('dim_level', self.dim_level)
                 self.check_interval = config.get('check_interval', self.check_interval)
-                print(f"📁 Loaded config: {self.idle_minutes}min idle, dim to {self.dim_level}%")
+                self.schedule_config = {k: config[k] for k in
+                                        ('schedule', 'schedule_interpolation', 'schedule_resolution')
+                                        if k in config}
+                self.schedule = BrightnessSchedule.from_config(config)
+                self.history_enabled = config.get('history', True)
+                if config.get('multi_seat'):
+                    self.seats = SeatMonitor(config.get('seat_policy', 'all'))
+                if config.get('inhibitors'):
+                    self.set_inhibitors(config['inhibitors'])
+                if config.get('trace_file'):
+                    self.trace_file = config['trace_file']
+                if config.get('log_level'):
+                    self.set_log_level(config['log_level'])
+                if config.get('hedged'):
+                    self.hedged = '' if config['hedged'] is True else config['hedged']
+                self.log.info('config', f"📁 Loaded config: {self.idle_minutes}min idle, dim to {self.dim_level}%",
+                              path=self.config_file)
         except Exception as e:
-            print(f"⚠️  Config load error: {e}, using defaults")
+            self.log.warning('config_error', f"⚠️  Config load error: {e}, using defaults")
     
     def save_dimmer_config(self):
         """Save auto-dimmer configuration"""
@@ -69,11 +168,49 @@ class AutoDimmer:
                 'check_interval': self.check_interval,
                 'last_updated': datetime.now().isoformat()
             }
+            config.update(self.schedule_config)
+            if not self.history_enabled:
+                config['history'] = False
+            if self.seats:
+                config['multi_seat'] = True
+                config['seat_policy'] = self.seats.policy
+            if self.inhibitors:
+                config['inhibitors'] = self.inhibitor_config
+            if self.log.base_level != LEVELS['info']:
+                config['log_level'] = LEVEL_NAMES[self.log.base_level]
+            if self.hedged is not None:
+                config['hedged'] = self.hedged or True
             self.config_file.parent.mkdir(parents=True, exist_ok=True)
             with open(self.config_file, 'w') as f:
                 json.dump(config, f, indent=2)
         except Exception as e:
-            print(f"⚠️  Config save error: {e}")
+            self.log.warning('config_error', f"⚠️  Config save error: {e}")
+    
+    def set_log_level(self, level):
+        try:
+            self.log.set_level(level)
+        except ValueError as e:
+            self.log.warning('config_error', f"⚠️  {e}, keeping {LEVEL_NAMES[self.log.level]}")
+    
+    def set_inhibitors(self, config):
+        """Rule list from the config, or True for the default rules"""
+        try:
+            self.inhibitors = InhibitorEngine.from_config(config)
+            self.inhibitor_config = config
+        except (ValueError, re.error, AttributeError) as e:
+            self.log.warning('config_error', f"⚠️  Inhibitor config error: {e}, dimming is never inhibited")
+            self.inhibitors = None
+    
+    def use_hedged_transport(self):
+        """Send brightness over HTTP and serial at once, first acknowledgement wins"""
+        try:
+            from hedged_transport import open_hedged
+            self.transport = open_hedged(self.hedged)
+        except ImportError as e:
+            self.log.error('transport_error', f"❌ Hedged mode isn't installed, run auto_dimmer.py from the "
+                                              f"repository checkout ({e})")
+            return False
+        return True
     
     def get_idle_time_seconds(self):
         """Get system idle time in seconds using multiple methods"""
@@ -91,22 +228,9 @@ class AutoDimmer:
         try:
             result = subprocess.run(['who', '-u'], capture_output=True, text=True, timeout=5)
             if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                if lines:
-                    # Parse the idle time from who output
-                    for line in lines:
-                        if 'old' in line:
-                            # Extract time info and calculate idle time
-                            parts = line.split()
-                            if len(parts) >= 5:
-                                idle_indicator = parts[4]
-                                if ':' in idle_indicator:
-                                    # Format like "01:23" means 1 hour 23 minutes idle
-                                    hours, minutes = map(int, idle_indicator.split(':'))
-                                    return (hours * 3600) + (minutes * 60)
-                                elif idle_indicator.isdigit():
-                                    # Number of minutes
-                                    return int(idle_indicator) * 60
+                idle = parse_who_idle(result.stdout)
+                if idle is not None:
+                    return idle
         except (subprocess.TimeoutExpired, subprocess.CalledProcessError, ValueError):
             pass
         
@@ -132,21 +256,33 @@ class AutoDimmer:
             pass
         
         # If all methods fail, return 0 (not idle)
-        print("⚠️  Could not determine idle time, assuming active")
+        self.log.warning('idle_unknown', "⚠️  Could not determine idle time, assuming active")
         return 0
     
+    def device_command(self, cmd):
+        """Send one command to the ESP32 (blocking; serialized across tasks)"""
+        with self.device_lock:
+            return self.transport.command(cmd)
+    
+    def device_status(self):
+        """Status snapshot from the transport (blocking; serialized across tasks)"""
+        with self.device_lock:
+            return self.transport.status()
+    
     def get_current_brightness(self):
         """Get current brightness from ESP32"""
+        if self.bus is not None and self.known_brightness is not None:
+            return self.known_brightness
         try:
-            response = http_request("/serial", {"cmd": "get"})
-            if response and "Current brightness:" in response:
-                # Extract brightness percentage from response
-                import re
-                match = re.search(r'(\d+)%', response)
-                if match:
-                    return int(match.group(1))
+            if hasattr(self.transport, 'status'):
+                status = self.device_status()
+                level = status.brightness if status else None
+            else:
+                level = parse_brightness_response(self.device_command("get"))
+            if level is not None:
+                return level
         except Exception as e:
-            print(f"⚠️  Error getting brightness: {e}")
+            self.log.warning('device_error', f"⚠️  Error getting brightness: {e}")
         
         # Fallback to cached value
         config = load_config()
@@ -155,22 +291,27 @@ class AutoDimmer:
     def set_brightness(self, level):
         """Set brightness level"""
         try:
-            response = http_request("/serial", {"cmd": str(level)})
+            response = self.device_command(str(level))
             if response and "Brightness set to" in response:
-                print(f"💡 Brightness set to {level}%")
+                self.log.info('brightness', f"💡 Brightness set to {level}%", level=level)
+                self.log_history('record_brightness', level)
+                self.known_brightness = level
+                if self.bus_enabled:
+                    publish_brightness(level, 'auto-dimmer')
                 return True
             else:
-                print(f"❌ Failed to set brightness: {response}")
+                self.log.error('set_failed', f"❌ Failed to set brightness: {response}", level=level)
                 return False
         except Exception as e:
-            print(f"❌ Error setting brightness: {e}")
+            self.log.error('device_error', f"❌ Error setting brightness: {e}", level=level)
             return False
     
     def dim_display(self):
         """Dim the display to minimum level"""
         if not self.is_dimmed:
             self.original_brightness = self.get_current_brightness()
-            print(f"😴 Dimming display: {self.original_brightness}% → {self.dim_level}%")
+            self.log.info('dim', f"😴 Dimming display: {self.original_brightness}% → {self.dim_level}%",
+                          original=self.original_brightness, level=self.dim_level)
             
             if self.set_brightness(self.dim_level):
                 self.is_dimmed = True
@@ -180,7 +321,8 @@ class AutoDimmer:
     def restore_brightness(self):
         """Restore original brightness"""
         if self.is_dimmed and self.original_brightness is not None:
-            print(f"😊 Restoring brightness: {self.dim_level}% → {self.original_brightness}%")
+            self.log.info('restore', f"😊 Restoring brightness: {self.dim_level}% → {self.original_brightness}%",
+                          level=self.original_brightness)
             
             if self.set_brightness(self.original_brightness):
                 self.is_dimmed = False
@@ -188,68 +330,255 @@ class AutoDimmer:
                 return True
         return False
     
-    def signal_handler(self, signum, frame):
+    def log_history(self, method, value):
+        """Best-effort history logging; never interferes with dimming"""
+        if self.history is None:
+            return
+        try:
+            getattr(self.history, method)(value, now=self.clock.now().timestamp())
+        except Exception as e:
+            self.log.warning('history_error', f"⚠️  History log error: {e}")
+    
+    def decide(self, current_idle):
+        """Dim/restore decision for one idle sample: 'dim', 'restore' or None"""
+        if current_idle < ACTIVE_IDLE_SECONDS:
+            return 'restore' if self.is_dimmed else None
+        if current_idle > self.idle_minutes * 60 and not self.is_dimmed:
+            return 'dim'
+        return None
+    
+    # --- asyncio daemon -------------------------------------------------
+    
+    async def _in_thread(self, func, *args, timeout):
+        return await asyncio.wait_for(self.clock.run_blocking(func, *args), timeout)
+    
+    async def dim_async(self):
+        """Dim as a cancellable task; user activity may pre-empt it at any await"""
+        try:
+            original = await self._in_thread(self.get_current_brightness, timeout=self.device_timeout)
+        except asyncio.TimeoutError:
+            self.log.warning('dim_timeout', "⚠️  Timed out reading brightness, not dimming")
+            return
+        
+        # Mark dimmed before sending so a pre-empting restore always undoes it
+        self.original_brightness = original
+        self.is_dimmed = True
+        self.log.info('dim', f"😴 Dimming display: {original}% → {self.dim_level}%",
+                      original=original, level=self.dim_level)
+        try:
+            ok = await self._in_thread(self.set_brightness, self.dim_level, timeout=self.device_timeout)
+        except asyncio.TimeoutError:
+            # The worker thread may still land the dim: stay dimmed so the next activity restores
+            self.log.warning('dim_timeout', "⚠️  Timed out dimming, will restore on activity anyway")
+            return
+        if not ok:
+            self.is_dimmed = False
+            self.original_brightness = None
+    
+    async def restore_async(self):
+        if not (self.is_dimmed and self.original_brightness is not None):
+            return
+        level = self.original_brightness
+        self.log.info('restore', f"😊 Restoring brightness: {self.dim_level}% → {level}%", level=level)
+        try:
+            ok = await self._in_thread(self.set_brightness, level, timeout=self.device_timeout)
+        except asyncio.TimeoutError:
+            ok = False
+        if ok:
+            self.is_dimmed = False
+            self.original_brightness = None
+    
+    def apply_bus_event(self, event):
+        """Brightness/device event from another process (runs on the event loop)"""
+        if event.get('event') == 'device' and event.get('state') == 'up':
+            # It may have rebooted to its default level
+            self.known_brightness = None
+        elif event.get('event') == 'brightness' and isinstance(event.get('level'), int):
+            self.known_brightness = event['level']
+            if self.is_dimmed:
+                # Someone chose a level while dimmed: keep it instead of restoring over it
+                self.log.info('override', f"👆 {event.get('source')} set {event['level']}% while dimmed, not restoring",
+                              source=event.get('source'), level=event['level'])
+                self.is_dimmed = False
+                self.original_brightness = None
+    
+    async def read_idle(self):
+        """Idle seconds for this tick; aggregated over all sessions in multi-seat mode"""
+        if self.seats is not None:
+            idle = await self.seats.idle(self.clock.run_blocking, self.idle_timeout)
+            if idle is not None:
+                self.log.debug('sessions', f"🪑 Sessions ({self.seats.policy}): {self.seats.describe()}")
+                return idle
+        return await self._in_thread(self.get_idle_time_seconds, timeout=self.idle_timeout)
+    
+    async def tick(self):
+        """One idle sample: start a dim, or pre-empt it and restore on activity"""
+        current_idle = await self.read_idle()
+        if self.trace:
+            self.trace.record(self.clock.now().timestamp(), current_idle)
+        self.log_history('record_idle', current_idle)
+        self.log.debug('tick', f"🕐 {self.clock.now().strftime('%H:%M:%S')} - "
+                               f"Idle: {current_idle:.0f}s, Threshold: {self.idle_minutes * 60}s, "
+                               f"Dimmed: {self.is_dimmed}", idle=round(current_idle), dimmed=self.is_dimmed)
+        
+        dimming = self.dim_task is not None and not self.dim_task.done()
+        if current_idle < ACTIVE_IDLE_SECONDS and dimming:
+            # New activity pre-empts an in-flight dim
+            self.log.info('activity', "👋 User activity detected, cancelling dim")
+            self.dim_task.cancel()
+            await asyncio.gather(self.dim_task, return_exceptions=True)
+            dimming = False
+        
+        action = None if dimming else self.decide(current_idle)
+        if action == 'restore':
+            self.log.info('activity', "👋 User activity detected!")
+            await self.restore_async()
+        elif action == 'dim':
+            if await self.inhibited():
+                return
+            self.log.info('idle', f"💤 System idle for {current_idle/60:.1f} minutes", idle=round(current_idle))
+            self.dim_task = asyncio.create_task(self.dim_async())
+    
+    async def inhibited(self):
+        """Whether an inhibitor rule (video, presentation, ...) holds off the dim"""
+        if self.inhibitors is None:
+            return False
+        inhibitor = await self._in_thread(self.inhibitors.check, timeout=self.idle_timeout)
+        if inhibitor != self.inhibited_by:
+            if inhibitor:
+                self.log.info('inhibited', f"🎬 Dimming inhibited by '{inhibitor}'", rule=inhibitor)
+            else:
+                self.log.info('inhibited', f"🎬 Inhibitor '{self.inhibited_by}' ended", rule=self.inhibited_by)
+            self.inhibited_by = inhibitor
+        return inhibitor is not None
+    
+    async def sense_idle(self):
+        """Idle-sensing task"""
+        while self.running:
+            try:
+                await self.tick()
+            except asyncio.TimeoutError:
+                self.log.warning('idle_timeout', "⚠️  Idle probe timed out")
+            except Exception as e:
+                self.log.error('loop_error', f"❌ Error in main loop: {e}")
+            
+            await self.clock.sleep(self.check_interval)
+        
+        if self.dim_task is not None:
+            self.dim_task.cancel()
+    
+    async def apply_scheduled_level(self, level):
+        """Apply a schedule change point, composed with the idle-dim state"""
+        if level == self.scheduled_level:
+            return
+        self.scheduled_level = level
+        if self.is_dimmed:
+            # Don't wake a dimmed display; restore to the new level instead
+            self.log.info('schedule', f"📅 Schedule: {level}% (applied on restore)", level=level)
+            self.original_brightness = level
+        else:
+            self.log.info('schedule', f"📅 Schedule: setting brightness to {level}%", level=level)
+            try:
+                await self._in_thread(self.set_brightness, level, timeout=self.device_timeout)
+            except asyncio.TimeoutError:
+                self.log.warning('schedule_timeout', "⚠️  Timed out applying schedule")
+    
+    async def follow_schedule(self):
+        """Schedule task: sleeps until the next change point, re-reading the wall clock at least every minute"""
+        self.log.info('schedule', f"📅 Schedule: {len(self.schedule.table)} change points per day "
+                                  f"({self.schedule.interpolation})")
+        await self.apply_scheduled_level(self.schedule.level_at(seconds_since_midnight(self.clock.now())))
+        while self.running:
+            delay, _ = self.schedule.next_change(seconds_since_midnight(self.clock.now()))
+            await self.clock.sleep(min(delay, SCHEDULE_RECHECK_SECONDS))
+            await self.apply_scheduled_level(self.schedule.level_at(seconds_since_midnight(self.clock.now())))
+    
+    async def run_async(self, install_signal_handlers=True):
+        """Run idle sensing and scheduling as concurrent tasks until stopped"""
+        self.stop_event = asyncio.Event()
+        if install_signal_handlers:
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, self.request_stop, signum)
+            loop.add_signal_handler(signal.SIGUSR1, self.log.dump)
+            loop.add_signal_handler(signal.SIGUSR2, self.log.toggle_debug)
+        
+        if self.bus_enabled:
+            loop = asyncio.get_running_loop()
+            self.bus = listen(lambda event: loop.call_soon_threadsafe(self.apply_bus_event, event))
+            if self.bus is not None:
+                self.log.info('bus', f"📡 Brightness bus: {self.bus.bus_dir}", path=str(self.bus.bus_dir))
+            else:
+                self.log.warning('bus', "⚠️  Brightness bus unavailable, changes by other tools go unnoticed")
+        
+        tasks = [asyncio.create_task(self.sense_idle())]
+        if self.schedule:
+            tasks.append(asyncio.create_task(self.follow_schedule()))
+        
+        await self.stop_event.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if self.is_dimmed:
+            self.log.info('shutdown', "🔄 Restoring brightness before exit...")
+            await self.restore_async()
+        if self.trace:
+            self.trace.close()
+            self.trace = None
+        if hasattr(self.transport, 'describe'):
+            self.log.info('transport', f"🔀 Hedged sends: {self.transport.describe()}")
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+    
+    def request_stop(self, signum):
         """Handle shutdown signals gracefully"""
-        print(f"\n🛑 Received signal {signum}, shutting down...")
+        self.log.info('shutdown', f"🛑 Received signal {signum}, shutting down...", signal=signum)
+        self.stop()
+    
+    def stop(self):
         self.running = False
-        if self.is_dimmed:
-            print("🔄 Restoring brightness before exit...")
-            self.restore_brightness()
-        sys.exit(0)
+        if self.stop_event is not None:
+            self.stop_event.set()
     
     def run_daemon(self):
-        """Main daemon loop"""
-        print(f"🚀 Auto-dimmer started")
-        print(f"⏱️  Idle timeout: {self.idle_minutes} minutes")
-        print(f"🌙 Dim level: {self.dim_level}%")
-        print(f"🔄 Check interval: {self.check_interval} seconds")
-        print(f"💾 Config file: {self.config_file}")
-        print("📡 Testing ESP32 connection...")
-        
-        # Test ESP32 connection
-        current_brightness = self.get_current_brightness()
-        print(f"✅ ESP32 connected, current brightness: {current_brightness}%")
+        """Main daemon entry point"""
+        settings = {'idle_minutes': self.idle_minutes, 'dim_level': self.dim_level,
+                    'interval': self.check_interval, 'config': self.config_file,
+                    'log_level': LEVEL_NAMES[self.log.level]}
+        if self.seats:
+            settings['seat_policy'] = self.seats.policy
+        if self.inhibitors:
+            settings['inhibitors'] = self.inhibitors.describe()
+        if self.hedged is not None:
+            settings['transport'] = 'hedged'
+        self.log.info('start', f"🚀 Auto-dimmer started: dim to {self.dim_level}% after {self.idle_minutes} "
+                               f"minutes idle (SIGUSR1 dumps the debug ring, SIGUSR2 toggles debug output)",
+                      **settings)
         
-        # Set up signal handlers
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        # Keep the ESP32 address fresh in the background (network changes, failures)
+        get_discovery_worker()
+        self.bus_enabled = True
         
-        idle_threshold_seconds = self.idle_minutes * 60
-        last_activity_time = time.time()
+        if self.trace_file:
+            self.trace = TraceWriter(Path(self.trace_file).expanduser())
+            self.log.info('trace', f"🎞️  Recording idle trace: {self.trace.path}")
         
-        while self.running:
+        if self.history_enabled:
             try:
-                current_idle = self.get_idle_time_seconds()
-                current_time = time.time()
-                
-                print(f"🕐 {datetime.now().strftime('%H:%M:%S')} - "
-                      f"Idle: {current_idle:.0f}s, Threshold: {idle_threshold_seconds}s, "
-                      f"Dimmed: {self.is_dimmed}")
-                
-                # Check if user became active (idle time decreased significantly)
-                if current_idle < 60 and self.is_dimmed:  # Less than 1 minute idle
-                    print("👋 User activity detected!")
-                    self.restore_brightness()
-                    last_activity_time = current_time
-                
-                # Check if we should dim (idle time exceeded threshold)
-                elif current_idle > idle_threshold_seconds and not self.is_dimmed:
-                    print(f"💤 System idle for {current_idle/60:.1f} minutes")
-                    self.dim_display()
-                
-                # Update last activity time if not idle
-                if current_idle < 60:
-                    last_activity_time = current_time
-                
-                time.sleep(self.check_interval)
-                
-            except KeyboardInterrupt:
-                break
+                self.history = BrightnessHistory.for_device()
+                self.log.info('history', f"📊 History: {self.history.path}")
             except Exception as e:
-                print(f"❌ Error in main loop: {e}")
-                time.sleep(self.check_interval)
+                self.log.warning('history_error', f"⚠️  History log unavailable: {e}")
+        
+        # Test ESP32 connection
+        current_brightness = self.get_current_brightness()
+        self.log.info('connected', f"✅ ESP32 connected, current brightness: {current_brightness}%",
+                      level=current_brightness)
         
-        print("👋 Auto-dimmer stopped")
+        asyncio.run(self.run_async())
+        self.log.info('stopped', "👋 Auto-dimmer stopped")
 
 def main():
     parser = argparse.ArgumentParser(description='Automatic brightness dimmer with idle detection')
@@ -265,22 +594,77 @@ def main():
                        help='Show current status and exit')
     parser.add_argument('--config', action='store_true',
                        help='Save current settings to config file')
+    parser.add_argument('--show-schedule', action='store_true',
+                       help='Print the compiled brightness schedule and exit')
+    parser.add_argument('--record-trace', metavar='FILE',
+                       help='Record an idle trace for offline replay (see idle_trace.py)')
+    parser.add_argument('--multi-seat', action='store_true',
+                       help='Track idle time of every local session (run as root)')
+    parser.add_argument('--seat-policy', metavar='POLICY',
+                       help=f"How sessions combine: {', '.join(POLICIES)} or a seat name "
+                            "such as seat0 (default: all = dim when every session is idle)")
+    parser.add_argument('--log-level', choices=list(LEVELS),
+                       help='Daemon output level (default: info = state changes only; '
+                            'debug adds every idle sample)')
+    parser.add_argument('--inhibit', action='store_true',
+                       help='Never dim while a video player or presentation is running '
+                            '(rules can be customised under "inhibitors" in the config file)')
+    parser.add_argument('--hedged', nargs='?', const='', metavar='PORT',
+                       help='Send brightness over HTTP and USB serial, first acknowledgement wins '
+                            '(serial port auto-detected unless given)')
     
     args = parser.parse_args()
     
     dimmer = AutoDimmer(args.minutes, args.level, args.interval)
+    if args.record_trace:
+        dimmer.trace_file = args.record_trace
+    if args.multi_seat or args.seat_policy:
+        dimmer.seats = SeatMonitor(args.seat_policy or (dimmer.seats.policy if dimmer.seats else 'all'))
+    if args.log_level:
+        dimmer.set_log_level(args.log_level)
+    if args.inhibit and not dimmer.inhibitors:
+        dimmer.set_inhibitors(True)
+    if args.hedged is not None:
+        dimmer.hedged = args.hedged or dimmer.hedged or ''
+    if dimmer.hedged is not None and not args.config and not args.show_schedule:
+        if not dimmer.use_hedged_transport():
+            sys.exit(1)
     
     if args.config:
         dimmer.save_dimmer_config()
         print(f"💾 Configuration saved to {dimmer.config_file}")
         return
     
+    if args.show_schedule:
+        if not dimmer.schedule:
+            print(f"📅 No schedule configured in {dimmer.config_file}")
+            return
+        now = seconds_since_midnight()
+        delay, level = dimmer.schedule.next_change(now)
+        print(f"📅 Brightness schedule ({dimmer.schedule.interpolation}):")
+        for line in dimmer.schedule.describe():
+            print(f"   {line}")
+        print(f"   Now: {dimmer.schedule.level_at(now)}%, next: {level}% in {delay/60:.1f} minutes")
+        return
+    
     if args.status:
-        idle_time = dimmer.get_idle_time_seconds()
+        idle_time = None
+        if dimmer.seats:
+            idle_time = asyncio.run(dimmer.seats.idle(SystemClock().run_blocking, dimmer.idle_timeout))
+            print(f"🪑 Sessions ({dimmer.seats.policy}): {dimmer.seats.describe() or 'none found'}")
+        if idle_time is None:
+            idle_time = dimmer.get_idle_time_seconds()
         brightness = dimmer.get_current_brightness()
         print(f"📊 Status Report:")
         print(f"   Current idle time: {idle_time:.0f} seconds ({idle_time/60:.1f} minutes)")
         print(f"   Current brightness: {brightness}%")
+        device = dimmer.device_status() if hasattr(dimmer.transport, 'status') else None
+        if device:
+            print(f"   Firmware: {device.firmware_version}")
+            if device.structured:
+                print(f"   WiFi: {device.ssid} ({device.rssi} dBm), IP {device.ip}")
+        if dimmer.inhibitors:
+            print(f"   Inhibited by: {dimmer.inhibitors.check() or 'nothing'}")
         print(f"   Idle threshold: {dimmer.idle_minutes} minutes")
         print(f"   Dim level: {dimmer.dim_level}%")
         return
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Command scripts for the brightness CLI
+Runs many commands over one open transport and reports one JSON result per
+command, so calibration runs and integration tests don't pay a process
+start, serial setup and config round trip per step
+"""
+
+import json
+import time
+
+# Commands and the number of integer arguments they take
+COMMANDS = {
+    'set': 1,
+    'inc': 1,
+    'dec': 1,
+    'get': 0,
+    'version': 0,
+    'ping': 0,
+    'sleep': 1,
+}
+
+def parse_script(lines):
+    """Script lines -> [(line_number, action, value)]; raises ValueError on the first bad line
+
+    One command per line; '#' starts a comment. 'sleep SECONDS' pauses
+    between commands.
+    """
+    steps = []
+    for number, line in enumerate(lines, 1):
+        parts = line.split('#', 1)[0].split()
+        if not parts:
+            continue
+        action, args = parts[0].lower(), parts[1:]
+        if action not in COMMANDS:
+            raise ValueError(f"line {number}: unknown command '{action}'")
+        if len(args) != COMMANDS[action]:
+            raise ValueError(f"line {number}: '{action}' takes {COMMANDS[action]} argument(s)")
+        value = None
+        if args:
+            try:
+                value = float(args[0]) if action == 'sleep' else int(args[0])
+            except ValueError:
+                raise ValueError(f"line {number}: invalid value '{args[0]}'")
+        steps.append((number, action, value))
+    return steps
+
+def run_batch(transport, steps, current, allow_zero=False, delay=0.0, on_result=None):
+    """Execute parsed steps; returns (results, final brightness)
+
+    current is the last known brightness; get/inc/dec work from it as the
+    single-command CLI does, without reading the config between steps.
+    """
+    minimum = 0 if allow_zero else 5
+    results = []
+    for index, (number, action, value) in enumerate(steps):
+        if index and delay:
+            time.sleep(delay)
+        started = time.perf_counter()
+        result = {'line': number, 'command': action if value is None else f"{action} {value:g}"}
+
+        if action == 'sleep':
+            time.sleep(value)
+            result['ok'] = True
+        elif action == 'get':
+            result.update(ok=True, value=current)
+        elif action in ('version', 'ping'):
+            reply = transport.command(action)
+            result.update(ok=reply is not None, reply=reply)
+        else:
+            if action == 'set':
+                target = value
+            elif action == 'inc':
+                target = current + value
+            else:
+                target = current - value
+            target = max(minimum, min(100, target))
+            reply = transport.command(str(target))
+            ok = reply is not None and "Brightness set to" in reply
+            result.update(ok=ok, reply=reply, value=target)
+            if ok:
+                current = target
+
+        result['ms'] = round((time.perf_counter() - started) * 1000, 2)
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results, current
+
+def print_result(result):
+    print(json.dumps(result), flush=True)
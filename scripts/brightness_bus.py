@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local publish/subscribe bus for brightness and device state
+Each brightness change and device up/down transition is sent once, as a
+JSON datagram, to every subscriber's Unix socket, so tools keep their state
+current without polling the ESP32 or re-reading the config
+
+There is no broker: subscribers bind sockets in the bus directory and
+publishers send to whatever is there. The last event of each kind is also
+kept in state.json for tools that start later.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+MAX_MESSAGE = 4096
+STATE_FILE = 'state.json'
+
+_socket_ids = itertools.count()
+
+def default_bus_dir():
+    if os.environ.get('IMACDIMMER_BUS'):
+        return Path(os.environ['IMACDIMMER_BUS'])
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or f'/run/user/{os.getuid()}'
+    return Path(runtime_dir) / 'imacdimmer-bus'
+
+def publish(event, bus_dir=None, **fields):
+    """Send an event to every subscriber; best effort, never raises
+
+    Returns the number of subscribers it was delivered to.
+    """
+    bus_dir = Path(bus_dir or default_bus_dir())
+    message = {'event': event, **fields, 'pid': os.getpid(), 'time': time.time()}
+    data = json.dumps(message).encode()
+    try:
+        bus_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        paths = [entry.path for entry in os.scandir(bus_dir) if entry.name.endswith('.sock')]
+    except OSError:
+        return 0
+
+    delivered = 0
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for path in paths:
+            try:
+                sock.sendto(data, path)
+                delivered += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Subscriber exited without removing its socket
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                pass  # Subscriber's queue is full: it misses this event, the others don't wait
+    _retain(bus_dir, message)
+    return delivered
+
+def _retain(bus_dir, message):
+    path = bus_dir / STATE_FILE
+    state = retained(bus_dir)
+    state[message['event']] = message
+    tmp = path.with_name(f'.{STATE_FILE}.{os.getpid()}')
+    try:
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def retained(bus_dir=None):
+    """{event: last message} as of the last publish"""
+    try:
+        with open(Path(bus_dir or default_bus_dir()) / STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def publish_brightness(level, source):
+    return publish('brightness', level=level, source=source)
+
+def publish_device(up, transport, address=None):
+    return publish('device', state='up' if up else 'down', transport=transport, address=address)
+
+class Subscriber:
+    """Receiving end: one datagram socket in the bus directory"""
+
+    def __init__(self, bus_dir=None, ignore_own=True):
+        self.bus_dir = Path(bus_dir or default_bus_dir())
+        self.bus_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.ignore_own = ignore_own
+        self.path = self.bus_dir / f"{os.getpid()}-{next(_socket_ids)}.sock"
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.sock.bind(str(self.path))
+            os.chmod(self.path, 0o600)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def receive(self, timeout=None):
+        """Next event from another process, or None if the timeout passes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.sock.settimeout(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            try:
+                data = self.sock.recv(MAX_MESSAGE)
+            except socket.timeout:
+                return None
+            try:
+                event = json.loads(data)
+            except ValueError:
+                continue
+            if self.ignore_own and event.get('pid') == os.getpid():
+                continue
+            return event
+
+def listen(callback, bus_dir=None):
+    """Call callback(event) from a daemon thread for every event from other processes
+
+    Returns the Subscriber, or None if the bus directory isn't usable.
+    """
+    try:
+        subscriber = Subscriber(bus_dir)
+    except OSError as e:
+        print(f"⚠️  Brightness bus unavailable: {e}")
+        return None
+
+    def run():
+        while True:
+            try:
+                event = subscriber.receive()
+            except OSError:
+                return  # Closed
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️  Brightness bus callback error: {e}")
+
+    threading.Thread(target=run, daemon=True, name='brightness-bus').start()
+    return subscriber
+
+def format_event(event):
+    when = time.strftime('%H:%M:%S', time.localtime(event.get('time', 0)))
+    if event.get('event') == 'brightness':
+        return f"{when}  💡 {event.get('level')}% from {event.get('source')}"
+    if event.get('event') == 'device':
+        address = f" at {event['address']}" if event.get('address') else ''
+        return f"{when}  {'🟢' if event.get('state') == 'up' else '🔴'} ESP32 {event.get('state')} ({event.get('transport')}{address})"
+    return f"{when}  {json.dumps(event)}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Brightness and device events on the local bus')
+    parser.add_argument('--watch', action='store_true', help='Print events as they happen')
+    parser.add_argument('--json', action='store_true', help='Print raw JSON (one event per line)')
+    args = parser.parse_args()
+
+    show = json.dumps if args.json else format_event
+    if not args.watch:
+        state = retained()
+        if not state:
+            print("No events published yet")
+        for event in state.values():
+            print(show(event))
+        return
+
+    try:
+        subscriber = Subscriber()
+    except OSError as e:
+        print(f"❌ Could not join the brightness bus: {e}")
+        sys.exit(1)
+    print(f"👂 Watching {subscriber.bus_dir}", file=sys.stderr)
+    try:
+        with subscriber:
+            while True:
+                print(show(subscriber.receive()), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
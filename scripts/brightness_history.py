@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped brightness and idle time-series log
+Fixed-size binary file per device with a raw event ring and automatic
+minute/hour rollups, so long-range usage queries never parse logs
+"""
+
+import argparse
+import fcntl
+import mmap
+import os
+import struct
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+MAGIC = b'IMDHIST1'
+BUCKETS = 21  # Brightness in 5% steps: 0%, 1-5%, ..., 96-100%
+MAX_GAP_SECONDS = 24 * 3600  # Longer gaps (machine off) are not attributed to any level
+
+KIND_BRIGHTNESS = 1
+KIND_IDLE = 2
+
+# Header: layout, ring write counters, and the rollup accumulators, so any
+# process (daemon or CLI) can continue where the previous writer stopped
+HEADER = struct.Struct(
+    '<8sIII'     # magic, raw/minute/hour ring capacities
+    'QQQ'        # raw/minute/hour records written
+    'dif d'      # last event time, last level (-1 unknown), last idle, last idle sample time
+    'IIHHH'      # minute accumulator: minute, level-seconds, covered, on, idle seconds
+    f'I{BUCKETS}IHH'  # hour accumulator: hour, seconds per bucket, covered, idle seconds
+)
+HEADER_SIZE = 512
+RAW = struct.Struct('<dBBxxf')          # time, kind, level, idle seconds
+MINUTE = struct.Struct('<IBBBx')        # minute index, mean level, on seconds, idle seconds
+HOUR = struct.Struct(f'<I{BUCKETS}HHH')  # hour index, seconds per bucket, covered, idle seconds
+
+def bucket_of(level):
+    return (max(0, min(100, level)) + 4) // 5
+
+def bucket_label(bucket):
+    return '0%' if bucket == 0 else f'{bucket * 5 - 4}-{bucket * 5}%'
+
+def default_history_dir():
+    # Under ~/.config: the auto-dimmer service can only write there
+    return Path.home() / '.config' / 'imacdimmer' / 'history'
+
+class BrightnessHistory:
+    """Append-only, bounded brightness/idle log with minute and hour rollups"""
+
+    def __init__(self, path, raw_capacity=65536, minute_capacity=31 * 1440, hour_capacity=2 * 366 * 24):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        with self._locked():
+            if os.fstat(self.fd).st_size < HEADER_SIZE:
+                self._create(raw_capacity, minute_capacity, hour_capacity)
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER.size)
+            if header[:8] != MAGIC:
+                raise ValueError(f"{self.path} is not a brightness history file")
+            _, self.raw_capacity, self.minute_capacity, self.hour_capacity = struct.unpack_from('<8sIII', header)
+
+        self.raw_offset = HEADER_SIZE
+        self.minute_offset = self.raw_offset + self.raw_capacity * RAW.size
+        self.hour_offset = self.minute_offset + self.minute_capacity * MINUTE.size
+        self.map = mmap.mmap(self.fd, self.hour_offset + self.hour_capacity * HOUR.size)
+
+    @classmethod
+    def for_device(cls, device='imacdimmer'):
+        return cls(default_history_dir() / f'{device}.hist')
+
+    def _create(self, raw_capacity, minute_capacity, hour_capacity):
+        size = (HEADER_SIZE + raw_capacity * RAW.size + minute_capacity * MINUTE.size
+                + hour_capacity * HOUR.size)
+        os.ftruncate(self.fd, size)
+        header = HEADER.pack(MAGIC, raw_capacity, minute_capacity, hour_capacity,
+                             0, 0, 0, 0.0, -1, 0.0, 0.0, 0, 0, 0, 0, 0, 0, *([0] * BUCKETS), 0, 0)
+        os.pwrite(self.fd, header, 0)
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    # --- writing --------------------------------------------------------
+
+    def _state(self):
+        return list(HEADER.unpack_from(self.map, 0))
+
+    def _append(self, offset, capacity, record_struct, count, *values):
+        record_struct.pack_into(self.map, offset + (count % capacity) * record_struct.size, *values)
+
+    def _advance(self, s, now):
+        """Attribute the time since the last event to the current level, flushing full buckets"""
+        last_time, level = s[7], s[8]
+        if level < 0 or last_time <= 0 or now <= last_time or now - last_time > MAX_GAP_SECONDS:
+            return
+        t = last_time
+        while t < now:
+            minute = self._rotate(s, t)
+            end = min(now, (minute + 1) * 60)
+            dt = end - t
+            s[12] += int(round(level * dt))
+            s[13] += int(round(dt))
+            if level > 0:
+                s[14] += int(round(dt))
+            s[17 + bucket_of(level)] += int(round(dt))
+            s[17 + BUCKETS] += int(round(dt))
+            t = end
+
+    def _rotate(self, s, t):
+        """Flush and reset the minute/hour accumulators if t is in a new bucket"""
+        minute, hour = int(t // 60), int(t // 3600)
+        if s[11] != minute:
+            self._flush_minute(s)
+            s[11:16] = [minute, 0, 0, 0, 0]
+        if s[16] != hour:
+            self._flush_hour(s)
+            s[16:16 + BUCKETS + 3] = [hour] + [0] * BUCKETS + [0, 0]
+        return minute
+
+    def _flush_minute(self, s):
+        minute, level_seconds, covered, on, idle = s[11:16]
+        if not covered:
+            return
+        self._append(self.minute_offset, self.minute_capacity, MINUTE, s[5],
+                     minute, min(100, level_seconds // covered), min(60, on), min(60, idle))
+        s[5] += 1
+
+    def _flush_hour(self, s):
+        hour = s[16]
+        buckets = s[17:17 + BUCKETS]
+        covered, idle = s[17 + BUCKETS], s[18 + BUCKETS]
+        if not covered:
+            return
+        self._append(self.hour_offset, self.hour_capacity, HOUR, s[6],
+                     hour, *[min(3600, b) for b in buckets], min(3600, covered), min(3600, idle))
+        s[6] += 1
+
+    def _record(self, now, kind, level=None, idle=None):
+        with self._locked():
+            s = self._state()
+            self._advance(s, now)
+            self._rotate(s, now)
+            if kind == KIND_BRIGHTNESS:
+                s[8] = level
+            else:
+                # Idle seconds since the previous sample, capped by what the sample reports
+                if s[10] > 0 and now > s[10]:
+                    idle_dt = int(round(min(now - s[10], idle, 3600)))
+                    s[15] += idle_dt
+                    s[18 + BUCKETS] += idle_dt
+                s[9], s[10] = idle, now
+            s[7] = max(s[7], now)
+            self._append(self.raw_offset, self.raw_capacity, RAW, s[4],
+                         now, kind, max(0, s[8]), idle if idle is not None else 0.0)
+            s[4] += 1
+            HEADER.pack_into(self.map, 0, *s)
+
+    def record_brightness(self, level, now=None):
+        self._record(now or time.time(), KIND_BRIGHTNESS, level=int(level))
+
+    def record_idle(self, idle_seconds, now=None):
+        self._record(now or time.time(), KIND_IDLE, idle=float(idle_seconds))
+
+    # --- queries --------------------------------------------------------
+
+    def _ring(self, offset, capacity, record_struct, count):
+        """Records in write order (oldest first)"""
+        n = min(count, capacity)
+        start = count - n
+        for i in range(start, count):
+            yield record_struct.unpack_from(self.map, offset + (i % capacity) * record_struct.size)
+
+    def hours(self, start=None, end=None):
+        """Hour rollups (including the current partial hour) as (hour_start, buckets, covered, idle)"""
+        s = self._state()
+        records = list(self._ring(self.hour_offset, self.hour_capacity, HOUR, s[6]))
+        if s[17 + BUCKETS]:
+            records.append((s[16], *s[17:17 + BUCKETS], s[17 + BUCKETS], s[18 + BUCKETS]))
+        for record in records:
+            hour_start = record[0] * 3600
+            if (start is None or hour_start >= start) and (end is None or hour_start < end):
+                yield hour_start, record[1:1 + BUCKETS], record[1 + BUCKETS], record[2 + BUCKETS]
+
+    def minutes(self, start=None, end=None):
+        s = self._state()
+        for minute, level, on, idle in self._ring(self.minute_offset, self.minute_capacity, MINUTE, s[5]):
+            if (start is None or minute * 60 >= start) and (end is None or minute * 60 < end):
+                yield minute * 60, level, on, idle
+
+    def events(self, limit=20):
+        s = self._state()
+        return list(self._ring(self.raw_offset, self.raw_capacity, RAW, s[4]))[-limit:]
+
+    def hours_at_brightness_per_day(self, start=None, end=None):
+        """{date: [hours in each 5% bucket]}"""
+        days = defaultdict(lambda: [0.0] * BUCKETS)
+        for hour_start, buckets, _, _ in self.hours(start, end):
+            day = days[datetime.fromtimestamp(hour_start).date()]
+            for i, seconds in enumerate(buckets):
+                day[i] += seconds / 3600
+        return dict(days)
+
+    def backlight_on_seconds(self, start=None, end=None):
+        return sum(sum(buckets[1:]) for _, buckets, _, _ in self.hours(start, end))
+
+def record_brightness_change(level, device='imacdimmer'):
+    """Best-effort logging for CLI tools; history problems never break brightness control"""
+    try:
+        history = BrightnessHistory.for_device(device)
+        history.record_brightness(level)
+        history.close()
+    except Exception as e:
+        print(f"⚠️  History log error: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Brightness history reports')
+    parser.add_argument('--device', default='imacdimmer', help='Device name (default: imacdimmer)')
+    parser.add_argument('--days', type=int, default=7, help='Days for the per-day report (default: 7)')
+    parser.add_argument('--events', type=int, metavar='N', help='Show the last N raw events')
+    args = parser.parse_args()
+
+    history = BrightnessHistory.for_device(args.device)
+
+    if args.events:
+        for t, kind, level, idle in history.events(args.events):
+            what = f"brightness {level}%" if kind == KIND_BRIGHTNESS else f"idle {idle:.0f}s"
+            print(f"{datetime.fromtimestamp(t):%Y-%m-%d %H:%M:%S}  {what}")
+        return
+
+    now = time.time()
+    print(f"📊 Hours at each brightness, last {args.days} days")
+    for day, buckets in sorted(history.hours_at_brightness_per_day(now - args.days * 86400).items()):
+        used = ', '.join(f"{bucket_label(i)}: {h:.1f}h" for i, h in enumerate(buckets) if h >= 0.05)
+        print(f"   {day}  {used or '-'}")
+
+    month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+    print(f"💡 Backlight on this month: {history.backlight_on_seconds(month_start) / 3600:.1f} hours")
+
+if __name__ == '__main__':
+    main()
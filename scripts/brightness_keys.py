@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Resident brightness-key listener
+Reads the brightness keys (and configurable combos) straight from evdev and
+applies the steps through an already-open transport, so a keypress costs one
+device command instead of an interpreter start, imports and config I/O
+"""
+
+import argparse
+import errno
+import fcntl
+import glob
+import os
+import selectors
+import struct
+import sys
+import threading
+import time
+
+from brightness_bus import publish_brightness, listen
+
+INPUT_DIR = '/dev/input'
+
+# linux/input.h
+EVENT = struct.Struct('llHHi')  # struct input_event: timeval, type, code, value
+EV_KEY = 0x01
+KEY_RELEASE, KEY_PRESS, KEY_REPEAT = 0, 1, 2
+KEY_MAX = 0x2ff
+CLOCK_MONOTONIC = 1
+
+def _ioc(direction, nr, size):
+    return (direction << 30) | (size << 16) | (ord('E') << 8) | nr
+
+def EVIOCGNAME(size):
+    return _ioc(2, 0x06, size)
+
+def EVIOCGBIT(event_type, size):
+    return _ioc(2, 0x20 + event_type, size)
+
+EVIOCSCLOCKID = _ioc(1, 0xa0, 4)
+
+# Names for bindings; any other key can be given by number (e.g. KEY_190 or 190)
+KEY_CODES = {
+    'KEY_LEFTCTRL': 29, 'KEY_RIGHTCTRL': 97,
+    'KEY_LEFTSHIFT': 42, 'KEY_RIGHTSHIFT': 54,
+    'KEY_LEFTALT': 56, 'KEY_RIGHTALT': 100,
+    'KEY_LEFTMETA': 125, 'KEY_RIGHTMETA': 126,
+    **{f'KEY_F{n}': code for n, code in zip(range(1, 11), range(59, 69))},
+    'KEY_F11': 87, 'KEY_F12': 88,
+    'KEY_UP': 103, 'KEY_DOWN': 108, 'KEY_PAGEUP': 104, 'KEY_PAGEDOWN': 109,
+    'KEY_MINUS': 12, 'KEY_EQUAL': 13, 'KEY_KPMINUS': 74, 'KEY_KPPLUS': 78,
+    'KEY_SCROLLLOCK': 70, 'KEY_PAUSE': 119,
+    'KEY_BRIGHTNESSDOWN': 224, 'KEY_BRIGHTNESSUP': 225,
+    'KEY_KBDILLUMDOWN': 229, 'KEY_KBDILLUMUP': 230,
+}
+
+DEFAULT_BINDINGS = ['KEY_BRIGHTNESSUP=up', 'KEY_BRIGHTNESSDOWN=down']
+
+def key_code(name):
+    name = name.strip().upper()
+    if name.isdigit():
+        return int(name)
+    if not name.startswith('KEY_'):
+        name = 'KEY_' + name
+    if name in KEY_CODES:
+        return KEY_CODES[name]
+    if name[4:].isdigit():
+        return int(name[4:])
+    try:
+        from evdev import ecodes  # Full key table, if python-evdev happens to be installed
+        return ecodes.ecodes[name]
+    except (ImportError, KeyError):
+        raise ValueError(f"unknown key '{name}' (use its number, e.g. KEY_190)")
+
+def parse_binding(spec):
+    """'KEY_LEFTMETA+KEY_F2=down' -> (modifier codes, key code, action)
+
+    Actions: up, down, or a preset level such as 20.
+    """
+    keys, sep, action = spec.partition('=')
+    action = action.strip().lower()
+    if not sep or not keys.strip():
+        raise ValueError(f"binding '{spec}' should look like KEYS=ACTION")
+    if action not in ('up', 'down') and not action.isdigit():
+        raise ValueError(f"binding '{spec}': action must be up, down or a brightness level")
+    codes = [key_code(name) for name in keys.split('+')]
+    return frozenset(codes[:-1]), codes[-1], action
+
+class Accelerator:
+    """Step size that grows while a key is held and the kernel repeats it"""
+
+    def __init__(self, step=5, max_step=20, ramp=4):
+        self.base = step
+        self.max_step = max_step
+        self.ramp = ramp
+
+    def step(self, repeats):
+        return min(self.max_step, self.base * (1 + repeats // self.ramp))
+
+class BrightnessApplier(threading.Thread):
+    """Sends the latest target level; presses that arrive during a command are coalesced
+
+    The config and history are written once the keys have been quiet for
+    persist_after seconds, not on every step.
+    """
+
+    def __init__(self, transport, current, persist, minimum=5, persist_after=1.0, verbose=False):
+        super().__init__(daemon=True, name='brightness-applier')
+        self.transport = transport
+        self.persist = persist
+        self.minimum = minimum
+        self.persist_after = persist_after
+        self.verbose = verbose
+        self.target = current
+        self.applied = current
+        self.persisted = current
+        self.pressed_at = None  # Monotonic time of the keypress behind the pending target
+        self.condition = threading.Condition()
+
+    def adjust(self, delta, pressed_at=None):
+        with self.condition:
+            self._set(self.target + delta, pressed_at)
+
+    def set(self, value, pressed_at=None):
+        with self.condition:
+            self._set(value, pressed_at)
+
+    def sync(self, level):
+        """Level set by another tool (brightness bus); the next press starts from it"""
+        with self.condition:
+            if self.target == self.applied:
+                self.target = self.applied = self.persisted = level
+
+    def _set(self, value, pressed_at):
+        value = max(self.minimum, min(100, value))
+        if value != self.target:
+            self.target = value
+            if self.pressed_at is None:
+                self.pressed_at = pressed_at
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.target == self.applied:
+                    timeout = None if self.applied == self.persisted else self.persist_after
+                    self.condition.wait(timeout)
+                    if self.target == self.applied:
+                        if self.applied != self.persisted:
+                            self.persist(self.applied)
+                            self.persisted = self.applied
+                        continue
+                value, pressed_at = self.target, self.pressed_at
+                self.pressed_at = None
+
+            sent_at = time.monotonic()
+            response = self.transport.command(str(value))
+            ok = response is not None and "Brightness set to" in response
+            if ok:
+                publish_brightness(value, 'brightness-keys')
+            with self.condition:
+                if ok:
+                    self.applied = value
+                elif self.target == value:
+                    self.target = self.applied  # Let the next press start from what the device has
+            if self.verbose:
+                queued = f", key to send {(sent_at - pressed_at) * 1000:.1f} ms" if pressed_at else ''
+                print(f"{'💡' if ok else '❌'} {value}% in {(time.monotonic() - sent_at) * 1000:.1f} ms{queued}")
+            elif not ok:
+                print(f"❌ Failed to set brightness: {response}")
+
+def device_name(fd):
+    buf = bytearray(256)
+    try:
+        length = fcntl.ioctl(fd, EVIOCGNAME(len(buf)), buf)
+    except OSError:
+        return '?'
+    return buf[:max(0, length - 1)].decode(errors='replace')
+
+def supported_keys(fd):
+    """Key bitmap of an input device"""
+    buf = bytearray(KEY_MAX // 8 + 1)
+    fcntl.ioctl(fd, EVIOCGBIT(EV_KEY, len(buf)), buf)
+    return buf
+
+def has_key(bitmap, code):
+    return bool(bitmap[code // 8] & (1 << (code % 8)))
+
+class KeyListener:
+    """Watches every input device that has one of the bound keys"""
+
+    def __init__(self, bindings, applier, accelerator, rescan_interval=5.0):
+        self.bindings = bindings
+        self.keys = {key for _, key, _ in bindings}
+        self.tracked = self.keys.union(*(modifiers for modifiers, _, _ in bindings))
+        self.applier = applier
+        self.accelerator = accelerator
+        self.rescan_interval = rescan_interval
+        self.selector = selectors.DefaultSelector()
+        self.devices = {}  # path -> fd
+        self.held = set()
+        self.repeats = {}
+        self.denied = set()
+        self.monotonic = set()  # Devices whose event times are on the monotonic clock
+
+    def scan(self):
+        """Open devices that appeared since the last scan"""
+        for path in sorted(glob.glob(os.path.join(INPUT_DIR, 'event*'))):
+            if path in self.devices:
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            except PermissionError:
+                self.denied.add(path)
+                continue
+            except OSError:
+                continue
+            try:
+                bitmap = supported_keys(fd)
+            except OSError:
+                os.close(fd)
+                continue
+            if not any(has_key(bitmap, key) for key in self.keys):
+                os.close(fd)
+                continue
+            try:
+                # Event times on the monotonic clock, to measure keypress-to-command latency
+                fcntl.ioctl(fd, EVIOCSCLOCKID, struct.pack('i', CLOCK_MONOTONIC))
+                self.monotonic.add(fd)
+            except OSError:
+                pass
+            self.denied.discard(path)
+            self.devices[path] = fd
+            self.selector.register(fd, selectors.EVENT_READ, path)
+            print(f"⌨️  Listening on {path} ({device_name(fd)})")
+
+    def remove(self, path):
+        fd = self.devices.pop(path)
+        self.selector.unregister(fd)
+        self.monotonic.discard(fd)
+        os.close(fd)
+        print(f"⌨️  {path} removed")
+
+    def match(self, code):
+        """Binding for a key with the currently held modifiers; the most specific one wins"""
+        best = None
+        for modifiers, key, action in self.bindings:
+            if key == code and modifiers <= self.held and (best is None or len(modifiers) > len(best[0])):
+                best = (modifiers, key, action)
+        return best
+
+    def handle(self, code, value, pressed_at):
+        if value == KEY_RELEASE:
+            self.held.discard(code)
+            self.repeats.pop(code, None)
+            return
+        if value == KEY_PRESS:
+            self.held.add(code)
+            self.repeats[code] = 0
+        else:
+            self.repeats[code] = self.repeats.get(code, 0) + 1
+
+        binding = self.match(code)
+        if binding is None:
+            return
+        action = binding[2]
+        if action == 'up':
+            self.applier.adjust(self.accelerator.step(self.repeats[code]), pressed_at)
+        elif action == 'down':
+            self.applier.adjust(-self.accelerator.step(self.repeats[code]), pressed_at)
+        elif value == KEY_PRESS:
+            self.applier.set(int(action), pressed_at)
+
+    def read(self, path, fd):
+        try:
+            data = os.read(fd, EVENT.size * 64)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return
+            self.remove(path)  # ENODEV: unplugged
+            return
+        monotonic = fd in self.monotonic
+        for offset in range(0, len(data) - EVENT.size + 1, EVENT.size):
+            sec, usec, event_type, code, value = EVENT.unpack_from(data, offset)
+            if event_type == EV_KEY and code in self.tracked:
+                self.handle(code, value, sec + usec / 1e6 if monotonic else None)
+
+    def serve(self):
+        self.scan()
+        if not self.devices:
+            if self.denied:
+                print("❌ No permission to read input devices; add yourself to the 'input' group:")
+                print("   sudo usermod -aG input $USER   (then log in again)")
+            else:
+                print("❌ No input device has the bound keys")
+            return False
+        last_scan = time.monotonic()
+        while True:
+            for key, _ in self.selector.select(self.rescan_interval):
+                self.read(key.data, key.fd)
+            if time.monotonic() - last_scan >= self.rescan_interval:
+                self.scan()
+                last_scan = time.monotonic()
+
+def open_transport(serial_port, hedged=False):
+    """(transport, current brightness, persist callback)"""
+    if serial_port is not None and not hedged:
+        from imacdisplay import SerialTransport, get_brightness, save_config
+        from brightness_history import record_brightness_change
+
+        transport = SerialTransport(serial_port or None)
+        transport.open()
+        current = get_brightness()
+    else:
+        try:
+            import imacdisplay_http as control
+        except ImportError:
+            # Installed as /usr/local/bin/imacdisplay.py
+            sys.path.insert(0, '/usr/local/bin')
+            import imacdisplay as control
+        from brightness_history import record_brightness_change
+
+        save_config = control.save_config
+        control.get_discovery_worker()
+        if hedged:
+            from hedged_transport import open_hedged
+            transport = open_hedged(serial_port)
+        else:
+            transport = control.HttpTransport()
+        status = transport.status()
+        current = status.brightness if status and status.brightness is not None else control.get_brightness()
+
+    def persist(value):
+        save_config(brightness=value)
+        record_brightness_change(value)
+
+    return transport, current, persist
+
+def main():
+    parser = argparse.ArgumentParser(description='Resident brightness-key listener (evdev)')
+    parser.add_argument('-b', '--bind', action='append', metavar='KEYS=ACTION',
+                        help='Key binding, e.g. KEY_LEFTMETA+KEY_F2=down or KEY_F5=20 (repeatable; '
+                             'default: the brightness keys)')
+    parser.add_argument('--no-default-keys', action='store_true',
+                        help='Only use the --bind keys, not KEY_BRIGHTNESSUP/DOWN')
+    parser.add_argument('--step', type=int, default=5, help='Step per keypress in percent (default: 5)')
+    parser.add_argument('--max-step', type=int, default=20,
+                        help='Largest step while a key is held (default: 20)')
+    parser.add_argument('--ramp', type=int, default=4,
+                        help='Key repeats before the step grows by another --step (default: 4)')
+    parser.add_argument('--serial', nargs='?', const='', metavar='PORT',
+                        help='Use the serial connection (optionally on PORT) instead of HTTP')
+    parser.add_argument('--hedged', action='store_true',
+                        help='Send over HTTP and serial (--serial PORT picks the port), first acknowledgement wins')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print the latency of every step')
+    args = parser.parse_args()
+
+    specs = ([] if args.no_default_keys else DEFAULT_BINDINGS) + (args.bind or [])
+    try:
+        bindings = [parse_binding(spec) for spec in specs]
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if not bindings:
+        print("❌ No key bindings")
+        sys.exit(2)
+
+    try:
+        transport, current, persist = open_transport(args.serial, args.hedged)
+    except ImportError as e:
+        if args.hedged:
+            print(f"❌ Hedged mode isn't installed, run brightness_keys.py from the repository checkout ({e})")
+        else:
+            print(f"❌ Could not load the brightness control module: {e}")
+        sys.exit(1)
+    print(f"💡 Current brightness {current}%, step {args.step}% (up to {args.max_step}% while held)")
+    applier = BrightnessApplier(transport, current, persist, verbose=args.verbose)
+    applier.start()
+    listen(lambda event: applier.sync(event['level']) if event.get('event') == 'brightness' else None)
+    listener = KeyListener(bindings, applier, Accelerator(args.step, args.max_step, args.ramp))
+    try:
+        if not listener.serve():
+            sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
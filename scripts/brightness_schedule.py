@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Time-of-day brightness schedule
+Compiles a day curve of keyframes into a table of change points, so the
+daemon only wakes up when the brightness actually changes
+"""
+
+import bisect
+from datetime import datetime
+
+SECONDS_PER_DAY = 24 * 3600
+INTERPOLATIONS = ('step', 'linear')
+
+def parse_time_of_day(value):
+    """Parse "HH:MM" or "HH:MM:SS" into seconds since midnight"""
+    parts = [int(p) for p in str(value).split(':')]
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3:
+        raise ValueError(f"Invalid time of day: {value!r}")
+    hours, minutes, seconds = parts
+    if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+        raise ValueError(f"Invalid time of day: {value!r}")
+    return hours * 3600 + minutes * 60 + seconds
+
+def format_time_of_day(seconds):
+    seconds = int(seconds) % SECONDS_PER_DAY
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+class BrightnessSchedule:
+    """Day curve compiled into a sorted table of (second_of_day, level) change points"""
+
+    def __init__(self, keyframes, interpolation='step', resolution=1):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation: {interpolation}")
+        if not keyframes:
+            raise ValueError("Schedule needs at least one keyframe")
+
+        self.interpolation = interpolation
+        self.resolution = max(1, int(resolution))
+        self.keyframes = sorted(
+            (parse_time_of_day(k['time']), max(0, min(100, int(k['level']))))
+            for k in keyframes
+        )
+        self.table = self._compile()
+        self._times = [t for t, _ in self.table]
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a schedule from the auto-dimmer config, or None if not configured"""
+        keyframes = config.get('schedule')
+        if not keyframes:
+            return None
+        return cls(keyframes,
+                   interpolation=config.get('schedule_interpolation', 'step'),
+                   resolution=config.get('schedule_resolution', 1))
+
+    def _compile(self):
+        """Expand keyframes into every point where the integer level changes"""
+        points = {}
+        frames = self.keyframes
+        for i, (t0, a) in enumerate(frames):
+            points[t0] = a
+            if self.interpolation != 'linear' or len(frames) == 1:
+                continue
+
+            # Segment runs to the next keyframe, wrapping past midnight
+            t1, b = frames[(i + 1) % len(frames)]
+            if t1 <= t0:
+                t1 += SECONDS_PER_DAY
+            if a == b:
+                continue
+
+            step = self.resolution if b > a else -self.resolution
+            for level in range(a + step, b, step):
+                t = t0 + (level - a) / (b - a) * (t1 - t0)
+                points[int(round(t)) % SECONDS_PER_DAY] = level
+
+        # Drop points that don't change the level (e.g. keyframe equal to its predecessor)
+        table = []
+        for t, level in sorted(points.items()):
+            if not table or table[-1][1] != level:
+                table.append((t, level))
+        if len(table) > 1 and table[0][1] == table[-1][1]:
+            table.pop(0)
+        return table
+
+    def _index_at(self, second_of_day):
+        # Last change point at or before the given time; wraps to the last point of the day
+        return bisect.bisect_right(self._times, second_of_day) - 1
+
+    def level_at(self, second_of_day):
+        """Scheduled brightness level at the given second of the day"""
+        return self.table[self._index_at(second_of_day)][1]
+
+    def next_change(self, second_of_day):
+        """Return (seconds_until_change, level) for the next change point after now"""
+        index = (self._index_at(second_of_day) + 1) % len(self.table)
+        t, level = self.table[index]
+        delay = t - second_of_day
+        if delay <= 0:
+            delay += SECONDS_PER_DAY
+        return delay, level
+
+    def describe(self):
+        return [f"{format_time_of_day(t)}  {level}%" for t, level in self.table]
+
+def seconds_since_midnight(now=None):
+    now = now or datetime.now()
+    return now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+On-demand brightness service with systemd socket activation
+The first client connection starts the controller; it then serves requests
+over an already-warm transport and exits after an idle period
+"""
+
+import argparse
+import json
+import os
+import selectors
+import socket
+import sys
+import time
+from pathlib import Path
+
+try:
+    from imacdisplay_http import HttpTransport, get_brightness, save_config, get_discovery_worker
+except ImportError:
+    # Installed as /usr/local/bin/imacdisplay.py
+    sys.path.insert(0, '/usr/local/bin')
+    from imacdisplay import HttpTransport, get_brightness, save_config, get_discovery_worker
+from brightness_history import record_brightness_change
+from brightness_bus import publish_brightness
+
+SD_LISTEN_FDS_START = 3
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or f'/run/user/{os.getuid()}'
+    return Path(runtime_dir) / 'imacdimmer.sock'
+
+def listen_fds():
+    """Sockets passed by systemd (LISTEN_PID/LISTEN_FDS), as in sd_listen_fds(3)"""
+    try:
+        if int(os.environ.get('LISTEN_PID', '0')) != os.getpid():
+            return []
+        count = int(os.environ.get('LISTEN_FDS', '0'))
+    except ValueError:
+        return []
+    finally:
+        for name in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+            os.environ.pop(name, None)
+
+    sockets = []
+    for fd in range(SD_LISTEN_FDS_START, SD_LISTEN_FDS_START + count):
+        os.set_inheritable(fd, False)
+        sockets.append(socket.socket(fileno=fd))
+    return sockets
+
+def bind_socket(path):
+    """Listening socket for running without systemd"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(str(path))
+    os.chmod(path, 0o600)
+    sock.listen(8)
+    return sock
+
+class BrightnessController:
+    """Line protocol: set N, inc N, dec N, get, version, ping, status"""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def set_level(self, value):
+        response = self.transport.command(str(value))
+        if response and "Brightness set to" in response:
+            save_config(brightness=value)
+            record_brightness_change(value)
+            publish_brightness(value, 'brightness-service')
+            return f"ok {value}"
+        return f"error {response or 'no response'}"
+
+    def handle(self, line):
+        parts = line.split()
+        if not parts:
+            return "error empty command"
+        action, args = parts[0].lower(), parts[1:]
+        try:
+            if action == 'set' and len(args) == 1:
+                return self.set_level(max(5, min(100, int(args[0]))))  # Same limits as the CLI
+            if action == 'inc' and len(args) == 1:
+                return self.set_level(min(get_brightness() + int(args[0]), 100))
+            if action == 'dec' and len(args) == 1:
+                return self.set_level(max(get_brightness() - int(args[0]), 5))
+        except ValueError:
+            return f"error invalid value: {args[0]}"
+        if action == 'status' and not args:
+            status = self.transport.status()
+            return f"ok {json.dumps(status.as_dict())}" if status else "error no response"
+        if action in ('get', 'version', 'ping') and not args:
+            response = self.transport.command(action)
+            return f"ok {response}" if response else "error no response"
+        return f"error unknown command: {line.strip()}"
+
+class BrightnessService:
+    """Serves controller requests on the listening sockets until idle
+
+    A connection that sends nothing for idle_timeout seconds is closed, so
+    a client that holds its socket open can't keep the service running.
+    """
+
+    def __init__(self, sockets, controller, idle_timeout=300):
+        self.controller = controller
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        for sock in sockets:
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, self._accept)
+        self.buffers = {}
+        self.last_seen = {}  # Connection -> time of its last request
+
+    def _accept(self, sock):
+        conn, _ = sock.accept()
+        conn.setblocking(False)
+        self.buffers[conn] = bytearray()
+        self.last_seen[conn] = time.monotonic()
+        self.selector.register(conn, selectors.EVENT_READ, self._read)
+
+    def _close(self, conn):
+        self.selector.unregister(conn)
+        self.buffers.pop(conn, None)
+        self.last_seen.pop(conn, None)
+        conn.close()
+
+    def _read(self, conn):
+        try:
+            data = conn.recv(4096)
+        except ConnectionError:
+            data = b''
+        if not data:
+            self._close(conn)
+            return
+
+        self.last_seen[conn] = time.monotonic()
+        buffer = self.buffers[conn]
+        buffer += data
+        while b'\n' in buffer:
+            index = buffer.index(b'\n')
+            line = buffer[:index].decode(errors='replace')
+            del buffer[:index + 1]
+            reply = self.controller.handle(line)
+            try:
+                conn.setblocking(True)
+                conn.sendall(reply.encode() + b'\n')
+                conn.setblocking(False)
+            except OSError:
+                self._close(conn)
+                return
+
+    def serve(self):
+        last_activity = time.monotonic()
+        while True:
+            now = time.monotonic()
+            for conn, seen in list(self.last_seen.items()):
+                if now - seen >= self.idle_timeout:
+                    self._close(conn)
+            if self.last_seen:
+                timeout = min(self.last_seen.values()) + self.idle_timeout - now
+            else:
+                timeout = last_activity + self.idle_timeout - now
+                if timeout <= 0:
+                    print(f"💤 Idle for {self.idle_timeout}s, exiting")
+                    return
+            events = self.selector.select(timeout)
+            for key, _ in events:
+                key.data(key.fileobj)
+            if events:
+                last_activity = time.monotonic()
+
+def send_request(line, path=None, timeout=10):
+    """Minimal client: send one command line and return the reply"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path or default_socket_path()))
+        sock.sendall(line.encode() + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return reply.decode().strip()
+
+def main():
+    parser = argparse.ArgumentParser(description='Socket-activated brightness service')
+    parser.add_argument('--socket', help='Socket path when not started by systemd '
+                                         '(default: $XDG_RUNTIME_DIR/imacdimmer.sock)')
+    parser.add_argument('--idle-timeout', type=float, default=300,
+                        help='Exit after this many idle seconds (default: 300)')
+    parser.add_argument('-c', '--client', metavar='COMMAND',
+                        help='Send one command (e.g. "set 40") to a running service and exit')
+    args = parser.parse_args()
+
+    if args.client:
+        try:
+            print(send_request(args.client, args.socket))
+        except OSError as e:
+            print(f"❌ Could not reach brightness service: {e}")
+            sys.exit(1)
+        return
+
+    sockets = listen_fds()
+    if sockets:
+        print(f"🔌 Socket-activated with {len(sockets)} socket(s)")
+    else:
+        path = args.socket or default_socket_path()
+        sockets = [bind_socket(path)]
+        print(f"🔌 Listening on {path}")
+
+    get_discovery_worker()
+    service = BrightnessService(sockets, BrightnessController(HttpTransport()), args.idle_timeout)
+    try:
+        service.serve()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
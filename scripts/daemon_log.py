@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Leveled, rate-limited structured logging for the long-running daemons
+Lines go to stdout (the journal under systemd) with key=value fields and a
+syslog priority prefix. Repeats of one event are rate limited, and every
+event, debug included, is kept in an in-memory ring that can be dumped on
+demand without restarting or turning up the log level
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+# sd-daemon(3) prefixes: journald strips them and files the line at that priority
+PRIORITY_PREFIX = {10: '<7>', 20: '<6>', 30: '<4>', 40: '<3>'}
+
+def format_fields(fields):
+    """key=value pairs, quoting values that contain spaces, '=' or quotes"""
+    parts = []
+    for key, value in fields.items():
+        text = str(value)
+        if not text or any(c in text for c in ' ="'):
+            text = json.dumps(text)
+        parts.append(f"{key}={text}")
+    return ' '.join(parts)
+
+class RateLimiter:
+    """Token bucket per event name: `burst` lines at once, then one per `interval` seconds"""
+
+    def __init__(self, burst=10, interval=300, clock=time.monotonic):
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        self.buckets = {}  # event -> [tokens, last refill, suppressed since last line]
+
+    def allow(self, event):
+        """(allowed, number of lines suppressed since the last allowed one)"""
+        now = self.clock()
+        bucket = self.buckets.get(event)
+        if bucket is None:
+            bucket = self.buckets[event] = [float(self.burst), now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) / self.interval)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False, 0
+        bucket[0] -= 1
+        suppressed, bucket[2] = bucket[2], 0
+        return True, suppressed
+
+class DaemonLog:
+    """Structured log with a level threshold, per-event rate limits and a debug ring
+
+    Every call lands in the ring whatever the level. Only calls at or above
+    the level that pass the rate limit are written. Safe to call from
+    executor threads.
+    """
+
+    def __init__(self, level='info', ring_size=1000, burst=10, interval=300, stream=None):
+        self.level = LEVELS[level]
+        self.base_level = self.level
+        self.ring = deque(maxlen=ring_size)
+        self.limiter = RateLimiter(burst, interval)
+        self.stream = stream  # None: sys.stdout at write time, so redirect_stdout works
+        self.prefix = bool(os.environ.get('JOURNAL_STREAM'))  # Set when stdout is the journal
+        self.lock = threading.Lock()
+
+    def set_level(self, level):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level '{level}' (choose from {', '.join(LEVELS)})")
+        self.level = self.base_level = LEVELS[level]
+
+    def log(self, severity, event, message, /, **fields):
+        levelno = LEVELS[severity]
+        with self.lock:
+            self.ring.append((time.time(), levelno, event, message, fields))
+            if levelno < self.level:
+                return
+            allowed, suppressed = self.limiter.allow(event)
+            if not allowed:
+                return
+            if suppressed:
+                fields = dict(fields, suppressed=suppressed)
+            self._write(levelno, message, dict(event=event, **fields))
+
+    def debug(self, event, message, /, **fields):
+        self.log('debug', event, message, **fields)
+
+    def info(self, event, message, /, **fields):
+        self.log('info', event, message, **fields)
+
+    def warning(self, event, message, /, **fields):
+        self.log('warning', event, message, **fields)
+
+    def error(self, event, message, /, **fields):
+        self.log('error', event, message, **fields)
+
+    def _write(self, levelno, message, fields):
+        stream = self.stream or sys.stdout
+        prefix = PRIORITY_PREFIX[levelno] if self.prefix else ''
+        try:
+            stream.write(f"{prefix}{message}  {format_fields(fields)}\n")
+            stream.flush()  # Steady state writes only transitions, so every line can go out at once
+        except (OSError, ValueError):
+            pass
+
+    def toggle_debug(self):
+        """Switch between the configured level and debug (SIGUSR2)"""
+        with self.lock:
+            self.level = self.base_level if self.level == LEVELS['debug'] else LEVELS['debug']
+            level = LEVEL_NAMES[self.level]
+        self.info('log_level', f"📝 Log level now {level}", level=level)
+
+    def dump(self):
+        """Write the whole ring, bypassing level and rate limits (SIGUSR1)"""
+        with self.lock:
+            entries = list(self.ring)
+            stream = self.stream or sys.stdout
+            prefix = PRIORITY_PREFIX[LEVELS['info']] if self.prefix else ''
+            try:
+                stream.write(f"{prefix}🧾 Debug ring: {len(entries)} events  event=ring_dump\n")
+                for when, levelno, event, message, fields in entries:
+                    stamp = datetime.fromtimestamp(when).strftime('%H:%M:%S.%f')[:-3]
+                    stream.write(f"{prefix}  {stamp} {LEVEL_NAMES[levelno]:7} {message}  "
+                                 f"{format_fields(dict(event=event, **fields))}\n")
+                stream.flush()
+            except (OSError, ValueError):
+                pass
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Python emulator of the ESP32 dimmer firmware (src/main.cpp)
+Reproduces the serial and HTTP command handling, including integer PWM
+rounding and the 50-character serial input limit, for hardware-free testing
+"""
+
+import json
+import os
+import re
+import select
+import struct
+import threading
+import time
+import tty
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from serial_frames import (PROTOCOL, SOF, MAX_PAYLOAD, HEADER, HEARTBEAT, REPLY, OP_PING, OP_VERSION,
+                           OP_SET, OP_GET, OP_TEXT, OP_HEARTBEAT, OP_NAK, STATUS_OK, STATUS_BAD_ARG,
+                           STATUS_UNKNOWN_OP, STATUS_BAD_FRAME, crc16, encode_frame)
+
+FIRMWARE_VERSION = "1.8.0-framed-serial"
+BUILD_DATE = "Jan  1 2025 00:00:00"
+MAX_INPUT_LENGTH = 50
+
+# Firmware timing, for emulators run with firmware_timing=True
+BLINK_DELAY = 0.05        # delay(50) of the status LED blink: every heartbeat and every set
+HEARTBEAT_INTERVAL = 2.0  # Status blink/heartbeat period in loop()
+LOOP_TIME = 0.0002        # One loop() pass, which consumes at most one serial byte
+
+def arduino_map(x, in_min, in_max, out_min, out_max):
+    """Arduino map(): integer arithmetic, truncating like the C++ original"""
+    return int((x - in_min) * (out_max - out_min) / (in_max - in_min)) + out_min
+
+def to_int(value):
+    """Arduino String::toInt(): leading integer or 0"""
+    match = re.match(r'\s*([+-]?\d+)', value)
+    return int(match.group(1)) if match else 0
+
+class FirmwareEmulator:
+    """Firmware state and command handling, without any I/O"""
+
+    def __init__(self):
+        self.brightness = (70 * 255) // 100  # setup() starts at 70%
+        self.input_buffer = ''
+        self.framed = False
+        self.frame_buffer = bytearray()
+        self.started = time.monotonic()
+        self.commands = 0
+
+    def millis(self):
+        return int((time.monotonic() - self.started) * 1000)
+
+    def percent(self):
+        return arduino_map(self.brightness, 0, 255, 0, 100)
+
+    def set_percent(self, percent):
+        percent = max(0, min(100, percent))
+        self.brightness = arduino_map(percent, 0, 100, 0, 255)
+        return percent
+
+    def heartbeat(self):
+        return f"Heartbeat: {self.millis()}, WiFi: OK, Brightness: {self.brightness}"
+
+    def heartbeat_bytes(self):
+        """Heartbeat as sent on the wire in the current protocol mode"""
+        if self.framed:
+            return encode_frame(0, OP_HEARTBEAT, HEARTBEAT.pack(self.millis() & 0xFFFFFFFF, 1, self.brightness))
+        return (self.heartbeat() + '\r\n').encode()
+
+    def serial_command(self, command):
+        """Lines printed for one complete serial command"""
+        self.commands += 1
+        lines = [f"Received command: '{command}'"]
+        if command == 'version':
+            lines.append(f"Firmware: {FIRMWARE_VERSION}, Build: {BUILD_DATE}, Protocols: text {PROTOCOL}")
+        elif command == 'ping':
+            lines.append("pong")
+        elif command == PROTOCOL:
+            lines.append(f"Framed mode: {PROTOCOL}")
+        elif command[0].isdigit():
+            percent = max(0, min(100, to_int(command)))
+            if 0 < percent < 5:
+                lines.append("Warning: minimum safe brightness is 5%")
+            self.set_percent(percent)
+            lines.append(f"Brightness set to: {percent}%")
+        else:
+            lines.append(f"Unknown command: '{command}'")
+        return lines
+
+    def frame_command(self, seq, op, payload):
+        """Reply frame for one framed request"""
+        self.commands += 1
+        if op == OP_PING:
+            reply = bytes((STATUS_OK,))
+        elif op == OP_VERSION:
+            reply = bytes((STATUS_OK,)) + f"{FIRMWARE_VERSION}\0{BUILD_DATE}".encode()
+        elif op == OP_SET:
+            if len(payload) != 1 or payload[0] > 100:
+                reply = bytes((STATUS_BAD_ARG,))
+            else:
+                percent = self.set_percent(payload[0])
+                reply = bytes((STATUS_OK, percent, self.brightness))
+        elif op == OP_GET:
+            reply = bytes((STATUS_OK, self.percent(), self.brightness))
+        elif op == OP_TEXT:
+            self.framed = False
+            reply = bytes((STATUS_OK,))
+        else:
+            return encode_frame(seq, op | REPLY, bytes((STATUS_UNKNOWN_OP,)))
+        return encode_frame(seq, op | REPLY, reply)
+
+    def _frame_byte(self, byte):
+        """Collect one byte of a frame; returns reply bytes once the frame is complete"""
+        buffer = self.frame_buffer
+        buffer.append(byte)
+        if len(buffer) < HEADER.size:
+            return b''
+        _, length, seq, op = HEADER.unpack_from(buffer)
+        if length > MAX_PAYLOAD:
+            buffer.clear()
+            return encode_frame(seq, OP_NAK, bytes((STATUS_BAD_FRAME,)))
+        if len(buffer) < HEADER.size + length + 2:
+            return b''
+        body = bytes(buffer[1:HEADER.size + length])
+        (crc,) = struct.unpack_from('<H', buffer, HEADER.size + length)
+        buffer.clear()
+        if crc != crc16(body):
+            return encode_frame(seq, OP_NAK, bytes((STATUS_BAD_FRAME,)))
+        return self.frame_command(seq, op, body[3:])
+
+    def feed_serial(self, data):
+        """Feed raw serial bytes through the firmware's input loop; returns output bytes"""
+        output = bytearray()
+        for byte in data:
+            if self.framed and (self.frame_buffer or byte == SOF):
+                output += self._frame_byte(byte)
+                continue
+            c = chr(byte)
+            if len(self.input_buffer) > MAX_INPUT_LENGTH:
+                self.input_buffer = ''
+            if c in '\r\n':
+                command = self.input_buffer.strip()
+                if command:
+                    # A text line in framed mode means a text client took over
+                    self.framed = False
+                    lines = self.serial_command(command)
+                    output += ''.join(line + '\r\n' for line in lines).encode()
+                    self.framed = command == PROTOCOL
+                self.input_buffer = ''
+            elif 32 <= byte <= 126:
+                self.input_buffer += c
+        return bytes(output)
+
+    def http_serial(self, cmd):
+        """GET /serial?cmd=... -> (status, body)"""
+        self.commands += 1
+        if cmd == 'version':
+            return 200, f"Firmware: {FIRMWARE_VERSION}, Build: {BUILD_DATE}"
+        if cmd == 'ping':
+            return 200, "pong"
+        if cmd == 'get':
+            return 200, f"Current brightness: {self.percent()}%"
+        if (cmd == '0' or to_int(cmd) > 0) and to_int(cmd) <= 100:
+            percent = self.set_percent(to_int(cmd))
+            return 200, f"Brightness set to: {percent}%"
+        return 200, f"Unknown command: {cmd}"
+
+    def wifistatus(self):
+        return {
+            'connected': True,
+            'ssid': 'emulator',
+            'rssi': -50,
+            'ip': '127.0.0.1',
+            'brightness': self.brightness,
+            'firmware_version': FIRMWARE_VERSION,
+            'build_date': BUILD_DATE,
+        }
+
+    def http_get(self, path, params=None):
+        """Route an HTTP GET like the firmware's WebServer -> (status, body)"""
+        params = params or {}
+        if path == '/serial':
+            if 'cmd' not in params:
+                return 400, "Missing 'cmd' parameter"
+            return self.http_serial(params['cmd'])
+        if path == '/wifistatus':
+            return 200, json.dumps(self.wifistatus())
+        if path == '/version':
+            return 200, json.dumps({'firmware_version': FIRMWARE_VERSION, 'build_date': BUILD_DATE})
+        return 404, "Not found"
+
+class EmulatorTransport:
+    """Transport with the same command() interface as HttpTransport"""
+
+    name = 'emulator'
+
+    def __init__(self, emulator=None):
+        self.emulator = emulator or FirmwareEmulator()
+
+    def command(self, cmd):
+        status, body = self.emulator.http_serial(cmd)
+        return body if status == 200 else None
+
+class PtyEmulator:
+    """Firmware emulator behind a pseudo-terminal, so real serial clients run without hardware
+
+    Open `device` with pyserial. Heartbeats are interleaved like the firmware's
+    loop(); with corrupting set, every corrupt_every-th request frame gets a
+    flipped CRC byte before the emulator sees it. With firmware_timing, input
+    is consumed one byte per loop() pass and the LED blink delays stall it,
+    so the emulator saturates the way the device does.
+    """
+
+    def __init__(self, emulator=None, heartbeat_interval=2.0, corrupt_every=0, firmware_timing=False):
+        self.emulator = emulator or FirmwareEmulator()
+        self.heartbeat_interval = heartbeat_interval
+        self.corrupt_every = corrupt_every
+        self.firmware_timing = firmware_timing
+        self.corrupting = False
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self.lock = threading.Lock()
+        self._frames = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='pty-emulator')
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _corrupt(self, data):
+        if not (self.corrupting and self.corrupt_every and SOF in data):
+            return data
+        self._frames += 1
+        if self._frames % self.corrupt_every:
+            return data
+        return data[:-1] + bytes((data[-1] ^ 0xFF,))
+
+    def _run(self):
+        next_heartbeat = time.monotonic() + self.heartbeat_interval
+        while not self._stop.is_set():
+            timeout = max(0.0, min(0.05, next_heartbeat - time.monotonic()))
+            readable, _, _ = select.select([self.master], [], [], timeout)
+            output = b''
+            with self.lock:
+                if readable:
+                    try:
+                        # One USB packet at a time when timed, so a backlog stays in the pty
+                        data = os.read(self.master, 64 if self.firmware_timing else 4096)
+                    except OSError:
+                        data = b''
+                    if self.firmware_timing:
+                        next_heartbeat = self._feed_timed(self._corrupt(data), next_heartbeat)
+                    else:
+                        output += self.emulator.feed_serial(self._corrupt(data))
+                if self.heartbeat_interval and time.monotonic() >= next_heartbeat:
+                    if self.firmware_timing:
+                        time.sleep(BLINK_DELAY)
+                    output += self.emulator.heartbeat_bytes()
+                    next_heartbeat = time.monotonic() + self.heartbeat_interval
+            if output:
+                os.write(self.master, output)
+
+    def _feed_timed(self, data, next_heartbeat):
+        """Consume input like loop(): one byte per pass, stalled by the blink delays
+
+        Returns the updated heartbeat deadline.
+        """
+        started = time.monotonic()
+        for i in range(len(data)):
+            # Pace in small batches; sleeping per byte would overshoot
+            if i % 25 == 0:
+                lag = started + i * LOOP_TIME - time.monotonic()
+                if lag > 0:
+                    time.sleep(lag)
+            if self.heartbeat_interval and time.monotonic() >= next_heartbeat:
+                time.sleep(BLINK_DELAY)
+                os.write(self.master, self.emulator.heartbeat_bytes())
+                next_heartbeat = time.monotonic() + self.heartbeat_interval
+                started = time.monotonic() - i * LOOP_TIME
+            output = self.emulator.feed_serial(data[i:i + 1])
+            if not output:
+                continue
+            reply = output.find(b'Brightness set to')
+            if reply >= 0:
+                # The echo goes out before applyBrightness() blinks the LED
+                os.write(self.master, output[:reply])
+                time.sleep(BLINK_DELAY)
+                output = output[reply:]
+                started = time.monotonic() - i * LOOP_TIME
+            os.write(self.master, output)
+        return next_heartbeat
+
+class HttpEmulator:
+    """Firmware emulator behind a local, single-threaded HTTP server
+
+    Like the firmware's WebServer, one request is handled at a time and
+    further connections wait in the listen backlog. With firmware_timing,
+    brightness changes and the periodic LED blink stall the server.
+    """
+
+    def __init__(self, emulator=None, firmware_timing=False, host='127.0.0.1', port=0):
+        self.emulator = emulator or FirmwareEmulator()
+        self.firmware_timing = firmware_timing
+        self.next_blink = time.monotonic() + HEARTBEAT_INTERVAL
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                owner._stall()
+                status, body = owner.emulator.http_get(url.path, params)
+                if owner.firmware_timing and body.startswith('Brightness set to'):
+                    time.sleep(BLINK_DELAY)
+                data = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer((host, port), Handler)
+        self.address = '%s:%d' % self.server.server_address[:2]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True, name='http-emulator')
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.server.shutdown()
+        self.server.server_close()
+
+    def _stall(self):
+        if self.firmware_timing and time.monotonic() >= self.next_blink:
+            time.sleep(BLINK_DELAY)
+            self.next_blink = time.monotonic() + HEARTBEAT_INTERVAL
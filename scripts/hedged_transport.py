@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Hedged brightness commands over two transports (HTTP and USB serial)
+Absolute brightness commands go to the primary transport and, when no
+acknowledgement arrives within the primary's recent p95 latency, to the
+secondary too. The first acknowledgement wins; the late duplicate is ignored,
+and one that hasn't been sent yet is cancelled
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+ACK = "Brightness set to"
+
+def acknowledged(response):
+    return bool(response) and ACK in response
+
+def is_absolute(cmd):
+    """Absolute brightness commands can be sent twice without changing the outcome"""
+    return cmd.isdigit()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class Lane:
+    """One transport with its own worker thread, so its commands run in order
+
+    At most one command waits behind the one in flight: a newer command
+    cancels an older one that hasn't started, since only the last absolute
+    level matters.
+    """
+
+    def __init__(self, transport, window=50, min_samples=10, default_delay=0.3, min_delay=0.02):
+        self.transport = transport
+        self.name = getattr(transport, 'name', type(transport).__name__)
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix=f'hedge-{self.name}')
+        self.latencies = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.last = None  # Future of the newest command on this lane
+        self.cancelled = 0
+
+    def busy(self):
+        return self.last is not None and not self.last.done()
+
+    def submit(self, func, *args):
+        if self.last is not None and self.last.cancel():
+            self.cancelled += 1
+        self.last = self.executor.submit(func, *args)
+        return self.last
+
+    def send(self, cmd):
+        return self.submit(self._timed, cmd)
+
+    def _timed(self, cmd):
+        started = time.monotonic()
+        try:
+            response = self.transport.command(cmd)
+        except Exception as e:
+            print(f"⚠️  {self.name} command failed: {e}")
+            return None
+        if acknowledged(response):
+            self.latencies.append(time.monotonic() - started)
+        return response
+
+    def hedge_delay(self):
+        """How long to wait for an acknowledgement before hedging: p95 of recent ones"""
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, percentile(self.latencies, 0.95))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+
+class HedgedTransport:
+    """Transport with the command() interface that races two transports for brightness changes
+
+    Other commands (get, version, ping) go to the primary, falling back to
+    the secondary when it doesn't answer.
+    """
+
+    name = 'hedged'
+
+    def __init__(self, primary, secondary, timeout=5.0):
+        self.primary = Lane(primary)
+        self.secondary = Lane(secondary)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sets = 0
+        self.hedged = 0
+        self.wins = {self.primary.name: 0, self.secondary.name: 0}
+        self.duplicates = 0  # Acknowledgements that arrived after another transport's
+        # Opening a serial port waits out the ESP32 boot; do it off the command path
+        for lane in (self.primary, self.secondary):
+            if hasattr(lane.transport, 'open'):
+                lane.executor.submit(lane.transport.open)
+
+    def status(self, max_age=None):
+        for lane in (self.primary, self.secondary):
+            if hasattr(lane.transport, 'status'):
+                return lane.transport.status(max_age)
+        return None
+
+    def command(self, cmd):
+        if not is_absolute(cmd):
+            response = self.primary.transport.command(cmd)
+            return response if response is not None else self.secondary.transport.command(cmd)
+        with self.lock:
+            return self._hedged_command(cmd)
+
+    def _hedged_command(self, cmd):
+        self.sets += 1
+        deadline = time.monotonic() + self.timeout
+        primary_busy = self.primary.busy()
+        lanes = {self.primary.send(cmd): self.primary}
+        if primary_busy or self.secondary.busy():
+            # The primary is still stuck on an earlier command, or an older level may
+            # still land on the secondary: use both now, in order behind what's in flight
+            lanes[self.secondary.send(cmd)] = self.secondary
+        else:
+            done, _ = wait(lanes, timeout=self.primary.hedge_delay())
+            if not any(acknowledged(future.result()) for future in done):
+                self.hedged += 1
+                lanes[self.secondary.send(cmd)] = self.secondary
+
+        pending = set(lanes)
+        response = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                result = None if future.cancelled() else future.result()
+                if acknowledged(result):
+                    self.wins[lanes[future].name] += 1
+                    for loser in pending:
+                        loser.add_done_callback(self._count_duplicate)
+                    return result
+                response = response or result
+        return response
+
+    def _count_duplicate(self, future):
+        if not future.cancelled() and future.exception() is None and acknowledged(future.result()):
+            self.duplicates += 1
+
+    def describe(self):
+        return (f"{self.primary.name}→{self.secondary.name}: {self.sets} sets, {self.hedged} hedged, "
+                f"wins {', '.join(f'{name} {count}' for name, count in self.wins.items())}, "
+                f"{self.duplicates} late duplicates ignored, "
+                f"{self.primary.cancelled + self.secondary.cancelled} stale sends cancelled, "
+                f"hedge after {self.primary.hedge_delay() * 1000:.0f}ms")
+
+    def close(self):
+        self.primary.close()
+        self.secondary.close()
+
+def open_hedged(serial_port=None, primary='http'):
+    """HedgedTransport over HTTP and serial; raises ImportError if either module is missing"""
+    sys.path.append(str(Path(__file__).parent))
+    from imacdisplay_http import HttpTransport
+    from imacdisplay import SerialTransport
+
+    http = HttpTransport()
+    serial = SerialTransport(serial_port or None)
+    if primary == 'serial':
+        return HedgedTransport(serial, http)
+    return HedgedTransport(http, serial)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Idle trace recording and offline policy replay
+The daemon records a compact binary trace of user activity; replay runs it
+through the AutoDimmer dim/restore logic at full speed for any parameters
+"""
+
+import argparse
+import itertools
+import os
+import struct
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+MAGIC = b'IDLTRACE'
+HEADER = struct.Struct('<8sd')   # magic, start time (epoch seconds)
+RECORD = struct.Struct('<If')    # seconds since start, idle seconds (-1 = daemon (re)start)
+GAP = -1.0
+KEEPALIVE_SECONDS = 3600
+
+class TraceWriter:
+    """Appends idle samples, but only when the user's last input time moved
+
+    Continuous idleness costs nothing; a keepalive record is written hourly
+    so replay knows how long the trace runs.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self.file = open(self.path, 'ab')
+        if new_file:
+            self.start = time.time()
+            self.file.write(HEADER.pack(MAGIC, self.start))
+        else:
+            with open(self.path, 'rb') as f:
+                _, self.start = HEADER.unpack(f.read(HEADER.size))
+        self.last_input = None
+        self.last_written = None
+
+    def _write(self, offset, idle):
+        self.file.write(RECORD.pack(max(0, int(offset)), idle))
+        self.file.flush()
+        self.last_written = offset
+
+    def record(self, timestamp, idle):
+        offset = timestamp - self.start
+        last_input = offset - idle
+        if self.last_input is None:
+            self._write(offset, GAP)  # Nothing is known about the time before this sample
+        if (self.last_input is None or last_input > self.last_input + 1
+                or offset - self.last_written >= KEEPALIVE_SECONDS):
+            self._write(offset, idle)
+        self.last_input = last_input if self.last_input is None else max(self.last_input, last_input)
+
+    def close(self):
+        self.file.close()
+
+def read_trace(path):
+    """Trace as a list of segments, each a list of (seconds, idle) samples"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, _ = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an idle trace")
+
+    body = data[HEADER.size:]
+    body = body[:len(body) - len(body) % RECORD.size]  # Ignore a torn final record
+    segments = []
+    for offset, idle in RECORD.iter_unpack(body):
+        if idle == GAP or not segments:
+            segments.append([])
+        if idle != GAP:
+            segments[-1].append((offset, idle))
+    return [segment for segment in segments if segment]
+
+def idle_samples(segment, interval):
+    """Reconstruct the idle time a daemon polling every `interval` seconds would see"""
+    last_inputs = []
+    latest = float('-inf')
+    for t, idle in segment:
+        latest = max(latest, t - idle)
+        last_inputs.append(latest)
+
+    j = 0
+    t = segment[0][0]
+    end = segment[-1][0]
+    while t <= end:
+        while j + 1 < len(segment) and segment[j + 1][0] <= t:
+            j += 1
+        last_input = last_inputs[j]
+        # An input recorded by the next sample may already have happened by now
+        if j + 1 < len(segment) and last_inputs[j + 1] <= t:
+            last_input = last_inputs[j + 1]
+        yield t, max(0.0, t - last_input)
+        t += interval
+
+def replay(segments, idle_minutes, dim_level, check_interval, false_dim_seconds=60):
+    """Run a trace through the dim/restore logic; returns policy metrics"""
+    from auto_dimmer import AutoDimmer
+    from device_emulator import EmulatorTransport
+
+    class ReplayDimmer(AutoDimmer):
+        def load_dimmer_config(self):
+            pass
+
+    transport = EmulatorTransport()
+    metrics = {'dims': 0, 'false_dims': 0, 'dimmed_seconds': 0.0, 'device_commands': 0}
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for segment in segments:
+            dimmer = ReplayDimmer(idle_minutes, dim_level, check_interval, transport=transport)
+            dimmed_at = None
+            for t, idle in idle_samples(segment, check_interval):
+                action = dimmer.decide(idle)
+                if action == 'dim' and dimmer.dim_display():
+                    metrics['dims'] += 1
+                    dimmed_at = t
+                elif action == 'restore' and dimmer.restore_brightness():
+                    metrics['dimmed_seconds'] += t - dimmed_at
+                    returned_at = t - idle
+                    if returned_at - dimmed_at <= false_dim_seconds:
+                        metrics['false_dims'] += 1
+                    dimmed_at = None
+            if dimmed_at is not None:
+                metrics['dimmed_seconds'] += segment[-1][0] - dimmed_at
+    metrics['device_commands'] = transport.emulator.commands
+    return metrics
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded idle traces through the auto-dimmer policy')
+    parser.add_argument('traces', nargs='+', help='Trace files recorded with auto_dimmer.py --record-trace')
+    parser.add_argument('-m', '--minutes', type=float, nargs='+', default=[10],
+                        help='Idle minutes before dimming (several values for a sweep)')
+    parser.add_argument('-l', '--level', type=int, nargs='+', default=[0], help='Dim level(s)')
+    parser.add_argument('-i', '--interval', type=float, nargs='+', default=[30], help='Check interval(s) in seconds')
+    parser.add_argument('--false-dim-seconds', type=float, default=60,
+                        help='A restore within this many seconds of a dim counts as a false dim (default: 60)')
+    args = parser.parse_args()
+
+    segments = []
+    for path in args.traces:
+        segments.extend(read_trace(path))
+    covered = sum(s[-1][0] - s[0][0] for s in segments)
+    print(f"📼 {len(args.traces)} trace(s), {len(segments)} segment(s), {covered / 86400:.1f} days")
+    print(f"{'minutes':>8} {'level':>6} {'interval':>9} {'dims':>6} {'false':>6} "
+          f"{'dimmed h':>9} {'commands':>9} {'ms':>7}")
+
+    for minutes, level, interval in itertools.product(args.minutes, args.level, args.interval):
+        started = time.perf_counter()
+        m = replay(segments, minutes, level, interval, args.false_dim_seconds)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{minutes:>8g} {level:>6} {interval:>9g} {m['dims']:>6} {m['false_dims']:>6} "
+              f"{m['dimmed_seconds'] / 3600:>9.1f} {m['device_commands']:>9} {elapsed_ms:>7.1f}")
+
+if __name__ == '__main__':
+    main()
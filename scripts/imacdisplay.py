@@ -3,28 +3,41 @@ import serial
 import argparse
 import sys
 import time
+import threading
 from pathlib import Path
 import json
-import glob
 import traceback
+from contextlib import redirect_stdout
+
+from serial_hotplug import get_hotplug_watcher
+from serial_identity import get_identity_index, format_device_id
+from serial_io import SerialChannel, deadline_after
+from batch_script import parse_script, run_batch, print_result
+from serial_frames import negotiate
+from brightness_bus import publish_brightness, publish_device
 
 def get_config_file():
     return Path.home() / '.config' / 'imacdisplay.conf'
 
-def find_esp32_device():
-    """Try to automatically detect the ESP32-C3 device port."""
-    # Common ESP32 device patterns
-    patterns = ['/dev/ttyACM*', '/dev/ttyUSB*']
-    devices = []
+def find_esp32_device(device_id=None):
+    """Try to automatically detect the ESP32-C3 device port (None if no dimmer is attached)."""
+    watcher = get_hotplug_watcher()
+    if not watcher.event_driven:
+        watcher.refresh()
+
+    # Select by USB identity (configured device_id, then known ESP32 IDs)
+    index = get_identity_index()
+    dev = index.find_dimmer(device_id)
+    if dev:
+        return dev
 
-    for pattern in patterns:
-        devices.extend(glob.glob(pattern))
+    # Serial devices with identities, but none of them is ours
+    if index.available:
+        return None
 
-    # Prioritize ACM devices first (ESP32-C3), then USB devices (older ESP32)
-    for dev in sorted(devices):
-        if 'ACM' in dev:
-            return dev
-    for dev in devices:
+    # No sysfs identities (e.g. not Linux): ACM devices (ESP32-C3) first,
+    # then USB devices (older ESP32)
+    for dev in watcher.devices():
         return dev
 
     # If no devices found, return the default
@@ -37,10 +50,15 @@ def load_config():
             with open(config_file) as f:
                 config = json.load(f)
 
-            # Check if the configured port exists, otherwise try to find it
-            if not Path(config['port']).exists():
-                print(f"Configured port {config['port']} not found, searching for ESP32...")
-                config['port'] = find_esp32_device()
+            # Check the configured port still is our device, otherwise find it
+            device_id = config.get('device_id')
+            if not config.get('port') or not Path(config['port']).exists():
+                print(f"Configured port {config.get('port')} not found, searching for ESP32...")
+                config['port'] = find_esp32_device(device_id)
+            elif device_id:
+                identity = get_identity_index().identity_of(config['port'])
+                if identity and format_device_id(identity) != device_id:
+                    config['port'] = find_esp32_device(device_id)
 
             return config
     except Exception as e:
@@ -48,7 +66,10 @@ def load_config():
 
     # Default configuration with auto-detection
     default_port = find_esp32_device()
-    print(f"Using auto-detected port: {default_port}")
+    if default_port:
+        print(f"Using auto-detected port: {default_port}")
+    else:
+        print("No ESP32 dimmer found (see --list-devices)")
     return {'port': default_port, 'last_brightness': 70}
 
 def save_config(brightness=None, port=None):
@@ -60,6 +81,9 @@ def save_config(brightness=None, port=None):
 
     if port is not None:
         config['port'] = port
+        identity = get_identity_index().identity_of(port)
+        if identity:
+            config['device_id'] = format_device_id(identity)
 
     try:
         config_file.parent.mkdir(parents=True, exist_ok=True)
@@ -72,6 +96,9 @@ def setup_serial(port=None, exclusive=True):
     if port is None:
         config = load_config()
         port = config['port']
+    if port is None:
+        print("Error: No ESP32 dimmer found, not opening a serial port")
+        return None
 
     try:
         # Close any existing port first
@@ -119,25 +146,112 @@ def setup_serial(port=None, exclusive=True):
 
         return None
 
-def set_brightness(ser, value):
+class SerialTransport:
+    """Serial connection that follows the ESP32 across USB detach/attach"""
+
+    name = 'serial'
+
+    def __init__(self, port=None, exclusive=True, framed=False):
+        self.port = port
+        self.exclusive = exclusive
+        self.use_framing = framed
+        self.ser = None
+        self.channel = None
+        self.framed = None  # FramedChannel once the firmware agreed to framing
+        self.detached = False  # Lost to a USB detach; the next open announces the device again
+        self.device_id = None  # USB identity of the port last opened, to recognise it on re-attach
+        self._lock = threading.Lock()
+        get_hotplug_watcher().add_listener(self.on_attach, self.on_detach)
+
+    def open(self):
+        with self._lock:
+            if self.ser is None:
+                self.ser = setup_serial(self.port, exclusive=self.exclusive)
+                if self.ser:
+                    self.port = self.ser.port
+                    self.channel = SerialChannel(self.ser)
+                    identity = get_identity_index().identity_of(self.port)
+                    if identity:
+                        self.device_id = format_device_id(identity)
+                    if self.detached:
+                        self.detached = False
+                        publish_device(True, 'serial', self.port)
+                    if self.use_framing:
+                        self.framed = negotiate(self.channel, deadline_after(3.0))
+                        print("Using framed serial protocol" if self.framed
+                              else "Firmware has no framed protocol, using text commands")
+            return self.ser
+
+    def close(self):
+        with self._lock:
+            if self.channel:
+                try:
+                    if self.framed:
+                        self.framed.leave()
+                    self.channel.close()
+                except Exception:
+                    pass
+            self.ser = None
+            self.channel = None
+            self.framed = None
+
+    def on_detach(self, device):
+        if self.ser is not None and device == self.port:
+            print(f"🔌 {device} detached")
+            self.close()
+            self.detached = True
+            publish_device(False, 'serial', device)
+
+    def is_dimmer(self, device):
+        """Whether a newly attached tty is our ESP32, by USB identity where sysfs has one"""
+        index = get_identity_index()
+        if index.available:
+            return device == index.find_dimmer(self.device_id)
+        return self.port is None or device == self.port
+
+    def on_attach(self, device):
+        if self.ser is None and self.is_dimmer(device):
+            print(f"🔌 {device} attached, reconnecting...")
+            self.port = device
+            # Don't block the watcher thread with the ESP32 boot wait
+            threading.Thread(target=self._reconnect, daemon=True).start()
+
+    def _reconnect(self, attempts=3):
+        # udev may still be fixing up permissions right after the node appears
+        for _ in range(attempts):
+            if self.open():
+                return
+            time.sleep(0.5)
+
+    def command(self, cmd, timeout=2.0):
+        """Send a text command and return its reply line, or None after timeout seconds"""
+        if self.open() is None:
+            return None
+        with self._lock:
+            try:
+                if self.framed:
+                    return self.framed.command(cmd, deadline_after(timeout))
+                return self.channel.request(cmd, deadline_after(timeout))
+            except (serial.SerialException, OSError) as e:
+                print(f"Serial error: {e}")
+                self.ser = None
+                self.channel = None
+                self.framed = None
+                return None
+
+def set_brightness(transport, value):
     """Set brightness with safety limits - reads response"""
     try:
         value = max(5, min(100, value)) # Keep safety limits
 
         print(f"Sending brightness command: {value}")
-        command = f"{value}\n"
-        ser.write(command.encode())
-        ser.flush() # Ensure data is sent
-
-        # --- Add code to read the response ---
-        # Wait briefly for the response (adjust timeout if needed)
-        # ser.timeout = 1 # Set read timeout (optional, uses the default from setup_serial if not set)
-        response = ser.readline().decode().strip()
+        response = transport.command(str(value))
         if response:
             print(f"Received response: {response}")
+            if "Brightness set to" in response:
+                publish_brightness(value, 'imacdisplay')
         else:
             print("Warning: No response received from ESP32 (timeout?).")
-        # --- End added code ---
 
         print(f"Set brightness to {value}%")
         save_config(value)
@@ -146,14 +260,44 @@ def set_brightness(ser, value):
         print(f"Error setting brightness: {e}")
         traceback.print_exc() # Print detailed traceback
         return None
-    # finally: # No longer needed as readline handles waiting
-    #     pass
 
 def get_brightness():
     """Get last saved brightness value"""
     config = load_config()
     return config.get('last_brightness', 70)
 
+def run_script(path, port=None, exclusive=True, allow_zero=False, delay=0.0, framed=False):
+    """Batch mode: one JSON result per command on stdout, diagnostics on stderr"""
+    try:
+        if path == '-':
+            steps = parse_script(sys.stdin.readlines())
+        else:
+            with open(path) as f:
+                steps = parse_script(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    with redirect_stdout(sys.stderr):
+        config = load_config()
+        transport = SerialTransport(port, exclusive=exclusive, framed=framed)
+        ser = transport.open()
+    if not ser:
+        print_result({'ok': False, 'error': 'could not open serial connection'})
+        return 1
+
+    try:
+        results, final = run_batch(transport, steps, config.get('last_brightness', 70),
+                                   allow_zero=allow_zero, delay=delay, on_result=print_result)
+    finally:
+        transport.close()
+    with redirect_stdout(sys.stderr):
+        # One config write for the whole script
+        if final != config.get('last_brightness', 70):
+            save_config(final)
+            publish_brightness(final, 'imacdisplay')
+    return 0 if all(r['ok'] for r in results) else 1
+
 def main():
     parser = argparse.ArgumentParser(description='iMac Display Brightness Control')
     group = parser.add_mutually_exclusive_group()
@@ -165,10 +309,31 @@ def main():
     parser.add_argument('-p', '--port', help='Serial port (default: auto-detect)')
     parser.add_argument('--non-exclusive', action='store_true', help='Use non-exclusive access to serial port')
     parser.add_argument('--allow-zero', action='store_true', help='Allow setting brightness to 0')
+    parser.add_argument('--list-devices', action='store_true', help='List USB serial devices and their identities')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='Run a command script (set/inc/dec N, get, version, ping, sleep S; "-" for stdin) '
+                             'over one connection, printing JSON results')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds between batch commands (default: 0)')
+    parser.add_argument('--framed', action='store_true',
+                        help='Use the framed binary serial protocol if the firmware supports it')
     args = parser.parse_args()
 
+    if args.batch:
+        sys.exit(run_script(args.batch, args.port, exclusive=not args.non_exclusive,
+                            allow_zero=args.allow_zero, delay=args.delay, framed=args.framed))
+
     print(f"Command arguments: {args}")
 
+    if args.list_devices:
+        identities = get_identity_index().identities()
+        if not identities:
+            print("No USB serial devices found")
+        for identity in identities:
+            print(f"{identity.device}: {format_device_id(identity)} "
+                  f"interface {identity.interface} ({identity.manufacturer} {identity.product})")
+        print(f"Selected: {find_esp32_device(load_config().get('device_id')) or 'none (no dimmer found)'}")
+        return
+
     if args.get:
         # Simply print the current brightness value
         print(f"Current brightness: {get_brightness()}")
@@ -176,15 +341,12 @@ def main():
     
     if args.version:
         # Get version via serial connection
-        ser = None
+        transport = SerialTransport(args.port, exclusive=not args.non_exclusive, framed=args.framed)
         try:
-            ser = setup_serial(args.port, exclusive=not args.non_exclusive)
+            ser = transport.open()
             if ser:
                 print("Getting firmware version...")
-                ser.write(b"version\n")
-                ser.flush()
-                time.sleep(0.5)  # Wait for response
-                response = ser.readline().decode().strip()
+                response = transport.command("version")
                 if response:
                     print(f"Firmware response: {response}")
                 else:
@@ -194,17 +356,17 @@ def main():
         except Exception as e:
             print(f"Error getting version: {e}")
         finally:
-            if ser:
-                ser.close()
+            transport.close()
         return
 
     # For set, increment, or decrement, we need the serial connection
-    ser = None
+    transport = SerialTransport(args.port, exclusive=not args.non_exclusive, framed=args.framed)
     try:
-        ser = setup_serial(args.port, exclusive=not args.non_exclusive)
+        ser = transport.open()
         if not ser and not args.non_exclusive:
             print("Retrying with non-exclusive access...")
-            ser = setup_serial(args.port, exclusive=False)
+            transport.exclusive = False
+            ser = transport.open()
         if ser:
             current = get_brightness()
             print(f"Current brightness: {current}")
@@ -213,21 +375,21 @@ def main():
                 new_value = args.set
                 print(f"Setting brightness to {new_value}")
                 if args.allow_zero or new_value > 0:
-                    set_brightness(ser, new_value)
+                    set_brightness(transport, new_value)
             elif args.increment is not None:
                 new_value = min(current + args.increment, 100)
-                set_brightness(ser, new_value)
+                set_brightness(transport, new_value)
             elif args.decrement is not None:
                 if args.allow_zero:
                     new_value = max(current - args.decrement, 0)
                 else:
                     new_value = max(current - args.decrement, 5)
-                set_brightness(ser, new_value)
+                set_brightness(transport, new_value)
         else:
             print("Failed to open serial connection")
     finally:
-        if ser:
-            ser.close()
+        if transport.ser:
+            transport.close()
             print("Serial connection closed")
 
 if __name__ == '__main__':
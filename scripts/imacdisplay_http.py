@@ -3,8 +3,17 @@ import requests
 import argparse
 import sys
 import json
+import re
+import socket
+import struct
+import time
+import threading
+from collections import namedtuple
 from pathlib import Path
 
+from brightness_history import record_brightness_change
+from brightness_bus import publish_brightness, publish_device
+
 def get_config_file():
     return Path.home() / '.config' / 'imacdisplay.conf'
 
@@ -21,28 +30,61 @@ def load_config():
     # Default configuration with your ESP32 IP
     return {'esp32_ip': '10.0.1.27', 'last_brightness': 70}
 
-def save_config(brightness=None, esp32_ip=None):
+_config_lock = threading.Lock()
+
+MAX_NETWORKS = 16
+
+def save_config(brightness=None, esp32_ip=None, network=None, esp32_mac=None):
     config_file = get_config_file()
-    config = load_config()
-    
-    if brightness is not None:
-        config['last_brightness'] = brightness
-    
-    if esp32_ip is not None:
-        config['esp32_ip'] = esp32_ip
-    
-    try:
-        config_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(config_file, 'w') as f:
-            json.dump(config, f)
-    except Exception as e:
-        print(f"Error saving config: {e}")
+    with _config_lock:
+        config = load_config()
+        
+        if brightness is not None:
+            config['last_brightness'] = brightness
+        
+        if esp32_ip is not None:
+            config['esp32_ip'] = esp32_ip
+            if network:
+                # Remember the device per network so switching networks needs no scan
+                networks = config.setdefault('networks', {})
+                networks[network] = {'esp32_ip': esp32_ip, 'esp32_mac': esp32_mac,
+                                     'last_seen': int(time.time())}
+                for stale in sorted(networks, key=lambda k: networks[k].get('last_seen', 0))[:-MAX_NETWORKS]:
+                    del networks[stale]
+        
+        try:
+            config_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(config_file, 'w') as f:
+                json.dump(config, f)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+
+# Espressif MAC address prefixes (OUIs)
+ESP_OUIS = ['10:00:3b', '24:6f:28', '30:ae:a4', '7c:df:a1', 'cc:50:e3']
+
+def parse_arp_candidates(output):
+    """IPs in `arp -a` output whose MAC has an Espressif OUI"""
+    candidates = []
+    for line in output.split('\n'):
+        for oui in ESP_OUIS:
+            if oui in line.lower():
+                ip_match = re.search(r'\(([\d.]+)\)', line)
+                if ip_match:
+                    candidates.append(ip_match.group(1))
+    return candidates
+
+def parse_route_networks(output):
+    """Local /24 prefixes (e.g. '192.168.1') from `ip route` output, link-local excluded"""
+    networks = []
+    for line in output.split('\n'):
+        match = re.search(r'(\d+\.\d+\.\d+)\.\d+/\d+.*src (\d+\.\d+\.\d+\.\d+)', line)
+        if match and not match.group(1).startswith('169.254'):  # Skip link-local
+            networks.append(match.group(1))
+    return list(set(networks))  # Remove duplicates
 
 def discover_esp32():
     """Try to discover ESP32 IP address using multiple methods"""
-    import socket
     import subprocess
-    import re
     
     def check_ip(ip):
         try:
@@ -59,17 +101,10 @@ def discover_esp32():
     try:
         result = subprocess.run(['arp', '-a'], capture_output=True, text=True, timeout=5)
         if result.returncode == 0:
-            # Look for Espressif MAC addresses (common OUIs: 10:00:3b, 24:6f:28, etc.)
-            esp_ouis = ['10:00:3b', '24:6f:28', '30:ae:a4', '7c:df:a1', 'cc:50:e3']
-            for line in result.stdout.split('\n'):
-                for oui in esp_ouis:
-                    if oui in line.lower():
-                        ip_match = re.search(r'\(([\d.]+)\)', line)
-                        if ip_match:
-                            ip = ip_match.group(1)
-                            print(f"📡 Found ESP32 MAC in ARP table: {ip}")
-                            if check_ip(ip):
-                                return ip
+            for ip in parse_arp_candidates(result.stdout):
+                print(f"📡 Found ESP32 MAC in ARP table: {ip}")
+                if check_ip(ip):
+                    return ip
     except:
         pass
     
@@ -93,13 +128,7 @@ def discover_esp32():
     try:
         # Get all local network interfaces
         result = subprocess.run(['ip', 'route'], capture_output=True, text=True, timeout=5)
-        networks = []
-        for line in result.stdout.split('\n'):
-            match = re.search(r'(\d+\.\d+\.\d+)\.\d+/\d+.*src (\d+\.\d+\.\d+\.\d+)', line)
-            if match and not match.group(1).startswith('169.254'):  # Skip link-local
-                networks.append(match.group(1))
-        
-        networks = list(set(networks))  # Remove duplicates
+        networks = parse_route_networks(result.stdout)
         print(f"🌐 Scanning networks: {networks}")
         
         # Quick scan of common device IPs
@@ -115,6 +144,72 @@ def discover_esp32():
     
     return None
 
+class CircuitBreaker:
+    """Per-device circuit breaker for an unreachable ESP32
+
+    Opens after consecutive failures so requests fail fast instead of walking
+    the whole discovery chain. While open, a single cheap probe is allowed
+    once the backoff has elapsed; each failed probe doubles the backoff.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=2, base_backoff=5.0, max_backoff=300.0):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.backoff = base_backoff
+        self.opened_at = None
+
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.backoff:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def retry_in(self):
+        """Seconds until the next half-open probe is allowed"""
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.opened_at + self.backoff - time.monotonic())
+
+    def record_success(self):
+        self.failures = 0
+        self.backoff = self.base_backoff
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None:
+            # Failed half-open probe: back off further
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self.opened_at = time.monotonic()
+        elif self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+_breakers = {}
+
+# Reused across requests so long-running callers keep connections warm
+_session = requests.Session()
+
+def get_breaker(device):
+    """Return the circuit breaker for a device address, creating it on first use"""
+    if device not in _breakers:
+        _breakers[device] = CircuitBreaker()
+    return _breakers[device]
+
+def probe_device(address, timeout=2):
+    """Single cheap reachability check used for half-open probes"""
+    try:
+        response = requests.get(f"http://{address}/version", timeout=timeout)
+        return response.status_code == 200 and "firmware_version" in response.text
+    except Exception:
+        return False
+
 def try_hostname_first():
     """Try to connect via mDNS hostname first"""
     try:
@@ -125,68 +220,406 @@ def try_hostname_first():
         pass
     return None
 
-def http_request(endpoint, params=None):
-    config = load_config()
-    esp32_address = config.get('esp32_ip')
+class EndpointNotFound(Exception):
+    """404 on a probe request: the device answered but doesn't serve the endpoint"""
+
+def http_request(endpoint, params=None, probe=False):
+    """Response text, or None on failure; with probe, a 404 raises EndpointNotFound
+
+    A 404 on a probe means older firmware, not an unreachable device, so it
+    is kept away from the circuit breaker and rediscovery.
+    """
+    esp32_address = _address_cache.get() or network_address(load_config())
     
-    # Always try hostname first (mDNS)
-    hostname = try_hostname_first()
-    if hostname:
-        esp32_address = hostname
-        # Update config to remember this works
-        save_config(esp32_ip=hostname)
+    breaker = get_breaker(esp32_address)
+    was_open = breaker.opened_at is not None
+    state = breaker.state()
+    if state == CircuitBreaker.OPEN:
+        print(f"ESP32 at {esp32_address} unreachable, next retry in {breaker.retry_in():.0f}s")
+        return None
+    if state == CircuitBreaker.HALF_OPEN:
+        probe_address = esp32_address or "imacdimmer.local"
+        if not probe_device(probe_address):
+            breaker.record_failure()
+            print(f"ESP32 probe failed, backing off {breaker.backoff:.0f}s")
+            return None
     
-    # If no address or hostname failed, discover
+    try:
+        result = _http_request_chain(esp32_address, endpoint, params, probe)
+    except EndpointNotFound:
+        breaker.record_success()
+        raise
+    if result is None:
+        breaker.record_failure()
+        if not was_open and breaker.opened_at is not None:
+            publish_device(False, 'http', esp32_address)
+    else:
+        breaker.record_success()
+        if was_open:
+            publish_device(True, 'http', esp32_address)
+    return result
+
+def _http_request_chain(esp32_address, endpoint, params, probe=False):
+    """Request against the known address; rediscovery happens in the background"""
     if not esp32_address or esp32_address == '192.168.1.100':
-        print("ESP32 address not configured. Trying to discover...")
-        discovered_ip = discover_esp32()
-        if discovered_ip:
-            esp32_address = discovered_ip
-            save_config(esp32_ip=esp32_address)
-        else:
-            print("Could not discover ESP32. Please check your network connection.")
-            return None
+        print("ESP32 address not known yet, discovering in background...")
+        request_rediscovery()
+        return None
     
-    # Try the request
-    def try_request(address):
-        try:
-            url = f"http://{address}{endpoint}"
-            response = requests.get(url, params=params, timeout=5)
-            if response.status_code == 200:
-                return response.text
-            else:
-                print(f"HTTP Error {response.status_code}: {response.text}")
-                return None
-        except requests.exceptions.ConnectionError:
-            return None
-        except Exception as e:
-            print(f"HTTP request failed: {e}")
-            return None
+    try:
+        url = f"http://{esp32_address}{endpoint}"
+        response = _session.get(url, params=params, timeout=5)
+        if response.status_code == 200:
+            return response.text
+        if response.status_code == 404 and probe:
+            raise EndpointNotFound(endpoint)
+        print(f"HTTP Error {response.status_code}: {response.text}")
+        return None
+    except EndpointNotFound:
+        raise
+    except requests.exceptions.ConnectionError:
+        print(f"Could not connect to ESP32 at {esp32_address}")
+    except Exception as e:
+        print(f"HTTP request failed: {e}")
+    
+    request_rediscovery()
+    return None
+
+def _proc_ip(value):
+    """Address from /proc/net/route's little-endian hex"""
+    return socket.inet_ntoa(struct.pack('<I', int(value, 16)))
+
+def read_arp_table():
+    """{ip: mac} for complete entries in the kernel ARP cache"""
+    table = {}
+    try:
+        with open('/proc/net/arp') as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 4 and fields[2] != '0x0' and fields[3] != '00:00:00:00:00:00':
+                    table[fields[0]] = fields[3].lower()
+    except Exception:
+        pass
+    return table
+
+def get_network_identity():
+    """Key for the current network: gateway MAC (or IP) and subnet of the default route
+
+    e.g. '02:fc:00:00:00:05@192.0.2.0/24'. None without a default route.
+    """
+    try:
+        with open('/proc/net/route') as f:
+            next(f)
+            routes = [line.split() for line in f]
+    except Exception:
+        return None
+    
+    defaults = sorted((int(r[6]), r[0], r[2]) for r in routes if len(r) > 7 and r[1] == '00000000')
+    if not defaults:
+        return None
+    _, iface, gateway = defaults[0]
+    gateway_ip = _proc_ip(gateway)
     
-    # Try current address
-    result = try_request(esp32_address)
-    if result:
-        return result
+    subnet = None
+    for r in routes:
+        if len(r) > 7 and r[0] == iface and r[1] != '00000000' and r[2] == '00000000':
+            prefix = bin(int(r[7], 16)).count('1')
+            subnet = f"{_proc_ip(r[1])}/{prefix}"
+            break
     
-    # If failed, try hostname as fallback
-    if esp32_address != "imacdimmer.local":
-        print(f"Could not connect to ESP32 at {esp32_address}")
-        print("Trying hostname: imacdimmer.local...")
-        result = try_request("imacdimmer.local")
-        if result:
-            save_config(esp32_ip="imacdimmer.local")
-            return result
+    gateway_id = read_arp_table().get(gateway_ip, gateway_ip)
+    return f"{gateway_id}@{subnet or iface}"
+
+def network_address(config, network=None):
+    """Known ESP32 address for this network, else the last one used anywhere"""
+    network = network or get_network_identity()
+    entry = config.get('networks', {}).get(network) if network else None
+    if entry:
+        return entry.get('esp32_ip')
+    return config.get('esp32_ip')
+
+def get_route_fingerprint():
+    """Cheap network identity: interface and gateway of the default route(s)"""
+    try:
+        with open('/proc/net/route') as f:
+            next(f)
+            return tuple(sorted((fields[0], fields[2]) for fields in
+                                (line.split() for line in f)
+                                if len(fields) > 2 and fields[1] == '00000000'))
+    except Exception:
+        return None
+
+class AddressCache:
+    """Last known working ESP32 address, shared between the worker and request paths"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._address = None
+        self.generation = 0
+        self.updated = threading.Condition(self._lock)
+
+    def get(self):
+        with self._lock:
+            return self._address
+
+    def publish(self, address):
+        with self._lock:
+            self._address = address
+            self.generation += 1
+            self.updated.notify_all()
+
+    def wait_for_update(self, generation, timeout):
+        """Block until a result newer than generation is published (used by the one-shot CLI)"""
+        with self._lock:
+            return self.updated.wait_for(lambda: self.generation > generation, timeout)
+
+_address_cache = AddressCache()
+
+class DiscoveryWorker(threading.Thread):
+    """Background rediscovery, off the request path
+
+    Refreshes the address on request (after a failure), when the default
+    route changes, and re-validates it every refresh_interval seconds.
+    Results go to the shared address cache and the config file.
+    """
+
+    def __init__(self, cache, refresh_interval=600, network_poll=15):
+        super().__init__(daemon=True, name='esp32-discovery')
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self.network_poll = network_poll
+        self._refresh_requested = threading.Event()
+
+    def request_refresh(self):
+        self._refresh_requested.set()
+
+    def candidates(self, config, network):
+        """Addresses worth probing before any scan, most likely first"""
+        entry = config.get('networks', {}).get(network, {}) if network else {}
+        candidates = [entry.get('esp32_ip'), self.cache.get(), config.get('esp32_ip')]
+        if entry.get('esp32_mac'):
+            # Same device, new DHCP lease: find its MAC in the ARP cache
+            for ip, mac in read_arp_table().items():
+                if mac == entry['esp32_mac']:
+                    candidates.insert(1, ip)
+        return list(dict.fromkeys(c for c in candidates if c))
     
-    # If still failed, try discovery
-    print("Trying to discover ESP32...")
-    discovered_ip = discover_esp32()
-    if discovered_ip and discovered_ip != esp32_address:
-        save_config(esp32_ip=discovered_ip)
-        result = try_request(discovered_ip)
-        if result:
-            return result
+    def refresh(self):
+        """Validate known addresses for this network, falling back to hostname and full discovery"""
+        config = load_config()
+        network = get_network_identity()
+        candidates = self.candidates(config, network)
+        known = candidates[0] if candidates else None
+        address = next((c for c in candidates if probe_device(c)), None)
+        if address is None:
+            address = try_hostname_first() or discover_esp32()
+        
+        if address:
+            if address != known:
+                print(f"📡 ESP32 address updated: {address}")
+            entry = config.get('networks', {}).get(network, {}) if network else {}
+            mac = read_arp_table().get(address)
+            if (address != config.get('esp32_ip')
+                    or (network and (entry.get('esp32_ip'), entry.get('esp32_mac')) != (address, mac))):
+                save_config(esp32_ip=address, network=network, esp32_mac=mac)
+        self.cache.publish(address or known)
     
-    return None
+    def run(self):
+        fingerprint = get_route_fingerprint()
+        last_refresh = time.monotonic()
+        while True:
+            requested = self._refresh_requested.wait(self.network_poll)
+            self._refresh_requested.clear()
+            
+            current = get_route_fingerprint()
+            network_changed = current != fingerprint
+            fingerprint = current
+            
+            if requested or network_changed or time.monotonic() - last_refresh > self.refresh_interval:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️  Discovery error: {e}")
+                last_refresh = time.monotonic()
+
+_discovery_worker = None
+_discovery_lock = threading.Lock()
+
+def get_discovery_worker():
+    """Start the background discovery worker on first use"""
+    global _discovery_worker
+    with _discovery_lock:
+        if _discovery_worker is None:
+            _discovery_worker = DiscoveryWorker(_address_cache)
+            _discovery_worker.start()
+        return _discovery_worker
+
+def request_rediscovery():
+    get_discovery_worker().request_refresh()
+
+def cli_request(endpoint, params=None, discovery_wait=40, probe=False):
+    """One-shot CLI request: if it fails, wait for the background worker once and retry"""
+    generation = _address_cache.generation
+    before = _address_cache.get() or network_address(load_config())
+    result = http_request(endpoint, params, probe)
+    if result is None and _discovery_worker is not None:
+        print("Waiting for ESP32 discovery...")
+        if (_address_cache.wait_for_update(generation, discovery_wait)
+                and _address_cache.get() != before):
+            result = http_request(endpoint, params, probe)
+    return result
+
+def pwm_to_percent(pwm):
+    """Firmware's map(brightness, 0, 255, 0, 100), integer-truncated"""
+    return int(pwm * 100 / 255)
+
+def parse_firmware_version(version):
+    """'1.7.0-safety-features' -> (1, 7, 0); unknown parts are dropped"""
+    numbers = []
+    for part in (version or '').split('-')[0].split('.'):
+        if not part.isdigit():
+            break
+        numbers.append(int(part))
+    return tuple(numbers)
+
+class DeviceStatus(namedtuple('DeviceStatus', [
+        'brightness', 'connected', 'ssid', 'rssi', 'ip', 'firmware_version', 'build_date',
+        'structured', 'fetched_at'])):
+    """Device state at one point in time; brightness in percent, fetched_at monotonic"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_wifistatus(cls, text):
+        """Parse the /wifistatus JSON; None if it isn't a usable status document"""
+        try:
+            data = json.loads(text)
+            return cls(brightness=pwm_to_percent(int(data['brightness'])),
+                       connected=bool(data.get('connected')),
+                       ssid=data.get('ssid'),
+                       rssi=data.get('rssi'),
+                       ip=data.get('ip'),
+                       firmware_version=data.get('firmware_version'),
+                       build_date=data.get('build_date'),
+                       structured=True,
+                       fetched_at=time.monotonic())
+        except (TypeError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def from_serial_replies(cls, get_reply, version_reply):
+        """Status from the text replies of older firmware ('get' and 'version')"""
+        brightness = None
+        if get_reply and "Current brightness:" in get_reply:
+            value = get_reply.split(':', 1)[1].strip().rstrip('%')
+            brightness = int(value) if value.isdigit() else None
+        firmware_version = build_date = None
+        if version_reply and version_reply.startswith("Firmware:"):
+            fields = dict(part.split(':', 1) for part in version_reply.split(', ') if ':' in part)
+            firmware_version = fields.get('Firmware', '').strip() or None
+            build_date = fields.get('Build', '').strip() or None
+        return cls(brightness=brightness, connected=True, ssid=None, rssi=None, ip=None,
+                   firmware_version=firmware_version, build_date=build_date,
+                   structured=False, fetched_at=time.monotonic())
+
+    @property
+    def version(self):
+        return parse_firmware_version(self.firmware_version)
+
+    def version_line(self):
+        """Same text as the firmware's 'version' command"""
+        return f"Firmware: {self.firmware_version}, Build: {self.build_date}"
+
+    def as_dict(self):
+        return {k: v for k, v in self._asdict().items() if k != 'fetched_at'}
+
+class StatusCache:
+    """All device state from one /wifistatus request, cached for a short TTL
+
+    Whether the firmware serves /wifistatus is negotiated on first use: if it
+    fails (a 404 on legacy firmware) but the firmware still answers 'version'
+    on /serial, the device is treated as legacy and served from 'get' +
+    'version' instead. The decision is revisited when the reported firmware
+    version changes.
+    """
+
+    def __init__(self, ttl=2.0, request=None):
+        self.ttl = ttl
+        self.request = request or http_request
+        self.structured = None  # None: not negotiated yet
+        self._status = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, max_age=None):
+        """Cached status if younger than max_age (default: the TTL), otherwise a fresh one"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._status and time.monotonic() - self._status.fetched_at <= max_age:
+                return self._status
+            status = self._fetch()
+            if status is not None:
+                self._status = status
+            return status
+
+    def invalidate(self):
+        with self._lock:
+            self._status = None
+
+    def _fetch(self):
+        if self.structured is not False:
+            try:
+                status = DeviceStatus.from_wifistatus(self.request("/wifistatus", probe=True))
+            except EndpointNotFound:
+                status = None  # Legacy firmware, confirmed by 'version' below
+            if status is not None:
+                self.structured = True
+                return status
+        
+        version_reply = self.request("/serial", {"cmd": "version"})
+        if version_reply is None:
+            return None  # Unreachable: nothing learned about capabilities
+        if self.structured is None:
+            print("ESP32 firmware has no /wifistatus, using text commands")
+            self.structured = False
+        
+        status = DeviceStatus.from_serial_replies(self.request("/serial", {"cmd": "get"}), version_reply)
+        if self._status and self._status.firmware_version != status.firmware_version:
+            self.structured = None  # Firmware changed: negotiate again next time
+        return status
+
+_status_cache = StatusCache()
+
+def get_device_status(max_age=None):
+    """Shared status snapshot for long-running callers"""
+    return _status_cache.snapshot(max_age)
+
+class HttpTransport:
+    """Text command transport over the /serial endpoint
+
+    Queries that only read device state are served from the shared status
+    snapshot; any other command invalidates it.
+    """
+
+    name = 'http'
+
+    def __init__(self, status_cache=None):
+        self.status_cache = status_cache or _status_cache
+
+    def status(self, max_age=None):
+        return self.status_cache.snapshot(max_age)
+
+    def command(self, cmd):
+        if cmd in ('get', 'version'):
+            status = self.status(None if cmd == 'get' else float('inf'))
+            if status is not None:
+                if cmd == 'version' and status.firmware_version:
+                    return status.version_line()
+                if cmd == 'get' and status.brightness is not None:
+                    return f"Current brightness: {status.brightness}%"
+        elif cmd != 'ping':
+            self.status_cache.invalidate()
+        return http_request("/serial", {"cmd": cmd})
 
 def get_brightness():
     """Get last saved brightness value"""
@@ -195,9 +628,11 @@ def get_brightness():
 
 def set_brightness_http(value):
     """Set brightness via HTTP"""
-    response = http_request("/serial", {"cmd": str(value)})
+    response = cli_request("/serial", {"cmd": str(value)})
     if response and "Brightness set to" in response:
         save_config(brightness=value)
+        record_brightness_change(value)
+        publish_brightness(value, 'imacdisplay')
         print(response)
         return value
     else:
@@ -213,6 +648,7 @@ def main():
     group.add_argument('-d', '--decrement', type=int, help='Decrease brightness by amount')
     group.add_argument('-v', '--version', action='store_true', help='Get firmware version info')
     group.add_argument('--ping', action='store_true', help='Ping ESP32')
+    group.add_argument('--status', action='store_true', help='Show full device status (one request)')
     parser.add_argument('--ip', help='ESP32 IP address')
     parser.add_argument('--discover', action='store_true', help='Discover ESP32 IP address')
     
@@ -221,38 +657,48 @@ def main():
     print(f"Command arguments: {args}")
     
     if args.ip:
-        save_config(esp32_ip=args.ip)
+        save_config(esp32_ip=args.ip, network=get_network_identity())
         print(f"ESP32 IP set to: {args.ip}")
         return
     
     if args.discover:
         ip = discover_esp32()
         if ip:
-            save_config(esp32_ip=ip)
+            save_config(esp32_ip=ip, network=get_network_identity(), esp32_mac=read_arp_table().get(ip))
             print(f"ESP32 discovered and saved: {ip}")
         else:
             print("ESP32 not found")
         return
     
+    status_cache = StatusCache(request=cli_request)
+    
     if args.get:
         # Get current brightness from ESP32
-        response = http_request("/serial", {"cmd": "get"})
-        if response:
-            print(response)
+        status = status_cache.snapshot()
+        if status and status.brightness is not None:
+            print(f"Current brightness: {status.brightness}%")
         else:
             print(f"Current brightness: {get_brightness()}% (cached)")
         return
     
     if args.version:
-        response = http_request("/serial", {"cmd": "version"})
-        if response:
-            print(f"Version: {response}")
+        status = status_cache.snapshot()
+        if status and status.firmware_version:
+            print(f"Version: {status.version_line()}")
         else:
             print("Could not get version from ESP32")
         return
     
+    if args.status:
+        status = status_cache.snapshot()
+        if status:
+            print(json.dumps(status.as_dict(), indent=2))
+        else:
+            print("Could not get status from ESP32")
+        return
+    
     if args.ping:
-        response = http_request("/serial", {"cmd": "ping"})
+        response = cli_request("/serial", {"cmd": "ping"})
         if response:
             print(f"Ping response: {response}")
         else:
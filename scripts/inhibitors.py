@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Dim inhibitors: rules that keep the display on while nobody touches the keyboard
+Matches process names, command lines and audio playback from an incremental
+/proc scan, so checking every tick needs no pgrep/ps subprocess
+"""
+
+import os
+import re
+
+PROC_ROOT = '/proc'
+ASOUND_ROOT = '/proc/asound'
+
+# Used by --inhibit when the config has no rules of its own
+DEFAULT_RULES = [
+    {'name': 'video player', 'process': ['mpv', 'vlc', 'totem', 'celluloid', 'smplayer', 'kodi', 'mplayer']},
+    {'name': 'presentation', 'cmdline': r'soffice.*--show|impress.*-show|pdfpc|evince.*--presentation'},
+]
+
+def read_file(path, limit=4096):
+    """First bytes of a small procfs file, or None if the process is gone"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return os.read(fd, limit)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+class Rule:
+    """One inhibitor; every condition it has must hold
+
+    process: names matched against the process name and the basename of
+    argv[0] (the kernel truncates the name to 15 characters)
+    cmdline: regular expression searched in the space-joined command line
+    audio: something is playing through an ALSA playback device
+    """
+
+    def __init__(self, name, process=None, cmdline=None, audio=False):
+        self.name = name
+        self.process = frozenset(process or ())
+        self.cmdline = re.compile(cmdline) if cmdline else None
+        self.audio = bool(audio)
+        if not (self.process or self.cmdline or self.audio):
+            raise ValueError(f"Inhibitor '{name}' has no conditions")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('name') or 'unnamed', config.get('process'), config.get('cmdline'),
+                   config.get('audio', False))
+
+    @property
+    def needs_process(self):
+        return bool(self.process or self.cmdline)
+
+    def matches_process(self, comm, argv0, cmdline):
+        if self.process and comm not in self.process and argv0 not in self.process:
+            return False
+        if self.cmdline and not self.cmdline.search(cmdline):
+            return False
+        return True
+
+def audio_status_files(asound_root):
+    """Status files of every ALSA playback substream"""
+    paths = []
+    try:
+        cards = [e.path for e in os.scandir(asound_root) if e.name.startswith('card') and e.is_dir()]
+        for card in cards:
+            for pcm in os.scandir(card):
+                if pcm.name.startswith('pcm') and pcm.name.endswith('p'):
+                    paths.extend(os.path.join(sub.path, 'status') for sub in os.scandir(pcm.path)
+                                 if sub.name.startswith('sub'))
+    except OSError:
+        pass
+    return paths
+
+class InhibitorEngine:
+    """Evaluates inhibitor rules against an incrementally maintained process table
+
+    Each check lists /proc once. A PID is only read again when its /proc
+    entry is new, which the directory listing's inode number shows without
+    an extra syscall, so a steady system costs one getdents pass. Every
+    full_scan_every checks all PIDs are re-read to catch exec() replacing
+    a process image under the same PID.
+    """
+
+    def __init__(self, rules, proc_root=None, asound_root=None, full_scan_every=20):
+        self.rules = [rule if isinstance(rule, Rule) else Rule.from_config(rule) for rule in rules]
+        self.proc_root = proc_root or PROC_ROOT
+        self.asound_root = asound_root or ASOUND_ROOT
+        self.full_scan_every = full_scan_every
+        self.processes = {}  # PID directory name -> (inode, indexes of rules whose process conditions match)
+        self.audio_files = None
+        self.checks = 0
+        self.reads = 0  # PIDs read from /proc, for diagnostics
+
+    @classmethod
+    def from_config(cls, value):
+        """`inhibitors` config value: a rule list, or true for the defaults"""
+        if not value:
+            return None
+        return cls(DEFAULT_RULES if value is True else value)
+
+    def describe(self):
+        return ', '.join(rule.name for rule in self.rules)
+
+    def _read_process(self, pid):
+        """Indexes of the rules whose process conditions match this PID, or None if it exited"""
+        base = f'{self.proc_root}/{pid}/'
+        comm = read_file(base + 'comm')
+        if comm is None:
+            return None
+        self.reads += 1
+        comm = comm.rstrip(b'\n').decode(errors='replace')
+        raw = read_file(base + 'cmdline') or b''
+        args = raw.rstrip(b'\0').split(b'\0')
+        argv0 = os.path.basename(args[0].decode(errors='replace'))
+        cmdline = b' '.join(args).decode(errors='replace')
+        return frozenset(i for i, rule in enumerate(self.rules)
+                         if rule.needs_process and rule.matches_process(comm, argv0, cmdline))
+
+    def scan(self):
+        """Bring the process table up to date; returns the set of matching rule indexes"""
+        full = self.checks % self.full_scan_every == 0
+        self.checks += 1
+        if full:
+            self.audio_files = None  # Sound cards come and go with USB audio too
+        previous = {} if full else self.processes
+        current = {}
+        matched = set()
+        try:
+            with os.scandir(self.proc_root) as entries:
+                for entry in entries:
+                    pid = entry.name
+                    known = previous.get(pid)
+                    if known is None or known[0] != entry.inode():
+                        if not pid.isdigit():
+                            continue
+                        matches = self._read_process(pid)
+                        if matches is None:
+                            continue
+                        known = (entry.inode(), matches)
+                    current[pid] = known
+                    if known[1]:
+                        matched.update(known[1])
+        except OSError:
+            pass
+        self.processes = current
+        return matched
+
+    def audio_playing(self):
+        if self.audio_files is None:
+            self.audio_files = audio_status_files(self.asound_root)
+        for path in self.audio_files:
+            status = read_file(path, 256)
+            if status and status.startswith(b'state: RUNNING'):
+                return True
+        return False
+
+    def check(self):
+        """Name of the first active inhibitor, or None"""
+        matched = self.scan()
+        audio = None
+        for i, rule in enumerate(self.rules):
+            if rule.needs_process and i not in matched:
+                continue
+            if rule.audio:
+                if audio is None:
+                    audio = self.audio_playing()
+                if not audio:
+                    continue
+            return rule.name
+        return None
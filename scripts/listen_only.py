@@ -2,31 +2,33 @@
 import serial
 import time
 
+from serial_io import SerialChannel, deadline_after
+
 def listen_to_esp32():
     try:
         print("👂 ESP32 Listen-Only Test")
         print("=========================")
         
         print("Opening serial port in listen-only mode...")
-        ser = serial.Serial('/dev/ttyACM0', 115200, timeout=0.5, dsrdtr=False, rtscts=False)
+        ser = serial.Serial('/dev/ttyACM0', 115200, dsrdtr=False, rtscts=False)
+        channel = SerialChannel(ser)
         print("✅ Port opened")
         
         print("Listening for ESP32 output for 15 seconds...")
-        start_time = time.time()
+        deadline = deadline_after(15)
         data_received = False
         
-        while time.time() - start_time < 15:
-            if ser.in_waiting > 0:
-                data = ser.read(ser.in_waiting)
-                print(f"📨 Received: {data}")
+        while time.monotonic() < deadline:
+            line = channel.readline(deadline)
+            if line is not None:
+                print(f"📨 Received: {line}")
                 data_received = True
-            time.sleep(0.1)
         
         if not data_received:
             print("❌ No data received from ESP32")
             print("💡 ESP32 might not be outputting anything or there's a connection issue")
         
-        ser.close()
+        channel.close()
         print("✅ Listening completed")
         
     except Exception as e:
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure-Python hot paths
+Runs hermetically against fixtures (temporary config files, a fake /dev
+and sysfs tree, canned command output), stores a JSON baseline and flags
+regressions against it
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+DEFAULT_BASELINE = Path(__file__).parent / 'microbench_baseline.json'
+
+WHO_OUTPUT = '\n'.join(
+    [f"user{i}    pts/{i}        2025-01-06 08:{i:02d}   .          {4000 + i} (10.0.1.{i})" for i in range(8)]
+    + ["doobidoo :0           2025-01-06 07:58   old          1234 (:0)"])
+
+ARP_OUTPUT = '\n'.join(
+    [f"host{i}.lan (192.168.1.{i}) at 3c:22:fb:00:00:{i:02x} [ether] on wlp3s0" for i in range(2, 40)]
+    + ["imacdimmer.lan (192.168.1.27) at 7c:df:a1:12:34:56 [ether] on wlp3s0"])
+
+ROUTE_OUTPUT = """default via 192.168.1.1 dev wlp3s0 proto dhcp src 192.168.1.50 metric 600
+10.8.0.0/24 dev tun0 proto kernel scope link src 10.8.0.2
+169.254.0.0/16 dev wlp3s0 scope link metric 1000
+172.17.0.0/16 dev docker0 proto kernel scope link src 172.17.0.1 linkdown
+192.168.1.0/24 dev wlp3s0 proto kernel scope link src 192.168.1.50 metric 600"""
+
+# (comm, cmdline) of the fake /proc tree; repeated to a few hundred PIDs
+PROCESSES = [
+    ('systemd', '/sbin/init splash'),
+    ('kworker/0:1', ''),
+    ('bash', '-bash'),
+    ('gnome-shell', '/usr/bin/gnome-shell'),
+    ('firefox', '/usr/lib/firefox/firefox -contentproc -childID 12 -isForBrowser'),
+    ('pipewire', '/usr/bin/pipewire'),
+    ('python3', 'python3 /usr/local/bin/auto_dimmer.py'),
+    ('mpv', 'mpv --fs /home/user/Videos/talk.mkv'),
+]
+PROC_COUNT = 400
+
+# (device, vid, pid, serial, interface) for the fake sysfs tree
+USB_DEVICES = [
+    ('ttyACM0', '303a', '1001', 'F4:12:FA:00:11:22', '00'),
+    ('ttyACM1', '2341', '0043', '75833353035351F0E1D1', '00'),
+    ('ttyUSB0', '0403', '6001', 'A50285BI', '00'),
+    ('ttyUSB1', '10c4', 'ea60', '0001', '00'),
+]
+
+class Fixtures:
+    """Temporary HOME, /dev, sysfs and /proc; restores module globals on exit"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.home = self.root / 'home'
+        self.dev = self.root / 'dev'
+        self.sys_tty = self.root / 'sys' / 'class' / 'tty'
+        self.proc = self.root / 'proc'
+        self._restore = []
+
+    def patch(self, obj, name, value):
+        self._restore.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def build(self):
+        self.home.mkdir(parents=True)
+        self.dev.mkdir()
+        self.sys_tty.mkdir(parents=True)
+        usb_root = self.root / 'sys' / 'devices' / 'pci0000:00' / 'usb1'
+        for n, (tty, vid, pid, serial, interface) in enumerate(USB_DEVICES, 1):
+            (self.dev / tty).touch()
+            usb = usb_root / f'1-{n}'
+            iface = usb / f'1-{n}:1.0'
+            (iface / 'tty' / tty).mkdir(parents=True)
+            for name, value in (('idVendor', vid), ('idProduct', pid), ('serial', serial),
+                                ('manufacturer', 'Fixture'), ('product', f'Device {n}')):
+                (usb / name).write_text(value + '\n')
+            (iface / 'bInterfaceNumber').write_text(interface + '\n')
+            (self.sys_tty / tty).mkdir()
+            os.symlink(iface, self.sys_tty / tty / 'device')
+
+        for pid in range(1, PROC_COUNT + 1):
+            comm, cmdline = PROCESSES[pid % len(PROCESSES)]
+            (self.proc / str(pid)).mkdir(parents=True)
+            (self.proc / str(pid) / 'comm').write_text(comm + '\n')
+            (self.proc / str(pid) / 'cmdline').write_bytes(cmdline.replace(' ', '\0').encode() + b'\0')
+        (self.proc / 'self').mkdir()
+        sub = self.proc / 'asound' / 'card0' / 'pcm0p' / 'sub0'
+        sub.mkdir(parents=True)
+        (sub / 'status').write_text('closed\n')
+
+        config = {'esp32_ip': '192.168.1.27', 'last_brightness': 70, 'networks': {
+            f'02:00:00:00:00:{i:02x}@10.0.{i}.0/24': {'esp32_ip': f'10.0.{i}.27', 'esp32_mac': '7c:df:a1:12:34:56',
+                                                       'last_seen': 1735689600 + i}
+            for i in range(16)}}
+        (self.home / '.config').mkdir()
+        (self.home / '.config' / 'imacdisplay.conf').write_text(json.dumps(config))
+
+    def install(self):
+        import imacdisplay
+        import imacdisplay_http
+        import inhibitors
+        import serial_hotplug
+        import serial_identity
+
+        self.patch(serial_hotplug, 'DEV_DIR', str(self.dev))
+        self.patch(inhibitors, 'PROC_ROOT', str(self.proc))
+        self.patch(inhibitors, 'ASOUND_ROOT', str(self.proc / 'asound'))
+        self.patch(serial_identity, 'SYS_TTY', str(self.sys_tty))
+        # A watcher over the fixture /dev; never started, so nothing runs in the background
+        self.patch(serial_hotplug, '_watcher', serial_hotplug.SerialHotplugWatcher())
+        self.patch(serial_identity, '_index', serial_identity.SerialIdentityIndex())
+        config_file = self.home / '.config' / 'imacdisplay.conf'
+        self.patch(imacdisplay_http, 'get_config_file', lambda: config_file)
+        serial_config = self.home / '.config' / 'imacdisplay-serial.conf'
+        serial_config.write_text(json.dumps({'port': str(self.dev / 'ttyACM0'), 'last_brightness': 70,
+                                             'device_id': '303a:1001:F4:12:FA:00:11:22'}))
+        self.patch(imacdisplay, 'get_config_file', lambda: serial_config)
+
+    def uninstall(self):
+        for obj, name, value in reversed(self._restore):
+            setattr(obj, name, value)
+
+@contextmanager
+def fixtures():
+    with tempfile.TemporaryDirectory(prefix='microbench-') as root:
+        f = Fixtures(root)
+        f.build()
+        f.install()
+        try:
+            yield f
+        finally:
+            f.uninstall()
+
+def benchmarks():
+    """name -> zero-argument callable"""
+    import imacdisplay
+    import imacdisplay_http
+    import serial_identity
+    from auto_dimmer import parse_brightness_response, parse_who_idle
+    from inhibitors import DEFAULT_RULES, InhibitorEngine
+
+    def find_device_cold():
+        serial_identity.get_identity_index()._generation = None  # As after a hotplug event
+        return imacdisplay.find_esp32_device('303a:1001:F4:12:FA:00:11:22')
+
+    # Nothing plays in the fixture, so no rule matches and every one is evaluated
+    rules = DEFAULT_RULES[1:] + [{'name': 'browser video', 'process': ['firefox'], 'audio': True}]
+    engine = InhibitorEngine(rules, full_scan_every=10 ** 9)
+    engine.check()
+
+    return {
+        'http.load_config': imacdisplay_http.load_config,
+        'http.save_config': lambda: imacdisplay_http.save_config(brightness=42),
+        'http.network_address': lambda: imacdisplay_http.network_address(
+            imacdisplay_http.load_config(), '02:00:00:00:00:07@10.0.7.0/24'),
+        'serial.load_config': imacdisplay.load_config,
+        'serial.save_config': lambda: imacdisplay.save_config(brightness=42),
+        'serial.find_esp32_device': lambda: imacdisplay.find_esp32_device('303a:1001:F4:12:FA:00:11:22'),
+        'serial.find_esp32_device_cold': find_device_cold,
+        'idle.parse_who': lambda: parse_who_idle(WHO_OUTPUT),
+        'discovery.parse_arp': lambda: imacdisplay_http.parse_arp_candidates(ARP_OUTPUT),
+        'discovery.parse_route': lambda: imacdisplay_http.parse_route_networks(ROUTE_OUTPUT),
+        'inhibit.check': engine.check,
+        'inhibit.check_cold': lambda: InhibitorEngine(rules).check(),
+        'device.parse_brightness': lambda: parse_brightness_response("Current brightness: 69%"),
+        'device.parse_wifistatus': lambda: imacdisplay_http.DeviceStatus.from_wifistatus(
+            '{"connected": true, "ssid": "home", "rssi": -58, "ip": "192.168.1.27", "brightness": 178, '
+            '"firmware_version": "1.8.0-framed-serial", "build_date": "Jan  1 2025 00:00:00"}'),
+    }
+
+def measure(func, repeat=50, min_time=0.001):
+    """Best per-call time in nanoseconds over repeat samples of at least min_time each
+
+    Many short samples rather than a few long ones: the minimum only needs
+    one of them to land in a quiet moment on a busy machine.
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best * 1e9
+
+def run(selected=None, repeat=50):
+    results = {}
+    with fixtures(), redirect_stdout(io.StringIO()):
+        for name, func in benchmarks().items():
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            results[name] = measure(func, repeat)
+    return results
+
+def confirm(results, baseline, threshold, repeat=50, rounds=3):
+    """Re-measure apparent regressions, keeping the best time, until they clear or rounds run out
+
+    Noise comes in bursts lasting seconds, so a slowdown that survives
+    several later re-runs is a real one.
+    """
+    for _ in range(rounds):
+        suspects = [name for name, ns in results.items()
+                    if baseline.get(name) and ns > baseline[name] * (1 + threshold)]
+        if not suspects:
+            break
+        time.sleep(1)
+        for name, ns in run(suspects, repeat).items():
+            if name in results:
+                results[name] = min(results[name], ns)
+    return results
+
+def compare(results, baseline, threshold):
+    """[(name, baseline_ns, current_ns, ratio, regressed)] for benchmarks in both"""
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous:
+            ratio = current / previous
+            rows.append((name, previous, current, ratio, ratio > 1 + threshold))
+    return rows
+
+def format_ns(ns):
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} µs"
+    return f"{ns:.0f} ns"
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks for the pure-Python hot paths')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='Compare against the baseline; exit 1 on regressions')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE,
+                        help=f'Baseline file (default: {DEFAULT_BASELINE.name} next to this script)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown before a benchmark counts as regressed (default: 0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='Timing samples (1 ms or longer) per benchmark, best is kept (default: 50)')
+    parser.add_argument('-k', dest='selected', action='append', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.selected, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    elif not args.compare:
+        for name, ns in results.items():
+            print(f"{name:32} {format_ns(ns):>10}")
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'created': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'results': results}, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read baseline {args.baseline}: {e}")
+            sys.exit(2)
+        results = confirm(results, baseline['results'], args.threshold, args.repeat)
+        rows = compare(results, baseline['results'], args.threshold)
+        print(f"Baseline: {baseline.get('created')} (Python {baseline.get('python')})")
+        for name, previous, current, ratio, regressed in rows:
+            mark = '❌' if regressed else '  '
+            print(f"{mark} {name:32} {format_ns(previous):>10} → {format_ns(current):>10}  {ratio:5.2f}x")
+        regressions = [row for row in rows if row[4]]
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -3,36 +3,33 @@ import serial
 import time
 import sys
 
+from serial_io import SerialChannel, deadline_after
+
 def monitor_serial():
     try:
         print("Opening serial port for monitoring...")
-        ser = serial.Serial('/dev/ttyACM0', 115200, timeout=0.1, dsrdtr=False, rtscts=False)
+        ser = serial.Serial('/dev/ttyACM0', 115200, dsrdtr=False, rtscts=False)
+        channel = SerialChannel(ser)
         print("✅ Port opened, monitoring for 10 seconds...")
         
-        start_time = time.time()
-        while time.time() - start_time < 10:
-            if ser.in_waiting > 0:
-                data = ser.read(ser.in_waiting)
+        deadline = deadline_after(10)
+        while time.monotonic() < deadline:
+            data = channel.read_available(deadline)
+            if data:
                 print(f"📨 Received: {data}")
-            time.sleep(0.1)
         
         print("\n📤 Now sending 'version' command...")
-        ser.write(b"version\n")
-        ser.flush()
+        channel.write(b"version\n")
         print("✅ Command sent, waiting for response...")
         
         # Wait for response
-        start_time = time.time()
-        while time.time() - start_time < 5:
-            if ser.in_waiting > 0:
-                data = ser.read(ser.in_waiting)
-                print(f"📨 Response: {data}")
-                break
-            time.sleep(0.1)
+        data = channel.read_available(deadline_after(5))
+        if data:
+            print(f"📨 Response: {data}")
         else:
             print("❌ No response to version command")
         
-        ser.close()
+        channel.close()
         print("✅ Monitoring completed")
         
     except Exception as e:
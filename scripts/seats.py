@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Per-seat idle tracking for one daemon serving several sessions
+Enumerates local user sessions through logind, probes each session's idle
+time concurrently, and folds the results into one idle value by policy
+"""
+
+import asyncio
+import os
+import pwd
+import subprocess
+import time
+from collections import namedtuple
+
+SESSION_PROPERTIES = ['Id', 'Name', 'User', 'Seat', 'Display', 'TTY', 'Type', 'Class',
+                      'Remote', 'State', 'IdleHint', 'IdleSinceHintMonotonic']
+
+Session = namedtuple('Session', ['id', 'user', 'uid', 'seat', 'display', 'tty', 'type',
+                                 'idle_hint', 'idle_since'])
+
+# How per-session idle times combine into the daemon's idle time
+POLICIES = {
+    'all': min,  # Dim only when every session is idle
+    'any': max,  # Dim as soon as any session is idle
+}
+
+# Idle time when nobody is logged in (or nobody on the chosen seat); the same
+# value auto_dimmer uses for a locked screen
+NO_SESSIONS_IDLE = 999999
+
+def parse_show_session(output):
+    """`loginctl show-session ID... -p ...` output -> one dict per session"""
+    sessions = []
+    current = {}
+    for line in output.splitlines():
+        if not line.strip():
+            if current:
+                sessions.append(current)
+                current = {}
+            continue
+        key, _, value = line.partition('=')
+        current[key] = value
+    if current:
+        sessions.append(current)
+    return sessions
+
+def list_sessions():
+    """Active local user sessions, or None if logind isn't available"""
+    try:
+        result = subprocess.run(['loginctl', 'list-sessions', '--no-legend'],
+                                capture_output=True, text=True, timeout=5)
+        if result.returncode != 0:
+            return None
+        ids = [line.split()[0] for line in result.stdout.splitlines() if line.strip()]
+        if not ids:
+            return []
+        result = subprocess.run(['loginctl', 'show-session', *ids, '-p', ','.join(SESSION_PROPERTIES)],
+                                capture_output=True, text=True, timeout=5)
+        if result.returncode != 0:
+            return None
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return None
+
+    sessions = []
+    for props in parse_show_session(result.stdout):
+        if (props.get('Class') != 'user' or props.get('Remote') == 'yes'
+                or props.get('State') not in ('active', 'online')):
+            continue
+        sessions.append(Session(
+            id=props.get('Id'),
+            user=props.get('Name'),
+            uid=int(props['User']) if props.get('User', '').isdigit() else None,
+            seat=props.get('Seat') or None,
+            display=props.get('Display') or None,
+            tty=props.get('TTY') or None,
+            type=props.get('Type'),
+            idle_hint=props.get('IdleHint') == 'yes',
+            idle_since=int(props.get('IdleSinceHintMonotonic') or 0),
+        ))
+    return sessions
+
+def xauthority_for(session):
+    """X cookie file for a session's display, if one can be found"""
+    candidates = []
+    if session.uid is not None:
+        candidates.append(f'/run/user/{session.uid}/gdm/Xauthority')
+    try:
+        candidates.append(os.path.join(pwd.getpwnam(session.user).pw_dir, '.Xauthority'))
+    except (KeyError, TypeError):
+        pass
+    return next((path for path in candidates if os.path.exists(path)), None)
+
+def probe_idle(session):
+    """Idle seconds for one session: X11 idle counter, tty access time, or logind's idle hint
+
+    The tty's access time only moves on console input, so it is used for
+    text sessions alone; a graphical session on a VT would look idle while
+    its user types.
+    """
+    if session.type == 'x11' and session.display:
+        env = dict(os.environ, DISPLAY=session.display)
+        xauthority = xauthority_for(session)
+        if xauthority:
+            env['XAUTHORITY'] = xauthority
+        try:
+            result = subprocess.run(['xprintidle'], capture_output=True, text=True, timeout=5, env=env)
+            if result.returncode == 0:
+                return int(result.stdout.strip()) / 1000.0
+        except (subprocess.TimeoutExpired, FileNotFoundError, ValueError):
+            pass
+
+    if session.type == 'tty' and session.tty:
+        try:
+            return max(0.0, time.time() - os.stat(f'/dev/{session.tty}').st_atime)
+        except OSError:
+            pass
+
+    # Wayland, X11 without xprintidle and anything else: the desktop reports idleness to logind
+    if session.idle_hint and session.idle_since:
+        return max(0.0, time.monotonic() - session.idle_since / 1e6)
+    return 0.0
+
+def session_label(session):
+    return f"{session.seat or '-'}/{session.id}:{session.user}"
+
+def aggregate_idle(idles, sessions, policy):
+    """Combine {label: idle} under a policy: 'all', 'any', or a seat name (e.g. 'seat0')"""
+    if policy in POLICIES:
+        values = list(idles.values())
+    else:
+        on_seat = [s for s in sessions if s.seat == policy]
+        if not on_seat:
+            return NO_SESSIONS_IDLE
+        values = [idles[session_label(s)] for s in on_seat if session_label(s) in idles]
+    if not values:
+        return None
+    return POLICIES.get(policy, min)(values)
+
+class SeatMonitor:
+    """Idle time across all local sessions, probed concurrently each tick
+
+    The session list is refreshed on every tick with two loginctl calls
+    (list-sessions, then one show-session for all of them); per-session
+    probes run in parallel. No sessions at all counts as idle.
+    """
+
+    def __init__(self, policy='all', lister=list_sessions, probe=probe_idle):
+        self.policy = policy
+        self.lister = lister
+        self.probe = probe
+        self.last = {}
+
+    async def idle(self, run_blocking, timeout):
+        """Aggregated idle seconds, or None if logind can't be queried or no probe answered"""
+        sessions = await asyncio.wait_for(run_blocking(self.lister), timeout)
+        if sessions is None:
+            self.last = {}
+            return None
+        if not sessions:
+            self.last = {}
+            return NO_SESSIONS_IDLE
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(run_blocking(self.probe, session), timeout) for session in sessions),
+            return_exceptions=True)
+        self.last = {session_label(session): result for session, result in zip(sessions, results)
+                     if not isinstance(result, BaseException) and result is not None}
+        return aggregate_idle(self.last, sessions, self.policy)
+
+    def describe(self):
+        return ', '.join(f"{label} {idle:.0f}s" for label, idle in sorted(self.last.items()))
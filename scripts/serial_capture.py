@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Timestamped serial capture into a fixed-size memory-mapped ring file
+Reads the port with blocking reads straight into the ring and stamps each
+chunk with the monotonic clock, so days of device output can be kept for
+post-mortems without the file growing or the terminal flooding
+"""
+
+import argparse
+import errno
+import fcntl
+import mmap
+import os
+import signal
+import struct
+import sys
+import termios
+import time
+from datetime import datetime
+from pathlib import Path
+
+MAGIC = b'IMDCAP01'
+HEADER = struct.Struct('<8sI')    # magic, ring capacity in bytes
+COUNTERS = struct.Struct('<QQQ')  # head, tail (logical byte positions), records written
+COUNTERS_OFFSET = 16
+HEADER_SIZE = 64
+RECORD = struct.Struct('<QHBx')   # monotonic ns, payload length, kind
+MAX_CHUNK = 4096                  # Largest payload one read can produce
+
+KIND_DATA = 0   # Bytes received from the device
+KIND_START = 1  # Capture (re)started; payload: wall-clock time (double) + port name
+KIND_GAP = 2    # Port lost; nothing was captured until the next START
+KIND_PAD = 3    # Unused space at the end of the ring; the next record starts at offset 0
+KIND_CLOCK = 4  # Periodic anchor; payload: wall-clock time (double) at the record's stamp
+
+START = struct.Struct('<d')
+# Wall time survives the ring wrapping over the START record: at most this much
+# capture time lies between anchors
+ANCHOR_INTERVAL_NS = 60 * 10**9
+
+class Stop(Exception):
+    """Raised from signal handlers to end a blocking read"""
+
+def default_capture_dir():
+    return Path.home() / '.config' / 'imacdimmer' / 'capture'
+
+class CaptureRing:
+    """Variable-length records in a byte ring; the oldest records are overwritten
+
+    Records never wrap: one that doesn't fit before the end of the ring is
+    preceded by padding and starts at offset 0, so every payload is one
+    contiguous slice of the map. Head and tail are logical byte positions
+    that only grow; a position's ring offset is position % capacity.
+
+    Readers open the file read-only and take no locks, so they never wait
+    for a running capture. The writer role is claimed on a separate .lock
+    file.
+    """
+
+    def __init__(self, path, size=16 * 1024 * 1024, readonly=False):
+        self.path = Path(path)
+        self.lock_fd = None
+        if readonly:
+            self.fd = os.open(self.path, os.O_RDONLY)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            # Only creation is locked: the header goes in before the file reaches
+            # HEADER_SIZE, so readers never see a sized file without its magic
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self.fd).st_size < HEADER_SIZE:
+                    os.pwrite(self.fd, HEADER.pack(MAGIC, size), 0)
+                    os.ftruncate(self.fd, HEADER_SIZE + size)
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        magic, self.capacity = HEADER.unpack(os.pread(self.fd, HEADER.size, 0).ljust(HEADER.size, b'\0'))
+        if magic != MAGIC or os.fstat(self.fd).st_size < HEADER_SIZE + self.capacity:
+            os.close(self.fd)
+            raise ValueError(f"{self.path} is not a serial capture file")
+
+        self.map = mmap.mmap(self.fd, HEADER_SIZE + self.capacity,
+                             access=mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE)
+        self.view = memoryview(self.map)
+        self.head, self.tail, self.records = COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)
+        self.received = 0  # Device bytes committed by this process
+        self.anchored_ns = None  # Stamp of the last START/CLOCK record written by this process
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        os.close(self.fd)
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+            self.lock_fd = None
+
+    def lock_writer(self):
+        """Claim the ring for this process; a second capture would interleave records"""
+        lock_path = self.path.with_name(self.path.name + '.lock')
+        self.lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self.lock_fd)
+            self.lock_fd = None
+            raise RuntimeError(f"{self.path} is already being captured to")
+        # A capture that ended after this ring was opened may have moved the counters
+        self.head, self.tail, self.records = COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)
+
+    # --- writing --------------------------------------------------------
+
+    def _size_at(self, position):
+        """Bytes taken by the record (or padding) at a logical position"""
+        offset = position % self.capacity
+        if self.capacity - offset < RECORD.size:
+            return self.capacity - offset
+        _, length, _ = RECORD.unpack_from(self.map, HEADER_SIZE + offset)
+        return RECORD.size + length
+
+    def _make_room(self, size):
+        while self.head + size - self.tail > self.capacity:
+            self.tail += self._size_at(self.tail)
+
+    def _publish(self):
+        COUNTERS.pack_into(self.map, COUNTERS_OFFSET, self.head, self.tail, self.records)
+
+    def reserve(self, size):
+        """Ring offset where a record of up to size bytes can be written contiguously"""
+        offset = self.head % self.capacity
+        if self.capacity - offset < size:
+            pad = self.capacity - offset
+            self._make_room(pad)
+            self._publish()
+            if pad >= RECORD.size:
+                RECORD.pack_into(self.map, HEADER_SIZE + offset, 0, pad - RECORD.size, KIND_PAD)
+            self.head += pad
+            offset = 0
+        self._make_room(size)
+        # Readers must see the new tail before the space is overwritten
+        self._publish()
+        return offset
+
+    def payload_view(self, offset, length=MAX_CHUNK):
+        """Writable slice for a payload, to read device data directly into the map"""
+        start = HEADER_SIZE + offset + RECORD.size
+        return self.view[start:start + length]
+
+    def commit(self, offset, stamp_ns, length, kind=KIND_DATA):
+        """Publish a record whose payload is already in place; the header goes last"""
+        RECORD.pack_into(self.map, HEADER_SIZE + offset, stamp_ns, length, kind)
+        self.head += RECORD.size + length
+        self.records += 1
+        if kind == KIND_DATA:
+            self.received += length
+        self._publish()
+
+    def append(self, kind, payload, stamp_ns=None):
+        offset = self.reserve(RECORD.size + len(payload))
+        self.payload_view(offset, len(payload))[:] = payload
+        self.commit(offset, stamp_ns or time.monotonic_ns(), len(payload), kind)
+
+    def mark_start(self, port):
+        stamp = time.monotonic_ns()
+        self.append(KIND_START, START.pack(time.time()) + port.encode()[:MAX_CHUNK - START.size], stamp)
+        self.anchored_ns = stamp
+
+    def mark_clock(self):
+        stamp = time.monotonic_ns()
+        self.append(KIND_CLOCK, START.pack(time.time()), stamp)
+        self.anchored_ns = stamp
+
+    def mark_gap(self):
+        self.append(KIND_GAP, b'')
+
+    # --- reading --------------------------------------------------------
+
+    def read_records(self):
+        """(monotonic ns, kind, payload bytes), oldest first
+
+        Safe while a capture is running: positions the writer has already
+        overwritten are skipped by jumping to the current tail, and a record
+        overwritten while it was being copied is dropped.
+        """
+        head = COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)[0]
+        position = COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)[1]
+        while position < head:
+            tail = COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)[1]
+            if position < tail:
+                position = tail
+                continue
+            offset = position % self.capacity
+            if self.capacity - offset < RECORD.size:
+                position += self.capacity - offset
+                continue
+            stamp, length, kind = RECORD.unpack_from(self.map, HEADER_SIZE + offset)
+            start = HEADER_SIZE + offset + RECORD.size
+            payload = bytes(self.map[start:start + length])
+            if position < COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)[1]:
+                continue  # Overwritten mid-copy; resume at the new tail
+            position += RECORD.size + length
+            if kind != KIND_PAD:
+                yield stamp, kind, payload
+
+    def stats(self):
+        head, tail, records = COUNTERS.unpack_from(self.map, COUNTERS_OFFSET)
+        return {'capacity': self.capacity, 'used': head - tail, 'written': head, 'records': records}
+
+def wall_clock(records):
+    """Attach wall-clock times from the START and CLOCK anchors
+
+    Yields (wall time or None, monotonic ns, kind, payload) for everything
+    but the anchors. Records from before the first surviving anchor take
+    the offset of the next CLOCK anchor, since it's from the same capture
+    session; one that follows a START may be from another boot, so they
+    are left without a wall time.
+    """
+    offset = None
+    pending = []
+    for stamp, kind, payload in records:
+        if kind in (KIND_START, KIND_CLOCK) and len(payload) >= START.size:
+            offset = START.unpack_from(payload)[0] - stamp / 1e9
+            backfill = offset if kind == KIND_CLOCK else None
+            for record in pending:
+                yield (record[0] / 1e9 + backfill if backfill is not None else None), *record
+            pending = []
+        if kind == KIND_CLOCK:
+            continue
+        if offset is None:
+            pending.append((stamp, kind, payload))
+            continue
+        yield stamp / 1e9 + offset, stamp, kind, payload
+    for record in pending:
+        yield None, *record
+
+def lines(records):
+    """Reassemble received chunks into lines, each stamped with the chunk its first byte came in"""
+    partial = bytearray()
+    first = None
+    for wall, stamp, kind, payload in wall_clock(records):
+        if kind != KIND_DATA:
+            if partial:
+                yield first[0], first[1], KIND_DATA, bytes(partial)
+                partial.clear()
+            yield wall, stamp, kind, payload
+            continue
+        start = 0
+        while start < len(payload):
+            if not partial:
+                first = (wall, stamp)
+            end = payload.find(b'\n', start)
+            if end < 0:
+                partial += payload[start:]
+                break
+            partial += payload[start:end]
+            yield first[0], first[1], KIND_DATA, bytes(partial).rstrip(b'\r')
+            partial.clear()
+            start = end + 1
+    if partial:
+        yield first[0], first[1], KIND_DATA, bytes(partial)
+
+def format_record(wall, stamp, kind, payload, raw=False):
+    when = datetime.fromtimestamp(wall).strftime('%Y-%m-%d %H:%M:%S.%f') if wall else f"{stamp / 1e9:.6f}"
+    if kind == KIND_START:
+        return f"{when}  ── capture started on {payload[START.size:].decode(errors='replace')}"
+    if kind == KIND_GAP:
+        return f"{when}  ── port lost"
+    return f"{when}  {payload!r}" if raw else f"{when}  {payload.decode(errors='replace')}"
+
+def open_port(port, exclusive=False):
+    """Open the port for reading only, without toggling the ESP32's reset lines"""
+    import serial
+
+    ser = serial.Serial()
+    ser.port = port
+    ser.baudrate = 115200
+    ser.dsrdtr = False
+    ser.rtscts = False
+    ser.xonxoff = False
+    ser.exclusive = exclusive
+    ser.open()
+    # pyserial leaves the fd non-blocking with VMIN=0 (it waits in select);
+    # blocking with VMIN=1 makes a read sleep until at least one byte arrives
+    fd = ser.fileno()
+    attrs = termios.tcgetattr(fd)
+    attrs[6][termios.VMIN] = 1
+    attrs[6][termios.VTIME] = 0
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    os.set_blocking(fd, True)
+    return ser
+
+def capture(ring, fd):
+    """Blocking reads straight into the ring until the port goes away"""
+    while True:
+        offset = ring.reserve(RECORD.size + MAX_CHUNK)
+        try:
+            n = os.readv(fd, [ring.payload_view(offset)])
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                continue
+            if e.errno in (errno.EIO, errno.ENXIO, errno.ENODEV):
+                return
+            raise
+        if n == 0:
+            return
+        stamp = time.monotonic_ns()
+        ring.commit(offset, stamp, n)
+        if ring.anchored_ns is None or stamp - ring.anchored_ns >= ANCHOR_INTERVAL_NS:
+            ring.mark_clock()
+
+def wait_for_port(port, interval=0.5):
+    while not os.path.exists(port):
+        time.sleep(interval)
+
+def _stop(signum, frame):
+    raise Stop()
+
+def run_capture(ring, port, exclusive=False, duration=None):
+    """Capture with reconnects until stopped; returns (bytes, seconds)"""
+    ring.lock_writer()
+    signal.signal(signal.SIGTERM, _stop)
+    if duration:
+        signal.signal(signal.SIGALRM, _stop)
+        signal.setitimer(signal.ITIMER_REAL, duration)
+
+    started = time.monotonic()
+    try:
+        while True:
+            wait_for_port(port)
+            try:
+                ser = open_port(port, exclusive)
+            except Exception as e:
+                print(f"⚠️  Could not open {port}: {e}", file=sys.stderr)
+                time.sleep(1)
+                continue
+            print(f"🎙️  Capturing {port} → {ring.path}", file=sys.stderr)
+            ring.mark_start(port)
+            try:
+                capture(ring, ser.fileno())
+            finally:
+                ser.close()
+            ring.mark_gap()
+            print(f"🔌 {port} disconnected, waiting for it to return", file=sys.stderr)
+            time.sleep(1)
+    except (Stop, KeyboardInterrupt):
+        pass
+    finally:
+        if duration:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        ring.map.flush()
+    return ring.received, time.monotonic() - started
+
+def main():
+    parser = argparse.ArgumentParser(description='Timestamped serial capture into a memory-mapped ring file')
+    parser.add_argument('-p', '--port', help='Serial port (default: the configured ESP32 port)')
+    parser.add_argument('-f', '--file', type=Path,
+                        help='Ring file (default: ~/.config/imacdimmer/capture/<port>.cap)')
+    parser.add_argument('--size', type=float, default=16,
+                        help='Ring size in MB when creating the file (default: 16)')
+    parser.add_argument('--exclusive', action='store_true',
+                        help='Lock the port (by default the capture listens alongside other clients)')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds')
+    parser.add_argument('--emulator', action='store_true',
+                        help='Capture the firmware emulator on a pseudo-terminal at a high heartbeat rate')
+    parser.add_argument('--dump', action='store_true', help='Print the captured output as timestamped lines')
+    parser.add_argument('--raw', action='store_true', help='With --dump, print each received chunk as read')
+    parser.add_argument('--last', type=int, metavar='N', help='With --dump, only the last N lines')
+    parser.add_argument('--info', action='store_true', help='Show ring file usage')
+    args = parser.parse_args()
+
+    emulator = None
+    port = args.port
+    reading = args.dump or args.info
+    if args.emulator:
+        from device_emulator import PtyEmulator
+        emulator = PtyEmulator(heartbeat_interval=0.001).__enter__()
+        port = emulator.device
+    elif port is None and not (reading and args.file):
+        # Capturing always needs a port; reading only needs one to name the file
+        from imacdisplay import load_config
+        port = load_config()['port']
+        if port is None:
+            print(f"❌ No ESP32 dimmer found, pass --port{' or --file' if reading else ''}")
+            sys.exit(1)
+
+    path = args.file or default_capture_dir() / f"{'emulator' if emulator else Path(port).name}.cap"
+    try:
+        ring = CaptureRing(path, int(args.size * 1024 * 1024), readonly=reading)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not open capture: {e}")
+        sys.exit(1)
+    try:
+        if args.info:
+            stats = ring.stats()
+            print(f"📼 {ring.path}: {stats['used'] / 1024:.0f} KB of {stats['capacity'] / 1024:.0f} KB used, "
+                  f"{stats['records']} records, {stats['written'] / 1024:.0f} KB captured in total")
+        elif args.dump:
+            records = wall_clock(ring.read_records()) if args.raw else lines(ring.read_records())
+            if args.last:
+                records = list(records)[-args.last:]
+            for record in records:
+                print(format_record(*record, raw=args.raw))
+        else:
+            try:
+                total, elapsed = run_capture(ring, port, args.exclusive, args.duration)
+            except RuntimeError as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+            print(f"✅ Captured {total} bytes in {elapsed:.1f}s ({total / max(elapsed, 1e-9) / 1024:.1f} KB/s), "
+                  f"{ring.stats()['records']} records in {ring.path}", file=sys.stderr)
+    finally:
+        ring.close()
+        if emulator:
+            emulator.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Framed binary serial protocol (frame1)
+Opt-in alternative to the text protocol: length-prefixed frames with
+sequence numbers and a CRC, so commands can be pipelined and replies are
+matched to requests without parsing sentences or skipping heartbeats
+
+Frame: SOF | length | seq | op | payload[length] | crc16 (little-endian)
+The CRC (CRC-16/CCITT-FALSE) covers length, seq, op and payload.
+"""
+
+import argparse
+import struct
+import sys
+import time
+from types import SimpleNamespace
+
+from serial_io import deadline_after
+
+PROTOCOL = 'frame1'
+SOF = 0xA5
+MAX_PAYLOAD = 64
+HEADER = struct.Struct('<BBBB')  # SOF, length, seq, op
+
+# Requests; replies use op | REPLY
+OP_PING = 0x01
+OP_VERSION = 0x02
+OP_SET = 0x03      # payload: percent
+OP_GET = 0x04
+OP_TEXT = 0x05     # leave framed mode
+REPLY = 0x80
+OP_HEARTBEAT = 0x70  # unsolicited, seq 0: millis (u32), wifi (u8), pwm (u8)
+OP_NAK = 0xFF        # frame rejected (bad CRC or length); seq is best effort
+
+# First reply payload byte
+STATUS_OK = 0
+STATUS_BAD_ARG = 1
+STATUS_UNKNOWN_OP = 2
+STATUS_BAD_FRAME = 3
+
+HEARTBEAT = struct.Struct('<IBB')
+
+def crc16(data, crc=0xFFFF):
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return crc
+
+def encode_frame(seq, op, payload=b''):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"payload too long ({len(payload)} > {MAX_PAYLOAD})")
+    body = bytes((len(payload), seq, op)) + bytes(payload)
+    return bytes((SOF,)) + body + struct.pack('<H', crc16(body))
+
+class FrameDecoder:
+    """Incremental decoder; bytes outside frames (e.g. boot messages) are skipped"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.rejected = 0
+
+    def feed(self, data):
+        """Append data and return the complete frames as [(seq, op, payload)]"""
+        self.buffer += data
+        frames = []
+        while True:
+            start = self.buffer.find(SOF)
+            if start < 0:
+                self.buffer.clear()
+                return frames
+            del self.buffer[:start]
+            if len(self.buffer) < HEADER.size:
+                return frames
+            _, length, seq, op = HEADER.unpack_from(self.buffer)
+            if length > MAX_PAYLOAD:
+                self.rejected += 1
+                del self.buffer[:1]
+                continue
+            end = HEADER.size + length + 2
+            if len(self.buffer) < end:
+                return frames
+            body = bytes(self.buffer[1:HEADER.size + length])
+            (crc,) = struct.unpack_from('<H', self.buffer, HEADER.size + length)
+            if crc != crc16(body):
+                # Not a frame after all (or corrupted): resync on the next SOF
+                self.rejected += 1
+                del self.buffer[:1]
+                continue
+            frames.append((seq, op, body[3:]))
+            del self.buffer[:end]
+
+def to_int(value):
+    digits = ''
+    for c in value.strip():
+        if not c.isdigit():
+            break
+        digits += c
+    return int(digits) if digits else 0
+
+class FramedChannel:
+    """Request/reply over a SerialChannel in framed mode, with pipelining and retries"""
+
+    def __init__(self, channel, retries=2):
+        self.channel = channel
+        self.retries = retries
+        self.decoder = FrameDecoder()
+        self.replies = {}
+        self.heartbeat = None
+        self.naks = 0
+        self._seq = 0
+
+    def next_seq(self):
+        self._seq = self._seq % 255 + 1  # 1..255; 0 is for unsolicited frames
+        return self._seq
+
+    def send(self, op, payload=b''):
+        seq = self.next_seq()
+        self.replies.pop(seq, None)  # Late reply from the last time this seq was used
+        self.channel.write(encode_frame(seq, op, payload))
+        return seq
+
+    def _collect(self, deadline):
+        data = self.channel.read_available(deadline)
+        for seq, op, payload in self.decoder.feed(data):
+            if op == OP_HEARTBEAT:
+                if len(payload) == HEARTBEAT.size:
+                    self.heartbeat = HEARTBEAT.unpack(payload)
+            elif seq:
+                self.naks += op == OP_NAK
+                self.replies[seq] = (op, payload)
+        return bool(data)
+
+    def receive(self, seq, deadline):
+        """Reply (op, payload) for seq, or None if the deadline passes"""
+        while seq not in self.replies:
+            if time.monotonic() >= deadline:
+                return None
+            self._collect(deadline)
+        return self.replies.pop(seq)
+
+    def request(self, op, payload=b'', deadline=None):
+        """Send one request, resending after a NAK or a lost reply while time remains"""
+        deadline = deadline or deadline_after(2.0)
+        for attempt in range(self.retries + 1):
+            seq = self.send(op, payload)
+            attempt_deadline = time.monotonic() + (deadline - time.monotonic()) / (self.retries + 1 - attempt)
+            reply = self.receive(seq, attempt_deadline)
+            if reply is not None and reply[0] == op | REPLY:
+                return reply[1]
+            if time.monotonic() >= deadline:
+                break
+        return None
+
+    def pipeline(self, requests, deadline):
+        """Send all (op, payload) requests back to back, then collect the replies in order"""
+        seqs = [(self.send(op, payload), op) for op, payload in requests]
+        replies = []
+        for seq, op in seqs:
+            reply = self.receive(seq, deadline)
+            replies.append(reply[1] if reply is not None and reply[0] == op | REPLY else None)
+        return replies
+
+    def command(self, cmd, deadline):
+        """Text-protocol command over frames; returns the same reply text the text protocol would"""
+        cmd = cmd.strip()
+        if cmd == 'ping':
+            reply = self.request(OP_PING, deadline=deadline)
+            return "pong" if reply and reply[0] == STATUS_OK else None
+        if cmd == 'version':
+            reply = self.request(OP_VERSION, deadline=deadline)
+            if not reply or reply[0] != STATUS_OK:
+                return None
+            firmware, _, build = reply[1:].decode(errors='replace').partition('\0')
+            return f"Firmware: {firmware}, Build: {build}"
+        if cmd == 'get':
+            reply = self.request(OP_GET, deadline=deadline)
+            return f"Current brightness: {reply[1]}%" if reply and reply[0] == STATUS_OK else None
+        if cmd[:1].isdigit():
+            reply = self.request(OP_SET, bytes((max(0, min(100, to_int(cmd))),)), deadline)
+            return f"Brightness set to: {reply[1]}%" if reply and reply[0] == STATUS_OK else None
+        return f"Unknown command: '{cmd}'"
+
+    def leave(self, deadline=None):
+        """Switch the firmware back to the text protocol"""
+        return self.request(OP_TEXT, deadline=deadline or deadline_after(0.5)) is not None
+
+def negotiate(channel, deadline):
+    """Switch to framed mode if the firmware's version reply advertises it
+
+    Returns a FramedChannel, or None to keep using the text protocol.
+    """
+    reply = channel.request('version', deadline)
+    if not reply or PROTOCOL not in reply.partition('Protocols:')[2].split():
+        return None
+    reply = channel.request(PROTOCOL, deadline)
+    if not reply or not reply.startswith('Framed mode'):
+        return None
+    return FramedChannel(channel)
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate the framed serial protocol against the firmware emulator')
+    parser.add_argument('-n', '--count', type=int, default=200, help='Pipelined set/get pairs (default: 200)')
+    parser.add_argument('--corrupt-every', type=int, default=7,
+                        help='Corrupt every Nth request frame on the wire to exercise CRC/NAK handling (default: 7)')
+    args = parser.parse_args()
+
+    import serial
+    from device_emulator import PtyEmulator
+    from serial_io import SerialChannel
+    from batch_script import parse_script, run_batch
+
+    failures = []
+    # Frequent heartbeats so they interleave with replies in both protocol modes
+    with PtyEmulator(heartbeat_interval=0.01, corrupt_every=args.corrupt_every) as emulator:
+        channel = SerialChannel(serial.Serial(emulator.device, 115200))
+        try:
+            framed = negotiate(channel, deadline_after(2.0))
+            if framed is None:
+                print("❌ Emulator did not negotiate framed mode")
+                sys.exit(1)
+            print(f"🔗 Negotiated {PROTOCOL} on {emulator.device}")
+
+            for cmd, expected in (('ping', 'pong'), ('40', 'Brightness set to: 40%'),
+                                  ('get', 'Current brightness: 40%')):
+                reply = framed.command(cmd, deadline_after(2.0))
+                if reply != expected:
+                    failures.append(f"{cmd}: expected {expected!r}, got {reply!r}")
+            version = framed.command('version', deadline_after(2.0))
+            print(f"   {version}")
+
+            emulator.corrupting = True
+            started = time.perf_counter()
+            for i in range(args.count):
+                level = 5 + i % 96
+                set_reply = framed.request(OP_SET, bytes((level,)), deadline_after(2.0))
+                get_reply = framed.request(OP_GET, deadline=deadline_after(2.0))
+                # get reports the PWM value mapped back to percent, which can read 1% low
+                if not set_reply or not get_reply or get_reply[2] != set_reply[2]:
+                    failures.append(f"set/get {level}: {set_reply!r} {get_reply!r}")
+            elapsed = time.perf_counter() - started
+            emulator.corrupting = False
+            print(f"   {args.count * 2} requests with wire corruption in {elapsed * 1000:.0f} ms "
+                  f"({framed.naks} NAKs, all retried)")
+
+            started = time.perf_counter()
+            replies = framed.pipeline([(OP_SET, bytes((5 + i % 96,))) for i in range(32)], deadline_after(2.0))
+            elapsed = time.perf_counter() - started
+            if any(r is None or r[0] != STATUS_OK for r in replies):
+                failures.append(f"pipeline: {replies}")
+            print(f"   32 pipelined sets in {elapsed * 1000:.1f} ms")
+            if framed.heartbeat is None:
+                failures.append("no heartbeat frame decoded")
+
+            framed.leave()
+            if channel.request('ping', deadline_after(2.0)) != 'pong':
+                failures.append("text protocol not restored after leaving framed mode")
+
+            # Levels 1-4 print a warning before the acknowledgement, which must not be taken as the reply
+            text = SimpleNamespace(command=lambda cmd: channel.request(cmd, deadline_after(2.0)))
+            results, final = run_batch(text, parse_script(['set 2', 'inc 5']), 40, allow_zero=True)
+            if not all(r['ok'] for r in results) or [r['value'] for r in results] != [2, 7]:
+                failures.append(f"text batch below 5%: {results}")
+        finally:
+            channel.close()
+
+    for failure in failures[:10]:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Framed protocol matches the emulator")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
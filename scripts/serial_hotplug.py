@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Event-driven USB serial hotplug detection
+Watches /dev with inotify and keeps a live set of candidate ESP32 ports,
+so port lookup is a memory read and replugs are noticed immediately
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import glob
+import os
+import select
+import struct
+import threading
+
+DEV_DIR = '/dev'
+PATTERNS = ('ttyACM*', 'ttyUSB*')
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+
+def _inotify_fd():
+    """Create an inotify watch on /dev, or return None if inotify isn't available"""
+    global _libc
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MOVED_TO | IN_MOVED_FROM
+        if _libc.inotify_add_watch(fd, DEV_DIR.encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+def is_candidate(name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in PATTERNS)
+
+def scan_devices():
+    """One-off glob of candidate serial devices"""
+    devices = set()
+    for pattern in PATTERNS:
+        devices.update(glob.glob(os.path.join(DEV_DIR, pattern)))
+    return devices
+
+class SerialHotplugWatcher(threading.Thread):
+    """Live view of /dev/ttyACM* and /dev/ttyUSB*, with attach/detach callbacks"""
+
+    def __init__(self):
+        super().__init__(daemon=True, name='serial-hotplug')
+        self._lock = threading.Lock()
+        self._devices = scan_devices()
+        self._listeners = []
+        self._fd = _inotify_fd()
+        self.generation = 0  # Bumped on every attach/detach
+
+    @property
+    def event_driven(self):
+        return self._fd is not None
+
+    def add_listener(self, on_attach=None, on_detach=None):
+        with self._lock:
+            self._listeners.append((on_attach, on_detach))
+
+    def devices(self):
+        """Candidate ports, ACM (ESP32-C3 native USB) first"""
+        with self._lock:
+            devices = list(self._devices)
+        return sorted(devices, key=lambda d: ('ACM' not in d, d))
+
+    def refresh(self):
+        """Re-glob /dev; only needed when inotify isn't available"""
+        current = scan_devices()
+        with self._lock:
+            previous = self._devices
+        for device in current - previous:
+            self._changed(device, True)
+        for device in previous - current:
+            self._changed(device, False)
+
+    def _changed(self, device, attached):
+        with self._lock:
+            if attached == (device in self._devices):
+                return
+            if attached:
+                self._devices.add(device)
+            else:
+                self._devices.discard(device)
+            self.generation += 1
+            listeners = list(self._listeners)
+        for on_attach, on_detach in listeners:
+            callback = on_attach if attached else on_detach
+            if callback:
+                try:
+                    callback(device)
+                except Exception as e:
+                    print(f"⚠️  Hotplug callback error: {e}")
+
+    def _handle_events(self, data):
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0').decode(errors='replace')
+            offset += name_len
+            if not is_candidate(name):
+                continue
+            device = os.path.join(DEV_DIR, name)
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._changed(device, False)
+            elif mask & (IN_CREATE | IN_MOVED_TO | IN_ATTRIB):
+                self._changed(device, os.path.exists(device))
+
+    def run(self):
+        if self._fd is None:
+            return
+        while True:
+            try:
+                select.select([self._fd], [], [])
+                self._handle_events(os.read(self._fd, 4096))
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    continue
+                print(f"⚠️  Hotplug watcher stopped: {e}")
+                return
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_hotplug_watcher():
+    """Start the shared hotplug watcher on first use"""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = SerialHotplugWatcher()
+            _watcher.start()
+        return _watcher
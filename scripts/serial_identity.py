@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Sysfs-backed serial device identity index
+Maps each tty to its USB vendor/product ID, serial number and interface,
+so the dimmer is selected by identity instead of "first ACM port wins"
+"""
+
+import os
+from collections import namedtuple
+
+from serial_hotplug import get_hotplug_watcher
+
+SYS_TTY = '/sys/class/tty'
+
+SerialIdentity = namedtuple('SerialIdentity', [
+    'device', 'vid', 'pid', 'serial', 'interface', 'manufacturer', 'product'])
+
+# USB IDs that can be an ESP32 dimmer, most specific first
+ESP32_USB_IDS = [
+    ('303a', '1001'),  # Espressif native USB-Serial/JTAG (ESP32-C3 SuperMini)
+    ('10c4', 'ea60'),  # CP210x bridge (older ESP32 dev boards)
+    ('1a86', '55d4'),  # CH9102 bridge
+    ('1a86', '7523'),  # CH340 bridge
+]
+
+def _read_attr(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def read_identity(device):
+    """Walk up from /sys/class/tty/<name>/device to the USB interface and device"""
+    tty_name = os.path.basename(device)
+    device_link = os.path.join(SYS_TTY, tty_name, 'device')
+    if not os.path.exists(device_link):
+        return None
+
+    path = os.path.realpath(device_link)
+    interface = None
+    while path and path != '/':
+        if interface is None:
+            interface = _read_attr(path, 'bInterfaceNumber')
+        vid = _read_attr(path, 'idVendor')
+        if vid:
+            return SerialIdentity(
+                device=device,
+                vid=vid,
+                pid=_read_attr(path, 'idProduct'),
+                serial=_read_attr(path, 'serial'),
+                interface=interface,
+                manufacturer=_read_attr(path, 'manufacturer'),
+                product=_read_attr(path, 'product'),
+            )
+        path = os.path.dirname(path)
+    return None
+
+def format_device_id(identity):
+    """Stable identity string stored in the config: vid:pid[:serial]"""
+    parts = [identity.vid, identity.pid]
+    if identity.serial:
+        parts.append(identity.serial)
+    return ':'.join(parts)
+
+class SerialIdentityIndex:
+    """Identity of every USB serial port, rebuilt only after hotplug events"""
+
+    def __init__(self):
+        self._generation = None
+        self._by_device = {}
+        self._by_id = {}
+
+    def _refresh(self):
+        watcher = get_hotplug_watcher()
+        if self._generation == watcher.generation and self._by_device:
+            return
+        self._generation = watcher.generation
+
+        self._by_device = {}
+        self._by_id = {}
+        for device in watcher.devices():
+            identity = read_identity(device)
+            if identity:
+                self._by_device[device] = identity
+                self._by_id.setdefault(format_device_id(identity), device)
+                self._by_id.setdefault(f'{identity.vid}:{identity.pid}', device)
+
+    def identities(self):
+        self._refresh()
+        return list(self._by_device.values())
+
+    def identity_of(self, device):
+        self._refresh()
+        return self._by_device.get(device)
+
+    def find_dimmer(self, device_id=None):
+        """Port for the configured device_id, else the best known ESP32 USB ID"""
+        self._refresh()
+        if device_id and device_id in self._by_id:
+            return self._by_id[device_id]
+        for vid, pid in ESP32_USB_IDS:
+            device = self._by_id.get(f'{vid}:{pid}')
+            if device:
+                return device
+        return None
+
+    @property
+    def available(self):
+        """True if sysfs gave us identities to select from"""
+        self._refresh()
+        return bool(self._by_device)
+
+_index = SerialIdentityIndex()
+
+def get_identity_index():
+    return _index
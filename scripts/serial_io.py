@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Non-blocking serial I/O with selectors and deadline-based reads
+Replies are delivered as soon as their newline arrives instead of
+polling in_waiting or waiting out a fixed readline() timeout
+"""
+
+import errno
+import os
+import selectors
+import time
+
+# Unsolicited firmware output that is never a command reply
+HEARTBEAT_PREFIX = b'Heartbeat:'
+ECHO_PREFIX = b'Received command:'
+
+# Last line the firmware prints for a text command; anything before it
+# (e.g. the warning for levels below 5%) is informational
+REPLY_PREFIXES = (b'Brightness set to', b'pong', b'Firmware', b'Unknown command', b'Framed mode')
+
+def deadline_after(seconds):
+    """Absolute monotonic deadline for an operation"""
+    return time.monotonic() + seconds
+
+def remaining(deadline):
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+class SerialChannel:
+    """Line-oriented, non-blocking reader/writer over an open pyserial port"""
+
+    def __init__(self, ser, chunk_size=4096):
+        self.ser = ser
+        self.ser.timeout = 0  # Never let pyserial block; the selector does the waiting
+        self.fd = ser.fileno()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.fd, selectors.EVENT_READ)
+        self.buffer = bytearray()
+        self._chunk = bytearray(chunk_size)
+        self._view = memoryview(self._chunk)
+
+    def close(self):
+        try:
+            self.selector.close()
+        finally:
+            self.ser.close()
+
+    def fill(self, deadline=None):
+        """Wait until data is readable (or the deadline passes) and append it to the buffer
+
+        Returns the number of bytes read; 0 means the deadline passed.
+        """
+        if not self.selector.select(remaining(deadline)):
+            return 0
+        try:
+            n = os.readv(self.fd, [self._view])
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return 0
+            raise
+        if n == 0:
+            # Readable but empty: the device went away
+            raise OSError(errno.EIO, "Serial device disconnected")
+        self.buffer += self._view[:n]
+        return n
+
+    def readline(self, deadline=None):
+        """Next complete line (without line ending), or None if the deadline passes"""
+        while True:
+            index = self.buffer.find(b'\n')
+            if index >= 0:
+                line = bytes(self.buffer[:index]).rstrip(b'\r')
+                del self.buffer[:index + 1]
+                return line
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            self.fill(deadline)
+
+    def read_available(self, deadline=None):
+        """Buffered data, or whatever arrives first before the deadline (b'' on timeout)"""
+        if not self.buffer:
+            self.fill(deadline)
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+    def write(self, data):
+        self.ser.write(data)
+        self.ser.flush()
+
+    def drain(self):
+        """Drop anything already buffered (e.g. heartbeats) before a command"""
+        self.buffer.clear()
+        while self.fill(time.monotonic()):
+            self.buffer.clear()
+
+    def request(self, cmd, deadline):
+        """Send a text command and return its reply line, skipping heartbeats, echoes and warnings
+
+        If no reply line arrives before the deadline, the last other line
+        (or None) is returned.
+        """
+        self.drain()
+        self.write(f"{cmd}\n".encode())
+        other = None
+        while True:
+            line = self.readline(deadline)
+            if line is None:
+                return other
+            if line.startswith(HEARTBEAT_PREFIX) or line.startswith(ECHO_PREFIX) or not line:
+                continue
+            if line.startswith(REPLY_PREFIXES):
+                return line.decode(errors='replace').strip()
+            other = line.decode(errors='replace').strip()
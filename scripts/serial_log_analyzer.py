@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Serial log analyzer for heartbeat jitter, reboots, boot time and command latency
+Parses captured firmware output chunk by chunk into columnar NumPy arrays,
+so multi-gigabyte logs stream through in bounded memory
+
+Inputs: serial_capture.py ring files, `serial_capture.py --dump` output
+(timestamped lines) or plain text logs (device clock only: no latencies).
+"""
+
+import argparse
+import json
+import sys
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("Error: the log analyzer needs NumPy (sudo apt install python3-numpy)")
+    sys.exit(1)
+
+sys.path.append(str(Path(__file__).parent))
+from serial_capture import CaptureRing, MAGIC, KIND_DATA, KIND_START, KIND_CLOCK, START
+
+HEARTBEAT_INTERVAL_MS = 2000  # main.cpp sends one every 2 s
+
+# Line kinds
+OTHER, HEARTBEAT, BANNER, READY, ECHO, REPLY, MARKER = range(7)
+
+LINE_PREFIXES = [
+    (b'Heartbeat: ', HEARTBEAT),
+    (b'=== ESP32-C3 SuperMini iMac Dimmer Starting', BANNER),
+    (b'Web server started', READY),
+    (b'WiFi connection failed. Continuing with serial-only mode', READY),
+    (b"Received command: '", ECHO),
+    (b'Firmware: ', REPLY),
+    (b'pong', REPLY),
+    (b'Framed mode', REPLY),
+    (b'Current brightness:', REPLY),
+    (b'Brightness set to:', REPLY),
+    (b'Unknown command:', REPLY),
+    ('── '.encode(), MARKER),  # serial_capture.py --dump: capture started / port lost
+]
+
+# Command types, from the echoed command text
+COMMANDS = ['set', 'version', 'ping', 'frame1', 'other']
+COMMAND_PREFIXES = [(b"version'", 1), (b"ping'", 2), (b"frame1'", 3)]
+
+DUMP_TIMESTAMP = 26  # 'YYYY-MM-DD HH:MM:SS.ffffff', followed by two spaces
+
+# Columnar view of one chunk of lines. buf: uint8; start/end: line content
+# bounds; time: host seconds (NaN if unknown); wall_offset: added to time
+# for display
+Lines = namedtuple('Lines', ['buf', 'start', 'end', 'time', 'wall_offset'])
+
+# --- reading --------------------------------------------------------------
+
+def split_lines(buf):
+    """Line bounds of a chunk that ends with a newline; '\\r' is stripped"""
+    newlines = np.flatnonzero(buf == 10)
+    start = np.concatenate(([0], newlines[:-1] + 1))
+    end = newlines.copy()
+    has_cr = (end > start) & (buf[np.maximum(end - 1, 0)] == 13)
+    end[has_cr] -= 1
+    return start, end, newlines
+
+def text_chunks(f, chunk_size):
+    """Chunks of a binary file cut after their last newline"""
+    leftover = b''
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            if leftover:
+                yield leftover + b'\n'
+            return
+        data = leftover + data
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            leftover = data
+            continue
+        leftover = data[cut:]
+        yield data[:cut]
+
+def parse_dump_times(buf, start, end):
+    """Seconds from the fixed-width timestamps of `serial_capture.py --dump` lines (NaN elsewhere)"""
+    ok = end - start >= DUMP_TIMESTAMP
+    for position, char in ((4, '-'), (10, ' '), (19, '.')):
+        ok &= buf[np.minimum(start + position, len(buf) - 1)] == ord(char)
+    times = np.full(len(start), np.nan)
+    if not ok.any():
+        return times, start
+    d = buf[start[ok, None] + np.arange(DUMP_TIMESTAMP)].astype(np.int64) - ord('0')
+
+    def number(first, last):
+        value = np.zeros(len(d), np.int64)
+        for i in range(first, last):
+            value = value * 10 + d[:, i]
+        return value
+
+    days = ((number(0, 4) - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+            + (number(5, 7) - 1).astype('timedelta64[M]')).astype('datetime64[D]')
+    days = (days + (number(8, 10) - 1).astype('timedelta64[D]')).astype(np.int64)
+    times[ok] = (days * 86400 + number(11, 13) * 3600 + number(14, 16) * 60 + number(17, 19)
+                 + number(20, 26) / 1e6)
+    content = start.copy()
+    content[ok] += DUMP_TIMESTAMP + 2
+    return times, content
+
+def read_text(path, chunk_size):
+    """Lines of a plain or --dump text log; times are naive local time for dumps"""
+    with open(path, 'rb') as f:
+        timestamped = None
+        for data in text_chunks(f, chunk_size):
+            buf = np.frombuffer(data, np.uint8)
+            start, end, _ = split_lines(buf)
+            if timestamped is None:
+                timestamped = np.isfinite(parse_dump_times(buf, start[:1], end[:1])[0]).all()
+            if timestamped:
+                times, start = parse_dump_times(buf, start, end)
+            else:
+                times = np.full(len(start), np.nan)
+            yield Lines(buf, start, end, times, 0.0)
+
+def read_capture(path, chunk_size):
+    """Lines of a capture ring, timed by the record their newline arrived in
+
+    Yields None between capture sessions (port lost or capture restarted).
+    """
+    ring = CaptureRing(path, readonly=True)
+    try:
+        data = bytearray()
+        ends, stamps = [], []
+        wall_offset = 0.0
+
+        def flush(final=False):
+            nonlocal data, ends, stamps
+            if final and data and data[-1] != 10:
+                data += b'\n'
+                ends[-1] = len(data)
+            cut = data.rfind(b'\n') + 1
+            if cut == 0:
+                return None
+            buf = np.frombuffer(bytes(data[:cut]), np.uint8)
+            start, end, newlines = split_lines(buf)
+            record = np.searchsorted(np.array(ends, np.int64), newlines, side='right')
+            times = np.array(stamps, np.float64)[np.minimum(record, len(stamps) - 1)] / 1e9
+            # Keep the partial last line; the record with its newline decides its time
+            data = data[cut:]
+            ends, stamps = ([len(data)], [stamps[-1]]) if data else ([], [])
+            return Lines(buf, start, end, times, wall_offset)
+
+        for stamp, kind, payload in ring.read_records():
+            if kind == KIND_DATA:
+                data += payload
+                ends.append(len(data))
+                stamps.append(stamp)
+                if len(data) >= chunk_size:
+                    lines = flush()
+                    if lines is not None:
+                        yield lines
+                continue
+            if kind == KIND_CLOCK and len(payload) >= START.size:
+                # Same session: also dates the data buffered before the first anchor
+                wall_offset = START.unpack_from(payload)[0] - stamp / 1e9
+                continue
+            lines = flush(final=True)
+            if lines is not None:
+                yield lines
+            data, ends, stamps = bytearray(), [], []
+            if kind == KIND_START and len(payload) >= START.size:
+                wall_offset = START.unpack_from(payload)[0] - stamp / 1e9
+            yield None
+        lines = flush(final=True)
+        if lines is not None:
+            yield lines
+    finally:
+        ring.close()
+
+def read_log(path, chunk_size=64 * 1024 * 1024):
+    with open(path, 'rb') as f:
+        is_capture = f.read(len(MAGIC)) == MAGIC
+    if is_capture:
+        return 'capture', read_capture(path, chunk_size)
+    return 'text', read_text(path, chunk_size)
+
+# --- parsing --------------------------------------------------------------
+
+def starts_with(buf, start, end, prefix):
+    p = np.frombuffer(prefix, np.uint8)
+    match = (end - start) >= len(p)
+    rows = np.flatnonzero(match)
+    if rows.size:
+        match[rows] = (buf[start[rows, None] + np.arange(len(p))] == p).all(axis=1)
+    return match
+
+def parse_uint(buf, pos, width=10):
+    """Decimal number at each position (up to the first non-digit)"""
+    index = np.minimum(pos[:, None] + np.arange(width), len(buf) - 1)
+    digits = buf[index].astype(np.int64) - ord('0')
+    valid = np.cumprod((digits >= 0) & (digits <= 9), axis=1).astype(bool)
+    count = valid.sum(axis=1)
+    powers = 10 ** np.clip(count[:, None] - 1 - np.arange(width), 0, None)
+    return np.where(valid, digits * powers, 0).sum(axis=1)
+
+def classify(lines):
+    """Columns for one chunk: kind, device millis (heartbeats) and command type (echoes)"""
+    buf, start, end = lines.buf, lines.start, lines.end
+    kind = np.full(len(start), OTHER, np.int8)
+    first = np.where(end > start, buf[np.minimum(start, len(buf) - 1)], 0)
+    for prefix, line_kind in LINE_PREFIXES:
+        rows = np.flatnonzero((first == prefix[0]) & (kind == OTHER))
+        if rows.size:
+            kind[rows[starts_with(buf, start[rows], end[rows], prefix)]] = line_kind
+
+    millis = np.full(len(start), -1, np.int64)
+    rows = np.flatnonzero(kind == HEARTBEAT)
+    if rows.size:
+        millis[rows] = parse_uint(buf, start[rows] + len(LINE_PREFIXES[0][0]))
+
+    command = np.full(len(start), -1, np.int8)
+    rows = np.flatnonzero(kind == ECHO)
+    if rows.size:
+        pos = start[rows] + len(LINE_PREFIXES[4][0])
+        types = np.full(rows.size, COMMANDS.index('other'), np.int8)
+        at = buf[np.minimum(pos, len(buf) - 1)]
+        is_digit = (at >= ord('0')) & (at <= ord('9'))
+        types[is_digit & (pos < end[rows])] = COMMANDS.index('set')
+        for prefix, command_type in COMMAND_PREFIXES:
+            types[starts_with(buf, pos, end[rows], prefix)] = command_type
+        command[rows] = types
+    return kind, millis, command
+
+# --- statistics -----------------------------------------------------------
+
+class Distribution:
+    """Streaming count, mean and variance (merged per chunk), with a fixed-bin histogram for percentiles"""
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, np.int64)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        values = np.asarray(values, np.float64)
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return
+        n, mean = values.size, values.mean()
+        delta = mean - self.mean
+        total = self.n + n
+        self.m2 += ((values - mean) ** 2).sum() + delta ** 2 * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.counts += np.bincount(np.searchsorted(self.edges, values), minlength=len(self.counts))
+
+    @property
+    def std(self):
+        return (self.m2 / self.n) ** 0.5 if self.n else 0.0
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile, clamped to the observed range"""
+        if not self.n:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.n))
+        value = self.edges[min(index, len(self.edges) - 1)]
+        return float(min(max(value, self.min), self.max))
+
+    def summary(self, scale=1.0):
+        if not self.n:
+            return {'count': 0}
+        return {'count': self.n, 'mean': self.mean * scale, 'std': self.std * scale,
+                'min': self.min * scale, 'max': self.max * scale,
+                **{f'p{q}': self.percentile(q) * scale for q in (50, 95, 99)}}
+
+def jitter_edges():
+    """Milliseconds around zero: 0.1 ms bins within ±100 ms, logarithmic beyond"""
+    tail = np.geomspace(100, 1e7, 200)[1:]
+    return np.concatenate((-tail[::-1], np.linspace(-100, 100, 2001), tail))
+
+def latency_edges():
+    return np.geomspace(1e-6, 100, 801)  # Seconds, ~2% bins
+
+def pair_next(a, b):
+    """For each line index in a, the position in b of the first b after it, or -1 if the next a comes first"""
+    j = np.searchsorted(b, a)
+    following = np.append(a[1:], np.iinfo(np.int64).max)
+    ok = j < len(b)
+    ok[ok] = b[j[ok]] < following[ok]
+    return np.where(ok, j, -1)
+
+class LogAnalysis:
+    """Heartbeat, reboot and latency statistics accumulated chunk by chunk"""
+
+    def __init__(self, interval_ms=HEARTBEAT_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self.lines = 0
+        self.bytes = 0
+        self.device_jitter = Distribution(jitter_edges())
+        self.arrival_jitter = Distribution(jitter_edges())
+        self.late = 0
+        self.reboots = []       # (line, wall time or None, how it was detected, boot-to-ready seconds)
+        self.boot_to_ready = Distribution(latency_edges())
+        self.latency = {name: Distribution(latency_edges()) for name in COMMANDS}
+        self.commands = np.zeros(len(COMMANDS), np.int64)
+        self.unanswered = np.zeros(len(COMMANDS), np.int64)
+        # State carried across chunks
+        self.last_kind = OTHER
+        self.last_heartbeat = None  # (millis, time)
+        self.continuous = False     # No capture gap since the last heartbeat
+        self.boot_since_heartbeat = False
+        self.pending_echo = None    # (time, command type)
+        self.pending_boot = None    # Index into self.reboots awaiting its ready line
+
+    def session_break(self):
+        """Capture gap: host intervals and pending pairs can't span it; counter resets still show reboots"""
+        self.continuous = False
+        if self.pending_echo is not None:
+            self.unanswered[self.pending_echo[1]] += 1
+        self.pending_echo = None
+        self.pending_boot = None
+        self.last_kind = OTHER
+
+    def feed(self, lines):
+        kind, millis, command = classify(lines)
+        times = lines.time
+        first_line = self.lines
+        self.lines += len(kind)
+        self.bytes += len(lines.buf)
+
+        def wall(i):
+            return float(times[i] + lines.wall_offset) if np.isfinite(times[i]) else None
+
+        # Boots: the first of each run of banner lines
+        previous = np.concatenate(([self.last_kind], kind[:-1]))
+        boot = np.flatnonzero((kind == BANNER) & (previous != BANNER))
+        if len(kind):
+            self.last_kind = kind[-1]
+
+        # Heartbeat intervals on the device clock, and arrival intervals on the host.
+        # Intervals spanning a boot are skipped; ones spanning a capture gap
+        # only count on the device clock.
+        beats = np.flatnonzero(kind == HEARTBEAT)
+        boots_before = np.searchsorted(boot, beats)
+        gaps_before = np.searchsorted(np.flatnonzero(kind == MARKER), beats)
+        m, t = millis[beats], times[beats]
+        same_boot = np.diff(boots_before) == 0
+        continuous = np.diff(gaps_before) == 0
+        if self.last_heartbeat is not None and beats.size:
+            m = np.concatenate(([self.last_heartbeat[0]], m))
+            t = np.concatenate(([self.last_heartbeat[1]], t))
+            same_boot = np.concatenate(([boots_before[0] == 0 and not self.boot_since_heartbeat], same_boot))
+            continuous = np.concatenate(([self.continuous and gaps_before[0] == 0], continuous))
+        dm, dt = np.diff(m), np.diff(t)
+        valid = same_boot & (dm >= 0)
+        self.device_jitter.add(dm[valid] - self.interval_ms)
+        self.arrival_jitter.add(dt[valid & continuous] * 1000 - self.interval_ms)
+        self.late += int((dm[valid] > 1.5 * self.interval_ms).sum())
+        # Counter went backwards without a banner: a reboot whose boot output wasn't captured
+        reset_beats = beats[np.flatnonzero(same_boot & (dm < 0)) + len(beats) - len(dm)]
+        if beats.size:
+            self.last_heartbeat = (m[-1], t[-1])
+            self.continuous = not (kind[beats[-1]:] == MARKER).any()
+        elif (kind == MARKER).any():
+            self.continuous = False
+        if boot.size and (not beats.size or boot[-1] > beats[-1]):
+            self.boot_since_heartbeat = True
+        elif beats.size:
+            self.boot_since_heartbeat = False
+
+        # Boot-to-ready: the first ready line after each banner, before the next boot
+        ready = np.flatnonzero(kind == READY)
+        if self.pending_boot is not None and (ready.size or boot.size):
+            if ready.size and (not boot.size or ready[0] < boot[0]):
+                line, when, how, _ = self.reboots[self.pending_boot]
+                if when is not None and wall(ready[0]) is not None:
+                    seconds = wall(ready[0]) - when
+                    self.reboots[self.pending_boot] = (line, when, how, seconds)
+                    self.boot_to_ready.add([seconds])
+            self.pending_boot = None
+        matched = pair_next(boot, ready)
+        events = sorted([(i, 'banner') for i in boot] + [(i, 'counter reset') for i in reset_beats])
+        for i, how in events:
+            seconds = None
+            if how == 'banner':
+                j = matched[np.searchsorted(boot, i)]
+                if j >= 0:
+                    seconds = float(times[ready[j]] - times[i])
+                    if np.isfinite(seconds):
+                        self.boot_to_ready.add([seconds])
+                    else:
+                        seconds = None
+                elif i == boot[-1]:
+                    self.pending_boot = len(self.reboots)
+                when = wall(i)
+            else:
+                # Heartbeat millis is the uptime: the boot happened that long before it arrived
+                when = wall(i) - millis[i] / 1000 if wall(i) is not None else None
+            self.reboots.append((first_line + int(i) + 1, when, how, seconds))
+
+        # Command latency: echo ("Received command:") to the reply line
+        echoes = np.flatnonzero(kind == ECHO)
+        replies = np.flatnonzero(kind == REPLY)
+        if self.pending_echo is not None and (echoes.size or replies.size):
+            sent, command_type = self.pending_echo
+            if replies.size and (not echoes.size or replies[0] < echoes[0]):
+                self.latency[COMMANDS[command_type]].add([times[replies[0]] - sent])
+            else:
+                self.unanswered[command_type] += 1
+            self.pending_echo = None
+        if echoes.size:
+            types = command[echoes]
+            self.commands += np.bincount(types, minlength=len(COMMANDS))
+            matched = pair_next(echoes, replies)
+            answered = matched >= 0
+            latency = times[replies[matched[answered]]] - times[echoes[answered]]
+            for command_type, name in enumerate(COMMANDS):
+                self.latency[name].add(latency[types[answered] == command_type])
+            unanswered = np.flatnonzero(~answered)
+            if unanswered.size and unanswered[-1] == len(echoes) - 1:
+                # Its reply may be in the next chunk
+                self.pending_echo = (times[echoes[-1]], int(types[-1]))
+                unanswered = unanswered[:-1]
+            self.unanswered += np.bincount(types[unanswered], minlength=len(COMMANDS))
+
+    def finish(self):
+        if self.pending_echo is not None:
+            self.unanswered[self.pending_echo[1]] += 1
+            self.pending_echo = None
+
+    def as_dict(self):
+        return {
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'heartbeat': {'interval_ms': self.interval_ms,
+                          'device_jitter_ms': self.device_jitter.summary(),
+                          'arrival_jitter_ms': self.arrival_jitter.summary(),
+                          'late': self.late},
+            'reboots': [{'line': line, 'time': when, 'detected_by': how, 'boot_to_ready_s': seconds}
+                        for line, when, how, seconds in self.reboots],
+            'boot_to_ready_s': self.boot_to_ready.summary(),
+            'commands': {name: {'count': int(self.commands[i]), 'unanswered': int(self.unanswered[i]),
+                                'latency_ms': self.latency[name].summary(1000)}
+                         for i, name in enumerate(COMMANDS) if self.commands[i]},
+        }
+
+def analyze(path, interval_ms=HEARTBEAT_INTERVAL_MS, chunk_size=64 * 1024 * 1024):
+    analysis = LogAnalysis(interval_ms)
+    source, chunks = read_log(path, chunk_size)
+    for lines in chunks:
+        if lines is None:
+            analysis.session_break()
+        else:
+            analysis.feed(lines)
+    analysis.finish()
+    return source, analysis
+
+# --- report ---------------------------------------------------------------
+
+def format_time(seconds, source):
+    if seconds is None:
+        return '(no timestamp)'
+    # --dump timestamps are local time already; capture rings store the real epoch
+    tz = timezone.utc if source == 'text' else None
+    when = datetime.fromtimestamp(seconds, tz).replace(tzinfo=None)
+    return when.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+def format_distribution(summary, unit='ms', signed=False):
+    if not summary['count']:
+        return '-'
+    sign = '+' if signed else ''
+    return (f"p50 {summary['p50']:{sign}.2f} {unit}, p95 {summary['p95']:{sign}.2f}, "
+            f"p99 {summary['p99']:{sign}.2f}, max {summary['max']:{sign}.2f} "
+            f"(mean {summary['mean']:{sign}.2f} ± {summary['std']:.2f}, n={summary['count']})")
+
+def print_report(path, source, analysis):
+    report = analysis.as_dict()
+    heartbeat = report['heartbeat']
+    print(f"📜 {path}: {report['lines']:,} lines, {report['bytes'] / 1024 / 1024:.1f} MB "
+          f"({'capture ring' if source == 'capture' else 'text log'})")
+
+    print(f"💓 Heartbeat interval vs {heartbeat['interval_ms']} ms")
+    print(f"   Device clock: {format_distribution(heartbeat['device_jitter_ms'], signed=True)}")
+    print(f"   Host arrival: {format_distribution(heartbeat['arrival_jitter_ms'], signed=True)}")
+    if heartbeat['late']:
+        print(f"   ⚠️  {heartbeat['late']} interval(s) over {1.5 * heartbeat['interval_ms']:.0f} ms (loop blocked)")
+
+    print(f"🔁 Reboots: {len(report['reboots'])}")
+    for reboot in report['reboots'][-20:]:
+        ready = f", ready after {reboot['boot_to_ready_s']:.2f} s" if reboot['boot_to_ready_s'] is not None else ''
+        print(f"   line {reboot['line']:>10}  {format_time(reboot['time'], source)}  "
+              f"({reboot['detected_by']}{ready})")
+    if report['boot_to_ready_s']['count']:
+        print(f"   Boot to ready: {format_distribution(report['boot_to_ready_s'], unit='s')}")
+
+    print("⏱️  Command latency (echo to reply)")
+    if not report['commands']:
+        print("   No commands in the log")
+    for name, stats in report['commands'].items():
+        unanswered = f", {stats['unanswered']} unanswered" if stats['unanswered'] else ''
+        print(f"   {name:8} {stats['count']:>8} sent{unanswered}: {format_distribution(stats['latency_ms'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze captured ESP32 serial output')
+    parser.add_argument('logs', nargs='+', type=Path,
+                        help='Capture ring files, serial_capture.py --dump output or plain text logs')
+    parser.add_argument('--interval', type=float, default=HEARTBEAT_INTERVAL_MS,
+                        help=f'Expected heartbeat interval in ms (default: {HEARTBEAT_INTERVAL_MS})')
+    parser.add_argument('--chunk-mb', type=float, default=64, help='Chunk size in MB (default: 64)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for path in args.logs:
+        try:
+            source, analysis = analyze(path, args.interval, int(args.chunk_mb * 1024 * 1024))
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read {path}: {e}")
+            sys.exit(1)
+        if args.json:
+            results[str(path)] = analysis.as_dict()
+        else:
+            print_report(path, source, analysis)
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
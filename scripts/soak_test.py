@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Accelerated-clock soak test for the auto-dimmer daemon
+Runs the real AutoDimmer loop against the firmware emulator and a scripted
+idle source under a virtual clock, simulating days of operation in minutes,
+and reports growth in RSS, open fds, threads and zombie children. Blocking
+calls go through a real thread pool and every idle probe runs a stub
+xprintidle subprocess, so the leak checks cover the daemon's real paths
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from auto_dimmer import AutoDimmer
+from device_emulator import EmulatorTransport
+
+class VirtualClock:
+    """Clock for AutoDimmer whose sleeps complete instantly in virtual time
+
+    Sleepers are kept in a heap and woken in deadline order by advance_until().
+    Blocking calls run in the default executor like the daemon's, and virtual
+    time only moves on once none are in flight, so the run stays deterministic.
+    """
+
+    def __init__(self, start=None):
+        self.start = start or datetime(2025, 1, 6, 0, 0, 0)
+        self.elapsed = 0.0
+        self._sleepers = []
+        self._seq = itertools.count()
+        self._blocking = 0
+        self._unblocked = asyncio.Event()
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+    async def sleep(self, delay):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self.elapsed + max(0.0, delay), next(self._seq), future))
+        await future
+
+    async def run_blocking(self, func, *args):
+        self._blocking += 1
+        try:
+            return await asyncio.to_thread(func, *args)
+        finally:
+            self._blocking -= 1
+            self._unblocked.set()
+
+    async def settle(self, passes=50):
+        """Let every task that became ready run up to its next sleep, waiting out blocking calls
+
+        A result from a worker thread takes about a dozen loop passes to reach
+        the task that awaited it through wait_for() and gather().
+        """
+        while True:
+            for _ in range(passes):
+                await asyncio.sleep(0)
+                if self._blocking:
+                    break
+            if not self._blocking:
+                return
+            self._unblocked.clear()
+            await self._unblocked.wait()
+
+    async def advance_until(self, seconds, on_step=None):
+        """Wake sleepers in order until `seconds` of virtual time have elapsed"""
+        while True:
+            await self.settle()
+            while self._sleepers and self._sleepers[0][2].cancelled():
+                heapq.heappop(self._sleepers)
+            if not self._sleepers or self._sleepers[0][0] > seconds:
+                self.elapsed = seconds
+                return
+            wake, _, future = heapq.heappop(self._sleepers)
+            self.elapsed = wake
+            future.set_result(None)
+            if on_step:
+                on_step(self.elapsed)
+
+class ScriptedIdleSource:
+    """Synthetic user: working hours with breaks, idle nights (seeded, reproducible)"""
+
+    def __init__(self, clock, seed=1, work_start=8, work_end=18):
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.work_start = work_start
+        self.work_end = work_end
+        self.active = False
+        self.idle_since = 0.0
+        self.next_switch = 0.0
+
+    def _at_work(self, elapsed):
+        hour = (self.clock.start + timedelta(seconds=elapsed)).hour
+        return self.work_start <= hour < self.work_end
+
+    def idle_seconds(self):
+        now = self.clock.elapsed
+        while now >= self.next_switch:
+            switch = self.next_switch
+            if self._at_work(switch) and not self.active:
+                self.active = True
+                self.next_switch = switch + self.random.expovariate(1 / 2400)  # ~40 min sessions
+            else:
+                if self.active:
+                    self.idle_since = switch
+                self.active = False
+                mean_break = 900 if self._at_work(switch) else 3600
+                self.next_switch = switch + self.random.expovariate(1 / mean_break)
+        if self.active:
+            return self.random.uniform(0, 5)
+        return now - self.idle_since
+
+class StubIdleProbe:
+    """xprintidle stand-in first on PATH that prints the scripted idle time
+
+    The daemon's own get_idle_time_seconds() then spawns and reaps a real
+    subprocess for every sample.
+    """
+
+    def __init__(self, source, directory):
+        self.source = source
+        self.value_file = Path(directory) / 'idle_ms'
+        self.value_file.write_text('0')
+        stub = Path(directory) / 'xprintidle'
+        stub.write_text(f'#!/bin/sh\nexec cat "{self.value_file}"\n')
+        stub.chmod(0o755)
+        self.directory = str(directory)
+
+    def wrap(self, probe):
+        def scripted_probe():
+            self.value_file.write_text(str(int(self.source.idle_seconds() * 1000)))
+            return probe()
+        return scripted_probe
+
+    def __enter__(self):
+        self.path = os.environ.get('PATH', '')
+        os.environ['PATH'] = f"{self.directory}{os.pathsep}{self.path}"
+        return self
+
+    def __exit__(self, *exc):
+        os.environ['PATH'] = self.path
+
+def process_stats():
+    """RSS (kB), open fds, threads and zombie children of this process"""
+    stats = {'rss_kb': 0, 'fds': 0, 'threads': threading.active_count(), 'zombies': 0}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    stats['rss_kb'] = int(line.split()[1])
+        stats['fds'] = len(os.listdir('/proc/self/fd'))
+    except OSError:
+        pass
+
+    pid = os.getpid()
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if fields[0] == 'Z' and int(fields[1]) == pid:
+                stats['zombies'] += 1
+        except (OSError, IndexError, ValueError):
+            continue
+    return stats
+
+class SoakDimmer(AutoDimmer):
+    """AutoDimmer that records the real (wall) duration of every tick"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tick_times = []
+
+    async def tick(self):
+        started = time.perf_counter()
+        try:
+            await super().tick()
+        finally:
+            self.tick_times.append(time.perf_counter() - started)
+
+    def load_dimmer_config(self):
+        pass  # Never pick up the user's real config during a soak run
+
+def growth(samples, key):
+    """Mean of the last quarter minus mean of the first quarter (after warm-up)"""
+    values = [s[key] for s in samples]
+    quarter = max(1, len(values) // 4)
+    return statistics.mean(values[-quarter:]) - statistics.mean(values[:quarter])
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+# The default executor adds workers lazily whenever calls overlap, which would
+# read as thread growth; the soak run uses a fixed pool started up front
+EXECUTOR_THREADS = 4
+
+def start_executor(threads=EXECUTOR_THREADS):
+    executor = ThreadPoolExecutor(threads, thread_name_prefix='soak-blocking')
+    barrier = threading.Barrier(threads)
+    for future in [executor.submit(barrier.wait) for _ in range(threads)]:
+        future.result()
+    return executor
+
+async def soak(days, check_interval, idle_minutes, dim_level, seed, sample_every):
+    asyncio.get_running_loop().set_default_executor(start_executor())
+    clock = VirtualClock()
+    transport = EmulatorTransport()
+    dimmer = SoakDimmer(idle_minutes, dim_level, check_interval, transport=transport, clock=clock)
+
+    samples = []
+    next_sample = [0.0]
+
+    def on_step(elapsed):
+        if elapsed >= next_sample[0]:
+            samples.append(dict(process_stats(), hours=elapsed / 3600))
+            next_sample[0] += sample_every
+
+    with tempfile.TemporaryDirectory() as stub_dir, \
+            StubIdleProbe(ScriptedIdleSource(clock, seed), stub_dir) as stub, \
+            open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        dimmer.get_idle_time_seconds = stub.wrap(dimmer.get_idle_time_seconds)
+        task = asyncio.create_task(dimmer.run_async(install_signal_handlers=False))
+        await clock.advance_until(days * 86400, on_step)
+        dimmer.stop()
+        # A cancellation can land just as a blocking call returns and be lost, leaving
+        # the idle task in one more sleep; let virtual time run until it sees the stop
+        while not task.done():
+            await clock.advance_until(clock.elapsed + check_interval)
+        await task
+
+    return dimmer, transport, samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Accelerated-clock soak test for the auto-dimmer')
+    parser.add_argument('--days', type=float, default=7, help='Simulated days (default: 7)')
+    parser.add_argument('--interval', type=float, default=30, help='Check interval in seconds (default: 30)')
+    parser.add_argument('--minutes', type=float, default=10, help='Idle minutes before dimming (default: 10)')
+    parser.add_argument('--level', type=int, default=0, help='Dim level (default: 0%%)')
+    parser.add_argument('--seed', type=int, default=1, help='Idle script random seed')
+    parser.add_argument('--sample-every', type=float, default=3600,
+                        help='Resource sample period in simulated seconds (default: 3600)')
+    parser.add_argument('--rss-tolerance', type=int, default=1024,
+                        help='Allowed RSS growth in kB (default: 1024)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    dimmer, transport, samples = asyncio.run(
+        soak(args.days, args.interval, args.minutes, args.level, args.seed, args.sample_every))
+    elapsed = time.monotonic() - started
+
+    ticks_ms = [t * 1000 for t in dimmer.tick_times] or [0.0]
+    report = {
+        'simulated_days': args.days,
+        'wall_seconds': round(elapsed, 2),
+        'ticks': len(dimmer.tick_times),
+        'device_commands': transport.emulator.commands,
+        'tick_ms': {
+            'p50': round(percentile(ticks_ms, 0.5), 3),
+            'p99': round(percentile(ticks_ms, 0.99), 3),
+            'max': round(max(ticks_ms), 3),
+        },
+        'growth': {key: round(growth(samples, key), 1) for key in ('rss_kb', 'fds', 'threads', 'zombies')},
+        'final': samples[-1] if samples else {},
+    }
+    leaks = []
+    if report['growth']['rss_kb'] > args.rss_tolerance:
+        leaks.append(f"RSS grew {report['growth']['rss_kb']:.0f} kB")
+    for key in ('fds', 'threads', 'zombies'):
+        if report['growth'][key] > 0:
+            leaks.append(f"{key} grew by {report['growth'][key]}")
+    report['leaks'] = leaks
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"🧪 Soak test: {args.days} simulated days in {elapsed:.1f}s")
+        print(f"   Ticks: {report['ticks']}, device commands: {report['device_commands']}")
+        print(f"   Tick time: p50 {report['tick_ms']['p50']}ms, p99 {report['tick_ms']['p99']}ms, "
+              f"max {report['tick_ms']['max']}ms")
+        for key, value in report['growth'].items():
+            print(f"   Growth {key}: {value}")
+        if leaks:
+            for leak in leaks:
+                print(f"❌ {leak}")
+        else:
+            print("✅ No resource growth detected")
+    sys.exit(1 if leaks else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Saturation stress test for the ESP32 serial and HTTP command paths
+Ramps an open-loop command rate step by step, measures each command's
+latency from the moment it was scheduled, counts lost, late and mangled
+replies, and reports the knee of the latency curve and a safe sustained rate
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext, redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+COUNTERS = ['sent', 'ok', 'late', 'lost', 'mangled', 'errors']
+MIN_KNEE_MS = 20  # Latency growth below this is jitter, not saturation
+
+def rate_steps(start, stop, factor):
+    """Geometric ramp of offered rates (commands per second)"""
+    rates = []
+    rate = start
+    while rate <= stop * 1.0001:
+        rates.append(round(rate, 2))
+        rate *= factor
+    return rates
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(rate, elapsed, counts, latencies, send_lags):
+    """One ramp step as a report dict; latencies and lags in seconds"""
+    latencies_ms = [latency * 1000 for latency in latencies] or [0.0]
+    step = dict(counts, rate=rate, achieved=round(counts['ok'] / elapsed, 2) if elapsed else 0.0)
+    for name, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        step[name] = round(percentile(latencies_ms, fraction), 2)
+    step['max_ms'] = round(max(latencies_ms), 2)
+    # How far sends fell behind schedule: the link pushing back on the writer
+    step['send_lag_ms'] = round(max(send_lags) * 1000, 2) if send_lags else 0.0
+    return step
+
+def expected_reply(command):
+    return 'pong' if command == 'ping' else 'Brightness set to'
+
+class SerialLoad:
+    """Pipelined text commands over one serial port
+
+    Writes follow the schedule regardless of outstanding replies. Replies are
+    matched to commands in order through the firmware's echo line.
+    """
+
+    name = 'serial'
+
+    def __init__(self, channel, command, timeout):
+        self.channel = channel
+        self.command = command
+        self.expected = expected_reply(command)
+        self.timeout = timeout
+
+    def run_step(self, rate, duration):
+        channel = self.channel
+        channel.drain()
+        payload = f"{self.command}\n".encode()
+        counts = dict.fromkeys(COUNTERS, 0)
+        latencies = []
+        send_lags = []
+        outstanding = deque()  # [scheduled time, echo state] in send order
+        interval = 1.0 / rate
+        total = max(1, int(rate * duration))
+        started = time.monotonic()
+        give_up = started + total * interval + self.timeout
+        sent = 0
+
+        while True:
+            now = time.monotonic()
+            if sent < total and now >= started + sent * interval:
+                scheduled = started + sent * interval
+                channel.write(payload)  # Blocks once the device stops draining its input
+                send_lags.append(time.monotonic() - scheduled)
+                outstanding.append([scheduled, None])
+                sent += 1
+                continue
+            if sent == total and (not outstanding or now >= give_up):
+                break
+            line = channel.readline(started + sent * interval if sent < total else give_up)
+            if line is not None:
+                self.handle(line.decode(errors='replace').strip(), outstanding, counts, latencies)
+
+        finished = time.monotonic()
+        counts['sent'] = sent
+        counts['lost'] += len(outstanding)
+        return summarize(rate, finished - started, counts, latencies, send_lags)
+
+    def handle(self, line, outstanding, counts, latencies):
+        if not line or line.startswith(('Heartbeat:', 'Warning:')):
+            return
+        if line.startswith('Received command:'):
+            entry = next((entry for entry in outstanding if entry[1] is None), None)
+            if entry is None:
+                counts['errors'] += 1  # Echo of a command we never sent
+                return
+            # A mangled echo means bytes were lost or commands ran together
+            entry[1] = 'ok' if line == f"Received command: '{self.command}'" else 'mangled'
+            return
+        if not outstanding or outstanding[0][1] is None:
+            counts['errors'] += 1  # Reply without an echo
+            return
+        scheduled, state = outstanding.popleft()
+        latency = time.monotonic() - scheduled
+        if state == 'mangled' or not line.startswith(self.expected):
+            counts['mangled'] += 1
+        elif latency > self.timeout:
+            counts['late'] += 1
+        else:
+            counts['ok'] += 1
+            latencies.append(latency)
+
+class HttpLoad:
+    """Concurrent GET /serial requests from a worker pool
+
+    The scheduler submits on time even when every worker is busy, so time
+    spent queued on the client counts towards latency.
+    """
+
+    name = 'http'
+
+    def __init__(self, address, command, timeout, workers):
+        import requests
+        self.requests = requests
+        self.url = f"http://{address}/serial"
+        self.command = command
+        self.expected = expected_reply(command)
+        self.timeout = timeout
+        self.workers = workers
+        self.local = threading.local()
+
+    def request(self, scheduled):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        try:
+            response = session.get(self.url, params={'cmd': self.command}, timeout=self.timeout)
+        except self.requests.exceptions.Timeout:
+            return 'lost', None
+        except self.requests.exceptions.RequestException:
+            return 'errors', None
+        latency = time.monotonic() - scheduled
+        if response.status_code != 200:
+            return 'errors', None
+        if not response.text.startswith(self.expected):
+            return 'mangled', None
+        if latency > self.timeout:
+            return 'late', None
+        return 'ok', latency
+
+    def run_step(self, rate, duration):
+        counts = dict.fromkeys(COUNTERS, 0)
+        send_lags = []
+        interval = 1.0 / rate
+        total = max(1, int(rate * duration))
+        futures = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(self.workers) as pool:
+            for n in range(total):
+                scheduled = started + n * interval
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                send_lags.append(time.monotonic() - scheduled)
+                futures.append(pool.submit(self.request, scheduled))
+            results = [future.result() for future in futures]
+        finished = time.monotonic()
+
+        counts['sent'] = total
+        latencies = []
+        for outcome, latency in results:
+            counts[outcome] += 1
+            if latency is not None:
+                latencies.append(latency)
+        return summarize(rate, finished - started, counts, latencies, send_lags)
+
+def saturation(step, baseline_ms, knee_factor):
+    """Reasons a step is past the knee (empty if it kept up)"""
+    reasons = []
+    for key in ('lost', 'late', 'mangled', 'errors'):
+        if step[key]:
+            reasons.append(f"{step[key]} {key}")
+    if step['achieved'] < step['rate'] * 0.9:
+        reasons.append(f"throughput {step['achieved']}/s")
+    if baseline_ms is not None and step['p95_ms'] > max(baseline_ms * knee_factor, baseline_ms + MIN_KNEE_MS):
+        reasons.append(f"p95 {step['p95_ms']}ms vs {baseline_ms}ms at the lowest rate")
+    return reasons
+
+def ramp(load, rates, duration, knee_factor, past_knee, headroom, settle=0.5):
+    """Run the ramp until past_knee steps beyond the knee; returns the report"""
+    steps = []
+    baseline_ms = None
+    knee = None
+    for rate in rates:
+        step = load.run_step(rate, duration)
+        if baseline_ms is None and step['ok']:
+            baseline_ms = step['p95_ms']
+        step['saturated'] = saturation(step, baseline_ms, knee_factor)
+        steps.append(step)
+        print_step(load.name, step)
+        if step['saturated'] and knee is None:
+            knee = rate
+        if knee is not None and sum(1 for s in steps if s['saturated']) > past_knee:
+            break
+        time.sleep(settle)
+
+    sustained = [s['rate'] for s in steps if knee is None or s['rate'] < knee]
+    return {
+        'steps': steps,
+        'knee': knee,
+        'max_sustained': max(sustained) if sustained else None,
+        'safe_rate': round(max(sustained) * headroom, 2) if sustained else None,
+    }
+
+def print_step(name, step):
+    flag = '❌' if step['saturated'] else '✅'
+    print(f"   {flag} {step['rate']:>7.2f}/s  sent {step['sent']:>5}  ok {step['ok']:>5}  "
+          f"p50 {step['p50_ms']:>7.1f}ms  p95 {step['p95_ms']:>7.1f}ms  p99 {step['p99_ms']:>7.1f}ms  "
+          f"lag {step['send_lag_ms']:>6.1f}ms  lost {step['lost']}  late {step['late']}  "
+          f"mangled {step['mangled']}  errors {step['errors']}")
+    if step['saturated']:
+        print(f"      {', '.join(step['saturated'])}")
+
+def open_serial(port, emulator):
+    import serial
+    from serial_io import SerialChannel
+    if emulator:
+        return SerialChannel(serial.Serial(emulator.device, 115200))
+    from imacdisplay import load_config, setup_serial
+    ser = setup_serial(port or load_config()['port'], exclusive=True)
+    return SerialChannel(ser) if ser else None
+
+def http_address(ip, emulator):
+    if emulator:
+        return emulator.address
+    if ip:
+        return ip
+    try:
+        from imacdisplay_http import load_config, network_address
+    except ImportError:
+        return None
+    return network_address(load_config())
+
+def default_level():
+    """Last saved brightness, so 'set' stress doesn't visibly change the display"""
+    try:
+        with open(Path.home() / '.config' / 'imacdisplay.conf') as f:
+            return int(json.load(f).get('last_brightness', 70))
+    except (OSError, ValueError, TypeError):
+        return 70
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the maximum sustainable command rate of the ESP32 links')
+    parser.add_argument('--transport', choices=['serial', 'http', 'both'], default='both',
+                        help='Link to stress (default: both)')
+    parser.add_argument('--command', choices=['ping', 'set'], default='ping',
+                        help="Command to send; 'set' re-applies --level and includes the LED blink delay (default: ping)")
+    parser.add_argument('--level', type=int, help='Brightness for --command set (default: last saved brightness)')
+    parser.add_argument('--start', type=float, default=2, help='First rate in commands/s (default: 2)')
+    parser.add_argument('--max', type=float, default=200, help='Highest rate to try (default: 200)')
+    parser.add_argument('--factor', type=float, default=1.5, help='Rate multiplier per step (default: 1.5)')
+    parser.add_argument('--step-seconds', type=float, default=5, help='Duration of each step (default: 5)')
+    parser.add_argument('--timeout', type=float, default=2.0,
+                        help='Replies slower than this count as late, missing ones as lost (default: 2)')
+    parser.add_argument('--knee-factor', type=float, default=2.0,
+                        help='p95 growth over the lowest rate that marks the knee (default: 2)')
+    parser.add_argument('--past-knee', type=int, default=1,
+                        help='Saturated steps to run before stopping the ramp (default: 1)')
+    parser.add_argument('--headroom', type=float, default=0.8,
+                        help='Safe rate as a fraction of the highest sustained rate (default: 0.8)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent HTTP requests (default: 8)')
+    parser.add_argument('--port', help='Serial port (default: configured port)')
+    parser.add_argument('--ip', help='ESP32 IP address (default: configured address)')
+    parser.add_argument('--emulator', action='store_true',
+                        help='Stress the firmware emulator with firmware timing instead of the device')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    command = 'ping' if args.command == 'ping' else str(max(5, min(100, args.level or default_level())))
+    rates = rate_steps(args.start, args.max, args.factor)
+    transports = ['serial', 'http'] if args.transport == 'both' else [args.transport]
+    report = {}
+    failed = False
+
+    pty_emulator = http_emulator = None
+    if args.emulator:
+        from device_emulator import FirmwareEmulator, HttpEmulator, PtyEmulator
+        firmware = FirmwareEmulator()
+        pty_emulator = PtyEmulator(firmware, firmware_timing=True).__enter__()
+        http_emulator = HttpEmulator(firmware, firmware_timing=True).__enter__()
+
+    # With --json, progress goes to stderr so stdout is only the report
+    try:
+        with redirect_stdout(sys.stderr) if args.json else nullcontext():
+            for transport in transports:
+                if transport == 'serial':
+                    channel = open_serial(args.port, pty_emulator)
+                    if channel is None:
+                        print("❌ Could not open the serial port")
+                        failed = True
+                        continue
+                    load = SerialLoad(channel, command, args.timeout)
+                else:
+                    address = http_address(args.ip, http_emulator)
+                    if not address:
+                        print("❌ ESP32 address not known; pass --ip")
+                        failed = True
+                        continue
+                    load = HttpLoad(address, command, args.timeout, args.workers)
+
+                print(f"🔥 {transport}: '{command}' from {rates[0]}/s to {rates[-1]}/s, {args.step_seconds}s per step")
+                try:
+                    report[transport] = ramp(load, rates, args.step_seconds, args.knee_factor,
+                                             args.past_knee, args.headroom)
+                finally:
+                    if transport == 'serial':
+                        channel.close()
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted")
+        failed = True
+    finally:
+        if pty_emulator:
+            pty_emulator.close()
+            http_emulator.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for transport, result in report.items():
+            if result['knee'] is None:
+                print(f"📈 {transport}: no knee up to {result['max_sustained']}/s; raise --max to go further")
+            else:
+                print(f"📈 {transport}: knee at {result['knee']}/s")
+            if result['safe_rate'] is None:
+                print(f"⚠️  {transport}: saturated at the lowest rate; lower --start")
+            else:
+                print(f"✅ {transport}: safe sustained rate {result['safe_rate']} commands/s "
+                      f"({args.headroom:.0%} of {result['max_sustained']}/s)")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
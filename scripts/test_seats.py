@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for per-session idle probing (no logind or X server needed)
+Run with pytest, or directly: python3 scripts/test_seats.py
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import seats
+from seats import Session, probe_idle
+
+TTY_IDLE = 3600  # What the stale VT access time would claim
+
+def session(type, idle_hint=False, idle_for=0):
+    idle_since = int((time.monotonic() - idle_for) * 1e6) if idle_hint else 0
+    return Session(id='2', user='doobidoo', uid=1000, seat='seat0', display=':0', tty='tty2',
+                   type=type, idle_hint=idle_hint, idle_since=idle_since)
+
+class StaleTty:
+    """Patches seats so xprintidle is missing and every tty was last touched TTY_IDLE ago"""
+
+    def __enter__(self):
+        self.run, self.stat = seats.subprocess.run, seats.os.stat
+        seats.subprocess.run = self._no_xprintidle
+        seats.os.stat = lambda path: os.stat_result((0,) * 7 + (time.time() - TTY_IDLE,) + (0,) * 2)
+        return self
+
+    def __exit__(self, *exc):
+        seats.subprocess.run, seats.os.stat = self.run, self.stat
+
+    @staticmethod
+    def _no_xprintidle(*args, **kwargs):
+        raise FileNotFoundError('xprintidle')
+
+def test_x11_without_xprintidle_ignores_tty():
+    with StaleTty():
+        assert probe_idle(session('x11')) == 0.0
+
+def test_x11_without_xprintidle_uses_idle_hint():
+    with StaleTty():
+        assert 595 <= probe_idle(session('x11', idle_hint=True, idle_for=600)) <= 605
+
+def test_wayland_ignores_tty():
+    with StaleTty():
+        assert probe_idle(session('wayland')) == 0.0
+
+def test_tty_session_uses_access_time():
+    with StaleTty():
+        assert TTY_IDLE - 5 <= probe_idle(session('tty')) <= TTY_IDLE + 5
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"🎉 {len(tests)} tests passed")
+
+if __name__ == '__main__':
+    main()
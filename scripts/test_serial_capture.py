@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for reading a capture ring while a capture writes to it
+The capture runs as a subprocess against the firmware emulator on a
+pseudo-terminal (it installs signal handlers, so it needs a main thread).
+Run with pytest, or directly: python3 scripts/test_serial_capture.py
+"""
+
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from device_emulator import PtyEmulator
+from serial_capture import CaptureRing, KIND_DATA
+
+SCRIPT = Path(__file__).parent / 'serial_capture.py'
+DURATION = 4  # Seconds the capture runs; every reader must finish well within it
+
+def start_capture(port, path):
+    return subprocess.Popen([sys.executable, str(SCRIPT), '-p', port, '-f', str(path),
+                             '--size', '0.016', '--duration', str(DURATION)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+def wait_for_data(path, timeout=DURATION / 2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists() and path.stat().st_size:
+            try:
+                ring = CaptureRing(path, readonly=True)
+            except ValueError:
+                pass  # Still being created
+            else:
+                with_data = ring.stats()['records'] > 1
+                ring.close()
+                if with_data:
+                    return
+        time.sleep(0.05)
+    raise AssertionError(f"no data captured into {path}")
+
+def test_reader_while_writing():
+    with tempfile.TemporaryDirectory() as tmp, PtyEmulator(heartbeat_interval=0.01) as emulator:
+        path = Path(tmp) / 'emulator.cap'
+        writer = start_capture(emulator.device, path)
+        try:
+            wait_for_data(path)
+
+            started = time.monotonic()
+            ring = CaptureRing(path, readonly=True)
+            try:
+                records = list(ring.read_records())
+            finally:
+                ring.close()
+            assert any(kind == KIND_DATA for _, kind, _ in records)
+
+            for mode in ('--info', '--dump'):
+                result = subprocess.run([sys.executable, str(SCRIPT), '-f', str(path), mode],
+                                        capture_output=True, text=True, timeout=DURATION)
+                assert result.returncode == 0, result.stdout + result.stderr
+            assert 'Heartbeat' in result.stdout
+            assert writer.poll() is None, "readers should not have waited for the capture to end"
+            assert time.monotonic() - started < DURATION / 2
+        finally:
+            writer.wait(timeout=DURATION + 10)
+        assert writer.returncode == 0, writer.stderr.read()
+
+def test_second_writer_refused():
+    with tempfile.TemporaryDirectory() as tmp, PtyEmulator(heartbeat_interval=0.01) as emulator:
+        path = Path(tmp) / 'emulator.cap'
+        writer = start_capture(emulator.device, path)
+        try:
+            wait_for_data(path)
+            second = subprocess.run([sys.executable, str(SCRIPT), '-p', emulator.device, '-f', str(path),
+                                     '--duration', '1'], capture_output=True, text=True, timeout=DURATION)
+            assert second.returncode == 1
+            assert 'already being captured' in second.stdout
+        finally:
+            writer.wait(timeout=DURATION + 10)
+        assert writer.returncode == 0
+
+def main():
+    tests = [value for name, value in globals().items() if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"🎉 {len(tests)} tests passed")
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,7 @@ const char* password = WIFI_PASSWORD;
 WebServer server(80);
 
 // Firmware version
-const char* FIRMWARE_VERSION = "1.7.0-safety-features";
+const char* FIRMWARE_VERSION = "1.8.0-framed-serial";
 const char* BUILD_DATE = __DATE__ " " __TIME__;
 
 // Define the PWM properties
@@ -32,11 +32,39 @@ const int ledPin = 8;        // Built-in blue LED
 // Brightness level (0-255)
 int brightness = 128;
 
+// Framed serial protocol (frame1), opt-in via the "frame1" text command:
+// SOF | length | seq | op | payload[length] | crc16 (CCITT-FALSE, little-endian)
+// The CRC covers length, seq, op and payload. Replies use op | OP_REPLY and
+// start with a status byte.
+const char* SERIAL_PROTOCOLS = "text frame1";
+const uint8_t FRAME_SOF = 0xA5;
+const uint8_t FRAME_MAX_PAYLOAD = 64;
+const uint8_t OP_PING = 0x01;
+const uint8_t OP_VERSION = 0x02;
+const uint8_t OP_SET = 0x03;        // payload: percent
+const uint8_t OP_GET = 0x04;
+const uint8_t OP_TEXT = 0x05;       // back to the text protocol
+const uint8_t OP_REPLY = 0x80;
+const uint8_t OP_HEARTBEAT = 0x70;  // unsolicited, seq 0
+const uint8_t OP_NAK = 0xFF;
+const uint8_t STATUS_OK = 0;
+const uint8_t STATUS_BAD_ARG = 1;
+const uint8_t STATUS_UNKNOWN_OP = 2;
+const uint8_t STATUS_BAD_FRAME = 3;
+
+bool framedMode = false;
+uint8_t frameBuffer[4 + FRAME_MAX_PAYLOAD + 2];
+size_t frameLength = 0;
+
 // Function prototypes
 void connectToWifi();
 void setupWebServer();
 String getWifiStatusJson();
 String getHtmlPage();
+void applyBrightness(int percentBrightness);
+void handleTextCommand(const String& command);
+void handleFrameByte(uint8_t c);
+void sendFrame(uint8_t seq, uint8_t op, const uint8_t* payload, uint8_t length);
 
 void setup() {
   // Wait for USB to initialize
@@ -126,8 +154,15 @@ void loop() {
     lastBlink = millis();
     
     // Debug: Send periodic heartbeat to serial
-    Serial.printf("Heartbeat: %lu, WiFi: %s, Brightness: %d\n", 
-                  millis(), WiFi.status() == WL_CONNECTED ? "OK" : "NO", brightness);
+    if (framedMode) {
+      uint32_t now = millis();
+      uint8_t payload[6] = {(uint8_t)now, (uint8_t)(now >> 8), (uint8_t)(now >> 16), (uint8_t)(now >> 24),
+                            (uint8_t)(WiFi.status() == WL_CONNECTED), (uint8_t)brightness};
+      sendFrame(0, OP_HEARTBEAT, payload, sizeof(payload));
+    } else {
+      Serial.printf("Heartbeat: %lu, WiFi: %s, Brightness: %d\n", 
+                    millis(), WiFi.status() == WL_CONNECTED ? "OK" : "NO", brightness);
+    }
     Serial.flush();
   }
 
@@ -137,52 +172,34 @@ void loop() {
     lastSerialActivity = millis();
     char c = Serial.read();
     
-    // Prevent buffer overflow
-    if (inputBuffer.length() > 50) {
-      inputBuffer = "";
-    }
-    
-    if (c == '\n' || c == '\r') {
-      inputBuffer.trim();
-      if (inputBuffer.length() > 0) {
-        Serial.printf("Received command: '%s'\n", inputBuffer.c_str());
-        
-        if (inputBuffer.equals("version")) {
-          // Handle version command
-          Serial.printf("Firmware: %s, Build: %s\n", FIRMWARE_VERSION, BUILD_DATE);
-        } else if (inputBuffer.equals("ping")) {
-          // Simple ping command
-          Serial.println("pong");
-        } else if (inputBuffer.charAt(0) >= '0' && inputBuffer.charAt(0) <= '9') {
-          int percentBrightness = constrain(inputBuffer.toInt(), 0, 100);
-          int pwmValue = map(percentBrightness, 0, 100, 0, 255);
-          
-          // Additional safety check
-          if (percentBrightness < 5 && percentBrightness > 0) {
-            Serial.println("Warning: minimum safe brightness is 5%");
-          }
-          
-          // Apply brightness
-          ledcWrite(pwmChannel, pwmValue);
-          brightness = pwmValue;
-
-          // Blink status LED to show command received
-          digitalWrite(ledPin, LOW);
-          delay(50);
-          digitalWrite(ledPin, HIGH);
-
-          Serial.printf("Brightness set to: %d%%\n", percentBrightness);
-        } else {
-          Serial.printf("Unknown command: '%s'\n", inputBuffer.c_str());
+    if (framedMode && (frameLength > 0 || (uint8_t)c == FRAME_SOF)) {
+      handleFrameByte((uint8_t)c);
+    } else {
+      // Prevent buffer overflow
+      if (inputBuffer.length() > 50) {
+        inputBuffer = "";
+      }
+      
+      if (c == '\n' || c == '\r') {
+        inputBuffer.trim();
+        if (inputBuffer.length() > 0) {
+          // A text line in framed mode means a text client took over
+          framedMode = false;
+          handleTextCommand(inputBuffer);
+          Serial.flush();
         }
-        Serial.flush();
+        inputBuffer = "";  // clear after processing
+      } else if (c >= 32 && c <= 126) { // Only accept printable characters
+        inputBuffer += c;
       }
-      inputBuffer = "";  // clear after processing
-    } else if (c >= 32 && c <= 126) { // Only accept printable characters
-      inputBuffer += c;
     }
   }
   
+  // Drop a partial frame if the rest never arrives
+  if (frameLength > 0 && millis() - lastSerialActivity > 200) {
+    frameLength = 0;
+  }
+  
   // Clear old input buffer if no activity for 5 seconds
   if (millis() - lastSerialActivity > 5000 && inputBuffer.length() > 0) {
     inputBuffer = "";
@@ -192,6 +209,122 @@ void loop() {
   yield();
 }
 
+void applyBrightness(int percentBrightness) {
+  int pwmValue = map(percentBrightness, 0, 100, 0, 255);
+  ledcWrite(pwmChannel, pwmValue);
+  brightness = pwmValue;
+
+  // Blink status LED to show command received
+  digitalWrite(ledPin, LOW);
+  delay(50);
+  digitalWrite(ledPin, HIGH);
+}
+
+void handleTextCommand(const String& command) {
+  Serial.printf("Received command: '%s'\n", command.c_str());
+  
+  if (command.equals("version")) {
+    // Handle version command
+    Serial.printf("Firmware: %s, Build: %s, Protocols: %s\n", FIRMWARE_VERSION, BUILD_DATE, SERIAL_PROTOCOLS);
+  } else if (command.equals("ping")) {
+    // Simple ping command
+    Serial.println("pong");
+  } else if (command.equals("frame1")) {
+    Serial.println("Framed mode: frame1");
+    framedMode = true;
+  } else if (command.charAt(0) >= '0' && command.charAt(0) <= '9') {
+    int percentBrightness = constrain(command.toInt(), 0, 100);
+    
+    // Additional safety check
+    if (percentBrightness < 5 && percentBrightness > 0) {
+      Serial.println("Warning: minimum safe brightness is 5%");
+    }
+    
+    applyBrightness(percentBrightness);
+    Serial.printf("Brightness set to: %d%%\n", percentBrightness);
+  } else {
+    Serial.printf("Unknown command: '%s'\n", command.c_str());
+  }
+}
+
+uint16_t crc16(const uint8_t* data, size_t length, uint16_t crc = 0xFFFF) {
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(uint8_t seq, uint8_t op, const uint8_t* payload, uint8_t length) {
+  uint8_t header[4] = {FRAME_SOF, length, seq, op};
+  uint16_t crc = crc16(payload, length, crc16(header + 1, 3));
+  uint8_t trailer[2] = {(uint8_t)(crc & 0xFF), (uint8_t)(crc >> 8)};
+  Serial.write(header, sizeof(header));
+  Serial.write(payload, length);
+  Serial.write(trailer, sizeof(trailer));
+}
+
+void handleFrame(uint8_t seq, uint8_t op, const uint8_t* payload, uint8_t length) {
+  uint8_t reply[FRAME_MAX_PAYLOAD];
+  uint8_t replyLength = 1;
+  reply[0] = STATUS_OK;
+  
+  if (op == OP_PING) {
+    // Status byte only
+  } else if (op == OP_VERSION) {
+    replyLength += snprintf((char*)reply + 1, sizeof(reply) - 1, "%s%c%s", FIRMWARE_VERSION, '\0', BUILD_DATE);
+    replyLength = min((int)replyLength, (int)sizeof(reply));
+  } else if (op == OP_SET) {
+    if (length != 1 || payload[0] > 100) {
+      reply[0] = STATUS_BAD_ARG;
+    } else {
+      applyBrightness(payload[0]);
+      reply[1] = payload[0];
+      reply[2] = (uint8_t)brightness;
+      replyLength = 3;
+    }
+  } else if (op == OP_GET) {
+    reply[1] = (uint8_t)map(brightness, 0, 255, 0, 100);
+    reply[2] = (uint8_t)brightness;
+    replyLength = 3;
+  } else if (op == OP_TEXT) {
+    framedMode = false;
+  } else {
+    reply[0] = STATUS_UNKNOWN_OP;
+  }
+  sendFrame(seq, op | OP_REPLY, reply, replyLength);
+  Serial.flush();
+}
+
+void handleFrameByte(uint8_t c) {
+  frameBuffer[frameLength++] = c;
+  if (frameLength < 4) {
+    return;
+  }
+  
+  uint8_t length = frameBuffer[1];
+  uint8_t seq = frameBuffer[2];
+  uint8_t status = STATUS_BAD_FRAME;
+  if (length > FRAME_MAX_PAYLOAD) {
+    frameLength = 0;
+    sendFrame(seq, OP_NAK, &status, 1);
+    return;
+  }
+  if (frameLength < 4 + (size_t)length + 2) {
+    return;
+  }
+  
+  frameLength = 0;
+  uint16_t crc = frameBuffer[4 + length] | (frameBuffer[5 + length] << 8);
+  if (crc != crc16(frameBuffer + 1, 3 + length)) {
+    sendFrame(seq, OP_NAK, &status, 1);
+    return;
+  }
+  handleFrame(seq, frameBuffer[3], frameBuffer + 4, length);
+}
+
 void connectToWifi() {
   Serial.print("Connecting to WiFi: ");
   Serial.println(ssid);
@@ -10,6 +10,7 @@ python3 scripts/imacdisplay_http.py --ip 10.0.1.27
 # Copy HTTP script to system location
 echo "📦 Installing HTTP-based script..."
 sudo cp scripts/imacdisplay_http.py /usr/local/bin/imacdisplay.py
+sudo cp scripts/brightness_history.py scripts/brightness_bus.py /usr/local/bin/
 sudo chmod +x /usr/local/bin/imacdisplay.py
 
 # Test the system installation